@@ -0,0 +1,244 @@
+import argparse
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from typing import Dict, Iterable, Iterator, List, Optional
+
+CVR_CACHE_FILE = "data/cache/cvr.sqlite"
+CVR_CACHE_TTL_DAYS = 30        # fundne virksomheder
+CVR_NEGATIVE_TTL_DAYS = 1      # svar med "error" (ikke fundet) – prøves igen hurtigere
+
+# cvrapi.dk-fejl der betyder "findes ikke" og derfor kan caches som negative svar;
+# andre fejl (QUOTA_EXCEEDED, INTERNAL_ERROR, BANNED …) er forbigående og gemmes ikke
+NEGATIVE_ERRORS = {"NOT_FOUND", "INVALID_VAT"}
+
+_NON_DIGITS = re.compile(r"\D+")
+
+
+def normalize_cvr(cvr_number) -> str:
+    """CVR-nummer som rene cifre ("DK 12 34 56 78" → "12345678")."""
+    return _NON_DIGITS.sub("", str(cvr_number or ""))
+
+
+def is_cacheable(data: Dict) -> bool:
+    """Fundne virksomheder og rigtige "ikke fundet"-svar – ikke forbigående API-fejl."""
+    return "error" not in data or str(data["error"]).upper() in NEGATIVE_ERRORS
+
+
+class CvrCache:
+    """
+    Vedvarende SQLite-cache for cvrapi.dk-svar, nøglet på CVR-nummer.
+
+    Hele JSON-svaret gemmes. Fundne virksomheder er gyldige i `ttl_days`,
+    negative svar (NEGATIVE_ERRORS) kun i `negative_ttl_days`. Netværks- og
+    HTTP-fejl og forbigående API-fejl (fx QUOTA_EXCEEDED) gemmes ikke, så de
+    altid prøves igen.
+    """
+
+    def __init__(
+        self,
+        path: str = CVR_CACHE_FILE,
+        ttl_days: Optional[float] = CVR_CACHE_TTL_DAYS,
+        negative_ttl_days: Optional[float] = CVR_NEGATIVE_TTL_DAYS,
+    ):
+        cache_dir = os.path.dirname(path)
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+
+        self.path = path
+        self.ttl_seconds = ttl_days * 86400 if ttl_days else None
+        self.negative_ttl_seconds = negative_ttl_days * 86400 if negative_ttl_days else None
+        self.hits = 0
+        self.misses = 0
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS cvr (
+                cvr        TEXT PRIMARY KEY,
+                data       TEXT NOT NULL,
+                found      INTEGER NOT NULL,
+                fetched_at REAL NOT NULL
+            )
+            """
+        )
+        self._conn.commit()
+
+    def _expired(self, found: bool, fetched_at: float, now: float) -> bool:
+        ttl = self.ttl_seconds if found else self.negative_ttl_seconds
+        return bool(ttl) and now - fetched_at > ttl
+
+    def get(self, cvr_number) -> Optional[Dict]:
+        """Returnér det gemte JSON-svar, eller None hvis det mangler eller er udløbet."""
+        key = normalize_cvr(cvr_number)
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT data, found, fetched_at FROM cvr WHERE cvr = ?", (key,)
+            ).fetchone()
+
+            if row is None or self._expired(row[1], row[2], time.time()):
+                self.misses += 1
+                return None
+            self.hits += 1
+        return json.loads(row[0])
+
+    def put(self, cvr_number, data: Dict) -> None:
+        self.put_many([(cvr_number, data)])
+
+    def put_many(self, items: Iterable) -> int:
+        """
+        Gem mange (cvr, data) i én transaktion; forbigående fejlsvar springes
+        over (se is_cacheable). Returnerer antal gemte.
+        """
+        now = time.time()
+        rows = [
+            (
+                normalize_cvr(cvr),
+                json.dumps(data, ensure_ascii=False),
+                int("error" not in data),
+                now,
+            )
+            for cvr, data in items
+            if normalize_cvr(cvr) and is_cacheable(data)
+        ]
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO cvr (cvr, data, found, fetched_at) VALUES (?, ?, ?, ?)",
+                rows,
+            )
+            self._conn.commit()
+        return len(rows)
+
+    def missing(self, cvr_numbers: Iterable) -> List[str]:
+        """De CVR-numre (normaliserede, uden dubletter) der ikke har et gyldigt svar."""
+        now = time.time()
+        result: List[str] = []
+        seen = set()
+        with self._lock:
+            for cvr in cvr_numbers:
+                key = normalize_cvr(cvr)
+                if not key or key in seen:
+                    continue
+                seen.add(key)
+                row = self._conn.execute(
+                    "SELECT found, fetched_at FROM cvr WHERE cvr = ?", (key,)
+                ).fetchone()
+                if row is None or self._expired(row[0], row[1], now):
+                    result.append(key)
+        return result
+
+    def purge_expired(self) -> int:
+        """Slet udløbne poster. Returnerer antal slettede."""
+        now = time.time()
+        deleted = 0
+        with self._lock:
+            for found, ttl in ((1, self.ttl_seconds), (0, self.negative_ttl_seconds)):
+                if ttl:
+                    deleted += self._conn.execute(
+                        "DELETE FROM cvr WHERE found = ? AND fetched_at < ?", (found, now - ttl)
+                    ).rowcount
+            self._conn.commit()
+        return deleted
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            total, found = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(found), 0) FROM cvr"
+            ).fetchone()
+        return {"total": total, "found": found, "negative": total - found}
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+def iter_responses(path: str) -> Iterator[Dict]:
+    """Læs gemte API-svar fra en JSON-fil (liste) eller JSONL-fil (ét svar pr. linje)."""
+    with open(path, "r", encoding="utf-8") as f:
+        first = f.read(1)
+        f.seek(0)
+        if first == "[":
+            yield from json.load(f)
+            return
+        for line in f:
+            line = line.strip()
+            if line:
+                yield json.loads(line)
+
+
+def import_responses(cache: CvrCache, path: str) -> int:
+    """Importér tidligere hentede svar (skal have "vat"). Returnerer antal importerede."""
+    return cache.put_many(
+        (data["vat"], data)
+        for data in iter_responses(path)
+        if isinstance(data, dict) and data.get("vat")
+    )
+
+
+def warm(cache: CvrCache, input_path: str, workers: int, rps: float, base_url: str) -> int:
+    """
+    Hent alle CVR-numre fra kundelisten, som ikke allerede ligger i cachen –
+    hvert nummer kun én gang, selv om det står flere gange i listen.
+    Returnerer antal hentede.
+    """
+    from fetch_cvr_data import fetch_all, read_customers
+
+    customers = list(read_customers(input_path))
+    unique = {normalize_cvr(cvr) for _, cvr in customers} - {""}
+    todo = set(cache.missing(cvr for _, cvr in customers))
+    pending = []
+    for customer in customers:
+        key = normalize_cvr(customer[1])
+        if key in todo:
+            todo.discard(key)
+            pending.append(customer)
+    print(f"{len(unique) - len(pending)} af {len(unique)} CVR-numre ligger allerede i cachen.")
+    fetch_all(pending, workers, rps, base_url, cache=cache)
+    return len(pending)
+
+
+def main() -> None:
+    from fetch_cvr_data import BASE_URL, MAX_WORKERS, REQUESTS_PER_SECOND, input_file
+
+    parser = argparse.ArgumentParser(description="Vedligehold CVR-cachen.")
+    parser.add_argument(
+        "--cache", default=CVR_CACHE_FILE, help=f"SQLite-fil (standard: {CVR_CACHE_FILE})"
+    )
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p_import = sub.add_parser("import", help="importér gemte API-svar (JSON eller JSONL)")
+    p_import.add_argument("files", nargs="+")
+
+    p_warm = sub.add_parser("warm", help="hent alle manglende CVR-numre fra en kundeliste")
+    p_warm.add_argument("input", nargs="?", default=input_file)
+    p_warm.add_argument("--workers", type=int, default=MAX_WORKERS)
+    p_warm.add_argument("--rps", type=float, default=REQUESTS_PER_SECOND)
+    p_warm.add_argument("--base-url", default=BASE_URL)
+
+    sub.add_parser("purge", help="slet udløbne poster")
+    sub.add_parser("stats", help="vis antal poster")
+    args = parser.parse_args()
+
+    cache = CvrCache(args.cache)
+    try:
+        if args.command == "import":
+            for path in args.files:
+                print(f"✅ {import_responses(cache, path)} svar importeret fra {path}")
+        elif args.command == "warm":
+            count = warm(cache, args.input, args.workers, args.rps, args.base_url)
+            print(f"✅ {count} CVR-numre hentet til {cache.path}")
+        elif args.command == "purge":
+            print(f"✅ {cache.purge_expired()} udløbne poster slettet")
+        stats = cache.stats()
+        print(f"Cache: {stats['total']} poster ({stats['found']} fundet, {stats['negative']} ikke fundet)")
+    finally:
+        cache.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,30 +1,79 @@
-import os
+import asyncio
+import re
 import time
-from typing import List, Dict, Tuple
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Generator, List, Optional, Tuple, Union
 
-from groq import Groq
+from groq import AsyncGroq, Groq
 
-from config import MODEL, MAX_OUTPUT_TOKENS, MODEL_OUTPUT_FILE
-from utils import clean_str
+from config import (
+    COMPLETION_PASSES,
+    INCREMENTAL_REANALYSIS,
+    MAX_OUTPUT_TOKENS,
+    MAX_PARALLEL_SHARDS,
+    MODEL,
+    REASON_TOKENS_PER_FEATURE,
+    RETRY_MAX_ATTEMPTS,
+    STREAM_CHECK_LINES,
+    STREAM_FORMAT_ATTEMPTS,
+    WEBSITE_LINE_TOKENS,
+    WEBSITE_MAX_TOKENS,
+)
+from cache import ResponseCache
+from client import get_async_client_with_key, get_client_with_key
+from feature_index import FeatureIndex
+from metrics import METRICS
+from model_log import get_log_writer
+from rate_limiter import KeyScheduler, NoUsableKeysError, estimate_tokens, parse_duration
+from retry import FATAL, KEY, RATE_LIMIT, backoff_delay, classify_error
+from usage import USAGE, usage_from_chunk, usage_from_completion
+from utils import label_companies, mask_key
+from websites import WebsiteTable
 
+UNKNOWN_WEBSITES = {"", "unknown", "ukendt", "n/a", "none"}
 
-def log_model_output(company_name: str, raw_text: str) -> None:
-    """Gemmer modellens svar (rå output) i en separat logfil."""
-    log_dir = os.path.dirname(MODEL_OUTPUT_FILE)
-    if log_dir:
-        os.makedirs(log_dir, exist_ok=True)
+RowCallback = Callable[[Dict[str, str]], None]
 
-    with open(MODEL_OUTPUT_FILE, "a", encoding="utf-8") as f:
-        f.write(f"\n{'='*80}\n")
-        f.write(f"Virksomhed: {company_name}\n")
-        f.write(f"Tidspunkt: {time.strftime('%Y-%m-%d %H:%M:%S')}\n")
-        f.write("-" * 80 + "\n")
-        f.write((raw_text or "").strip() + "\n")
 
+def log_model_output(
+    company_name: str,
+    raw_text: str,
+    api_key: Optional[str] = None,
+    attempt: Optional[int] = None,
+    latency: Optional[float] = None,
+    usage: Optional[Dict[str, int]] = None,
+) -> None:
+    """
+    Gemmer modellens svar (rå output) i loggen. Selve skrivningen sker i en
+    baggrundstråd, så kaldet returnerer med det samme.
+    """
+    get_log_writer().write({
+        "ts": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "label": company_name,
+        # "A | B" (pakket kald) og "A [2/3]" (shard) indekseres under A og B
+        "companies": label_companies(company_name),
+        "key_id": mask_key(api_key) if api_key else None,
+        "attempt": attempt,
+        "latency": round(latency, 3) if latency is not None else None,
+        "usage": usage,
+        "raw": (raw_text or "").strip(),
+    })
 
-def build_messages(company_name: str, features: List[str]) -> List[Dict[str, str]]:
-    """Bygger system- og brugermeddelelser til compound-modellen."""
+
+def build_messages(
+    company_name: str,
+    features: List[str],
+    website: Optional[str] = None,
+) -> List[Dict[str, str]]:
+    """
+    Bygger system- og brugermeddelelser til compound-modellen.
+    Er `website` allerede kendt, bedes modellen bruge den i stedet for at søge.
+    """
     features_str = "\n".join(f"- {f}" for f in features)
+    website_str = (
+        f"Kendt hjemmeside: {website} (brug denne – søg ikke efter en anden)\n\n"
+        if website else ""
+    )
 
     system_msg = {
         "role": "system",
@@ -49,7 +98,7 @@ def build_messages(company_name: str, features: List[str]) -> List[Dict[str, str
         "content": f"""
 Virksomhed: "{company_name}"
 
-Features:
+{website_str}Features:
 {features_str}
 
 Format KRAV (ingen ekstra tekst):
@@ -64,10 +113,11 @@ feature_navn;high|medium|low|unknown;kort forklaring på dansk
     return [system_msg, user_msg]
 
 
+@METRICS.timed("parse_seconds")
 def parse_compound_response(
     raw: str,
     company_name: str,
-    features: List[str],
+    features: Union[List[str], FeatureIndex],
 ) -> Tuple[str, List[Dict[str, str]]]:
     """
     Parser svar i formatet:
@@ -75,117 +125,1338 @@ def parse_compound_response(
       feature;relevance;reason
 
     Returnerer (website, rows) hvor rows er dicts klar til CSV.
+    Feature-navne matches via FeatureIndex (`features` må også være et færdigt indeks).
     """
     lines = [l.strip() for l in (raw or "").splitlines() if l.strip()]
     website = ""
     rows: List[Dict[str, str]] = []
 
-    # Lav et opslag så vi kan matche case-insensitivt på features
-    feature_map = {f.lower(): f for f in features}
+    # Indekset bygges én gang pr. feature-liste og genbruges for alle svar
+    index = FeatureIndex.for_features(features)
 
     for i, line in enumerate(lines):
-        parts = [p.strip() for p in line.split(";", 2)]
-
         # Første linje: website;URL (case-insensitiv)
-        if i == 0 and len(parts) >= 2 and parts[0].lower() == "website":
-            website = parts[1]
-            continue
-
-        if len(parts) < 3:
-            continue
-
-        raw_feature, raw_relevance, reason = parts[0], parts[1].lower(), parts[2]
-
-        # Match feature case-insensitivt
-        feature_key = raw_feature.lower()
-        if feature_key not in feature_map:
-            continue
-        feature = feature_map[feature_key]
+        if i == 0:
+            url = _parse_website_line(line)
+            if url is not None:
+                website = url
+                continue
 
-        if raw_relevance not in ["high", "medium", "low", "unknown"]:
+        parsed = _parse_feature_line(line, index)
+        if parsed is None:
             continue
+        feature, relevance, reason = parsed
 
         rows.append({
             "Company": company_name,
             "Website": website,
             "Feature": feature,
-            "Relevance": raw_relevance,
+            "Relevance": relevance,
             "Reason": reason,
         })
 
     return website, rows
 
 
-def analyze_company(
-    client: Groq,
-    company: Dict[str, str],
+def _parse_website_line(line: str) -> Optional[str]:
+    """Returnér URL'en fra en 'website;URL'-linje, eller None hvis linjen ikke er det."""
+    parts = [p.strip() for p in line.split(";", 2)]
+    if len(parts) >= 2 and parts[0].lower() == "website":
+        return parts[1]
+    return None
+
+
+def _parse_feature_line(
+    line: str,
+    index: FeatureIndex,
+) -> Optional[Tuple[str, str, str]]:
+    """Parser én 'feature;relevance;reason'-linje. None hvis linjen ikke er gyldig."""
+    parts = [p.strip() for p in line.split(";", 2)]
+    if len(parts) < 3:
+        return None
+
+    raw_feature, raw_relevance, reason = parts[0], parts[1].lower(), parts[2]
+
+    if raw_relevance not in ["high", "medium", "low", "unknown"]:
+        return None
+
+    # Match feature eksakt, normaliseret eller fuzzy (se FeatureIndex)
+    feature = index.match(raw_feature)
+    if feature is None:
+        return None
+
+    return feature, raw_relevance, reason
+
+
+class StreamFormatError(ValueError):
+    """Et streamet svar bryder formatet allerede i de første linjer."""
+
+
+class StreamParser:
+    """
+    Parser et compound-svar linje for linje, mens tokens strømmer ind.
+
+    Færdige feature-rækker samles i `rows`. Er første linje ikke 'website;URL',
+    eller giver de første `check_lines` linjer ingen gyldige feature-rækker,
+    kastes StreamFormatError, så kaldet kan afbrydes og prøves igen i stedet for
+    at vente på hele det ubrugelige svar.
+    """
+
+    def __init__(
+        self,
+        company_name: str,
+        features: List[str],
+        website: Optional[str] = None,
+        check_lines: int = STREAM_CHECK_LINES,
+    ):
+        self.company_name = company_name
+        self.known_website = website
+        self.check_lines = check_lines
+        self._index = FeatureIndex.for_features(features)
+        self.reset()
+
+    def reset(self) -> None:
+        """Start forfra – før hvert nyt forsøg, så et afbrudt svar ikke blandes med det næste."""
+        self.website = self.known_website or ""
+        self.rows: List[Dict[str, str]] = []
+        self._chunks: List[str] = []
+        self._pending = ""
+        self._lines_seen = 0
+
+    @property
+    def raw(self) -> str:
+        return "".join(self._chunks).strip()
+
+    def feed(self, text: str) -> None:
+        if not text:
+            return
+        self._chunks.append(text)
+        self._pending += text
+        *complete, self._pending = self._pending.split("\n")
+        for line in complete:
+            self._handle_line(line)
+
+    def close(self) -> None:
+        """Behandl en sidste linje uden afsluttende linjeskift."""
+        if self._pending:
+            line, self._pending = self._pending, ""
+            self._handle_line(line)
+
+    def _handle_line(self, line: str) -> None:
+        line = line.strip()
+        if not line:
+            return
+        self._lines_seen += 1
+
+        if self._lines_seen == 1:
+            url = _parse_website_line(line)
+            if url is None:
+                raise StreamFormatError(f"Første linje er ikke 'website;URL': {line[:80]!r}")
+            if not self.known_website:
+                self.website = url
+            return
+
+        parsed = _parse_feature_line(line, self._index)
+        if parsed is not None:
+            feature, relevance, reason = parsed
+            row = {
+                "Company": self.company_name,
+                "Website": self.website,
+                "Feature": feature,
+                "Relevance": relevance,
+                "Reason": reason,
+            }
+            self.rows.append(row)
+        elif not self.rows and self._lines_seen > self.check_lines:
+            raise StreamFormatError(
+                f"Ingen gyldige feature-linjer i de første {self.check_lines} linjer"
+            )
+
+
+def estimate_output_tokens(features: List[str]) -> int:
+    """Groft estimat af svarlængden: website-linjen + én linje (navn + begrundelse) pr. feature."""
+    return WEBSITE_LINE_TOKENS + sum(
+        len(f) // 4 + REASON_TOKENS_PER_FEATURE for f in features
+    )
+
+
+def shard_features(features: List[str], budget: int = MAX_OUTPUT_TOKENS) -> List[List[str]]:
+    """
+    Del feature-listen op, så hvert svar forventes at kunne være inden for `budget`
+    output-tokens. Returnerer én shard (hele listen), når der ikke er behov for deling.
+    """
+    shards: List[List[str]] = []
+    current: List[str] = []
+    used = WEBSITE_LINE_TOKENS
+
+    for f in features:
+        cost = len(f) // 4 + REASON_TOKENS_PER_FEATURE
+        if current and used + cost > budget:
+            shards.append(current)
+            current, used = [], WEBSITE_LINE_TOKENS
+        current.append(f)
+        used += cost
+
+    if current or not shards:
+        shards.append(current)
+    return shards
+
+
+def _merge_shard_answers(
+    company_name: str,
+    shards: List[List[str]],
+    answers: List[object],
+    website: str,
+) -> Tuple[str, List[Dict[str, str]]]:
+    """
+    Saml rækkerne fra alle shards. `answers` er rå tekst eller en exception pr. shard;
+    fejlede shards springes over (og logges), så resten af svaret ikke går tabt.
+    """
+    raws: List[str] = []
+    rows: List[Dict[str, str]] = []
+
+    for i, (shard, answer) in enumerate(zip(shards, answers), start=1):
+        if isinstance(answer, Exception):
+            _report_error(f"{company_name} [shard {i}/{len(shards)}]", answer, None)
+            continue
+        raws.append(answer)
+        _, shard_rows = parse_compound_response(answer, company_name, shard)
+        for row in shard_rows:
+            # Alle shards deler den hjemmeside, som første shard fandt
+            row["Website"] = website or row["Website"]
+        rows.extend(shard_rows)
+
+    if not rows:
+        raise ValueError("Ingen gyldige feature-linjer i nogen shard")
+    return "\n".join(raws), rows
+
+
+PACK_HEADER = re.compile(r"^\s*#{2,}\s*(\d+)\s*[:.)\-]?\s*(.*?)\s*#*\s*$")
+
+
+def build_packed_messages(
+    company_names: List[str],
     features: List[str],
+    websites: Optional[List[Optional[str]]] = None,
 ) -> List[Dict[str, str]]:
     """
-    Kalder modellen for én virksomhed og returnerer en liste af rækker til CSV.
-    Crasher ikke scriptet – ved fejl returneres en tom liste.
+    Bygger ét kald for flere virksomheder. Svaret skal have én sektion pr.
+    virksomhed, indledt af '### <nummer>: <navn>', med samme format som ved
+    enkeltkald (website-linje + én linje pr. feature).
+    Kendte hjemmesider (samme rækkefølge som `company_names`) skrives med i listen.
+    """
+    system_msg, _ = build_messages(company_names[0], features)
+    features_str = "\n".join(f"- {f}" for f in features)
+    websites = websites or [None] * len(company_names)
+    companies_str = "\n".join(
+        f'{i}. "{name}"' + (f" – kendt hjemmeside: {url}" if url else "")
+        for i, (name, url) in enumerate(zip(company_names, websites), start=1)
+    )
+
+    packed_system = {
+        "role": "system",
+        "content": system_msg["content"] + (
+            "\nDu får flere virksomheder i samme besked. Svar med én sektion pr. virksomhed, "
+            "i samme rækkefølge, og start hver sektion med linjen '### <nummer>: <navn>'."
+        ),
+    }
+
+    user_msg = {
+        "role": "user",
+        "content": f"""
+Virksomheder:
+{companies_str}
+
+Features (gælder for alle virksomheder):
+{features_str}
+
+Format KRAV (ingen ekstra tekst), gentaget for hver virksomhed:
+
+### 1: Virksomhedens navn
+website;https://virksomhedens-website.her
+feature_navn;high|medium|low|unknown;kort forklaring på dansk
+...
+### 2: Næste virksomhed
+...
+""".strip(),
+    }
+
+    return [packed_system, user_msg]
+
+
+def split_packed_response(raw: str, company_names: List[str]) -> List[str]:
+    """
+    Deler et pakket svar op i én tekstsektion pr. virksomhed (samme rækkefølge
+    som `company_names`). Sektioner findes via nummeret i '### n: navn' og,
+    hvis nummeret mangler eller er forkert, via navnet. Manglende virksomheder
+    får en tom sektion.
+    """
+    by_name = {name.strip().lower(): i for i, name in enumerate(company_names)}
+    sections: List[List[str]] = [[] for _ in company_names]
+    current: Optional[int] = None
+
+    for line in (raw or "").splitlines():
+        m = PACK_HEADER.match(line)
+        if m:
+            number, name = int(m.group(1)), m.group(2).strip().strip('"').lower()
+            if name in by_name:
+                current = by_name[name]
+            elif 1 <= number <= len(company_names):
+                current = number - 1
+            else:
+                current = None
+            continue
+        if current is not None:
+            sections[current].append(line)
+
+    return ["\n".join(lines).strip() for lines in sections]
+
+
+def parse_packed_response(
+    raw: str,
+    company_names: List[str],
+    features: List[str],
+) -> List[Tuple[str, List[Dict[str, str]]]]:
+    """
+    Demultiplexer et pakket svar: returnerer (sektionstekst, rows) pr. virksomhed.
+    En virksomhed med tomme rows mangler i svaret og bør spørges om igen.
+    """
+    result = []
+    for name, section in zip(company_names, split_packed_response(raw, company_names)):
+        _, rows = parse_compound_response(section, name, features)
+        result.append((section, rows))
+    return result
+
+
+def _completion_text(completion) -> str:
+    """Udtræk den rå tekst fra et completion-svar (str eller liste af dele)."""
+    content = completion.choices[0].message.content
+
+    if isinstance(content, list):
+        return "".join(
+            str(c.get("text", "")) if isinstance(c, dict) else str(c)
+            for c in content
+        ).strip()
+    return (content or "").strip()
+
+
+def _rows_from_raw(
+    raw: str,
+    company_name: str,
+    features: List[str],
+) -> List[Dict[str, str]]:
+    """Parser et råt svar og kaster ValueError hvis formatet er forkert."""
+    if not raw:
+        raise ValueError("Tomt svar fra modellen")
+
+    _, rows = parse_compound_response(raw, company_name, features)
+
+    if not rows:
+        # Hvis ingen rows, så er format forkert → kast fejl så vi kan håndtere det
+        raise ValueError("Ingen gyldige feature-linjer i svaret")
+    return rows
+
+
+def _retry_after(error: Exception) -> Optional[float]:
+    """Læs retry-after fra fejlens HTTP-svar, hvis SDK'et har vedhæftet det."""
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None)
+    if not headers:
+        return None
+    return parse_duration(headers.get("retry-after"))
+
+
+def _request_kwargs(
+    messages: List[Dict[str, str]],
+    max_tokens: int,
+    stream: bool = False,
+) -> Dict[str, object]:
+    kwargs: Dict[str, object] = {
+        "model": MODEL,
+        "messages": messages,
+        "temperature": 0.1,
+        "max_tokens": max_tokens,
+    }
+    if stream:
+        kwargs["stream"] = True
+    return kwargs
+
+
+def _read_stream(stream, parser: StreamParser) -> Tuple[str, object, int]:
+    """
+    Før et streamet svar gennem parseren; luk forbindelsen hvis formatet brydes.
+    Returnerer (rå tekst, usage fra sidste chunk, antal værktøjskald).
+    """
+    usage, tool_calls = None, 0
+    try:
+        for chunk in stream:
+            chunk_usage, chunk_tools = usage_from_chunk(chunk)
+            usage = chunk_usage or usage
+            tool_calls += chunk_tools
+            if chunk.choices:
+                parser.feed(chunk.choices[0].delta.content or "")
+        parser.close()
+    except StreamFormatError:
+        METRICS.inc("stream_aborts_total")
+        stream.close()
+        raise
+    return parser.raw, usage, tool_calls
+
+
+async def _read_stream_async(stream, parser: StreamParser) -> Tuple[str, object, int]:
+    """Async-udgaven af _read_stream."""
+    usage, tool_calls = None, 0
+    try:
+        async for chunk in stream:
+            chunk_usage, chunk_tools = usage_from_chunk(chunk)
+            usage = chunk_usage or usage
+            tool_calls += chunk_tools
+            if chunk.choices:
+                parser.feed(chunk.choices[0].delta.content or "")
+        parser.close()
+    except StreamFormatError:
+        METRICS.inc("stream_aborts_total")
+        await stream.close()
+        raise
+    return parser.raw, usage, tool_calls
+
+
+def _account(
+    label: str,
+    api_key: Optional[str],
+    scheduler: Optional[KeyScheduler],
+    cost: int,
+    usage,
+    tool_calls: int,
+    latency: float,
+) -> Dict[str, int]:
+    """Registrér kaldets forbrug og erstat token-estimatet i budgettet med det faktiske."""
+    stats = USAGE.record(label, api_key, usage, tool_calls, latency)
+    METRICS.observe("model_latency_seconds", latency)
+    METRICS.inc("model_tokens_total", stats["total_tokens"])
+    if scheduler is not None and usage is not None:
+        scheduler.settle(cost, stats["total_tokens"])
+    return stats
+
+
+def _on_failure(
+    error: Exception,
+    attempt: int,
+    label: str,
+    api_key: Optional[str],
+    scheduler: Optional[KeyScheduler],
+) -> Optional[float]:
+    """
+    Klassificér en fejl fra et modelkald (se retry.classify_error).
+
+    Returnerer None, hvis et nyt forsøg ikke kan hjælpe (kalderen kaster fejlen
+    videre), ellers hvor længe kalderen selv skal vente: med en scheduler spærres
+    nøglen i stedet i backoff-tiden, så næste forsøg straks kan gå til en anden
+    nøgle (0 s); uden scheduler ventes der på den eneste klient. En afvist nøgle
+    (401/403) tages permanent ud af schedulerens rotation.
     """
-    messages = build_messages(company["name"], features)
+    kind = classify_error(error)
+    METRICS.inc("model_errors_total", kind=kind)
+    if kind == RATE_LIMIT:
+        METRICS.inc("rate_limited_total")
+    if kind == FATAL or (kind == KEY and scheduler is None):
+        return None
 
-    last_raw = None
-    last_error = None
+    if kind == KEY:
+        scheduler.disable(api_key)
+        METRICS.inc("keys_disabled_total")
+        print(f"\n[DEBUG] Nøgle {mask_key(api_key)} er afvist og bruges ikke mere ({label}: {error})")
+        return 0.0
 
-    for attempt in range(3):
+    delay = backoff_delay(attempt, _retry_after(error))
+    if scheduler is None or api_key is None:
+        return delay
+
+    if scheduler.report_failure(api_key, delay):
+        METRICS.inc("breaker_open_total")
+        print(
+            f"\n[DEBUG] Nøgle {mask_key(api_key)} hviler {scheduler.breaker_cooldown:.0f}s "
+            f"efter gentagne fejl ({label}: {kind}, {error})"
+        )
+    return 0.0
+
+
+def _report_error(label: str, error: Exception, last_raw) -> None:
+    print(f"\n[DEBUG] Problem med {label}: {error}")
+    if last_raw:
+        print("[DEBUG] Rått svar fra model:")
+        print(last_raw)
+
+
+def _on_response(scheduler: Optional[KeyScheduler], api_key: Optional[str], headers) -> None:
+    """Et svar er modtaget: synkronisér nøglens spande og nulstil dens fejltæller."""
+    if scheduler is not None:
+        scheduler.update_from_headers(api_key, headers)
+        scheduler.report_success(api_key)
+
+
+def _parse_completion(completion) -> Tuple[str, Any, int]:
+    """(rå tekst, usage, antal tool calls) fra et ikke-streamet svar."""
+    return (_completion_text(completion), *usage_from_completion(completion))
+
+
+def _finish(
+    label: str,
+    api_key: Optional[str],
+    scheduler: Optional[KeyScheduler],
+    cost: int,
+    attempt: int,
+    started: float,
+    raw: str,
+    usage,
+    tool_calls: int,
+) -> str:
+    """Bogfør forbruget, log svaret og returnér den rå tekst."""
+    latency = time.monotonic() - started
+    stats = _account(label, api_key, scheduler, cost, usage, tool_calls, latency)
+    log_model_output(label, raw, api_key, attempt + 1, latency, stats)
+    return raw
+
+
+def _retry_delay(
+    error: Exception,
+    attempt: int,
+    label: str,
+    api_key: Optional[str],
+    scheduler: Optional[KeyScheduler],
+    cost: int,
+    answered: bool,
+) -> Optional[float]:
+    """
+    Et forsøg fejlede: giv token-estimatet tilbage, hvis svaret aldrig kom, og
+    returnér pausen før næste forsøg (None = giv op, se _on_failure).
+    """
+    if scheduler is not None and api_key is not None and not answered:
+        # Intet svar, intet forbrug; et afbrudt svar beholder estimatet
+        scheduler.refund(api_key, cost)
+    return _on_failure(error, attempt, label, api_key, scheduler)
+
+
+def _complete(
+    client: Optional[Groq],
+    messages: List[Dict[str, str]],
+    label: str,
+    scheduler: Optional[KeyScheduler] = None,
+    max_tokens: int = MAX_OUTPUT_TOKENS,
+    parser: Optional[StreamParser] = None,
+) -> str:
+    """
+    Ét modelkald med retry ved rate limit, timeouts, 5xx og nøglefejl
+    (se _on_failure). Returnerer den rå tekst.
+
+    Med en `parser` streames svaret og parses linje for linje undervejs;
+    bryder det formatet, afbrydes kaldet med StreamFormatError.
+
+    Med en `scheduler` vælges nøglen pr. forsøg ud fra ledig kapacitet (og
+    `client` ignoreres), og et fejlet forsøg prøves igen på en anden nøgle;
+    uden scheduler bruges `client` som hidtil. Fejl som et nyt forsøg ikke
+    kan rette (fx 400 eller StreamFormatError), kastes videre med det samme.
+    Token-estimatet, som acquire trak, gives tilbage for forsøg der fejler før
+    svaret kommer, og erstattes ellers af det faktiske forbrug (_account).
+    """
+    cost = estimate_tokens(messages, max_tokens)
+    last_error: Optional[Exception] = None
+
+    for attempt in range(RETRY_MAX_ATTEMPTS):
+        api_key = None
+        answered = False
+        if attempt:
+            METRICS.inc("retries_total")
         try:
-            completion = client.chat.completions.create(
-                model=MODEL,
-                messages=messages,
-                temperature=0.1,
-                max_tokens=MAX_OUTPUT_TOKENS,
+            if scheduler is not None:
+                api_key = scheduler.acquire(cost)
+                client = get_client_with_key(api_key)
+
+            started = time.monotonic()
+            response = client.chat.completions.with_raw_response.create(
+                **_request_kwargs(messages, max_tokens, stream=parser is not None)
             )
+            answered = True
+            _on_response(scheduler, api_key, response.headers)
+
+            if parser is not None:
+                parser.reset()
+                raw, usage, tool_calls = _read_stream(response.parse(), parser)
+            else:
+                raw, usage, tool_calls = _parse_completion(response.parse())
+            return _finish(label, api_key, scheduler, cost, attempt, started, raw, usage, tool_calls)
 
-            msg = completion.choices[0].message
-            content = msg.content
+        except Exception as e:
+            delay = _retry_delay(e, attempt, label, api_key, scheduler, cost, answered)
+            if delay is None:
+                raise
+            last_error = e
+            if delay:
+                time.sleep(delay)
 
-            if isinstance(content, list):
-                raw = "".join(
-                    str(c.get("text", "")) if isinstance(c, dict) else str(c)
-                    for c in content
-                ).strip()
+        finally:
+            if scheduler is not None and api_key is not None:
+                scheduler.release(api_key)
+
+    raise RuntimeError(
+        f"Opgav efter {RETRY_MAX_ATTEMPTS} forsøg: {last_error}"
+    ) from last_error
+
+
+async def _complete_async(
+    client: Optional[AsyncGroq],
+    messages: List[Dict[str, str]],
+    label: str,
+    scheduler: Optional[KeyScheduler] = None,
+    max_tokens: int = MAX_OUTPUT_TOKENS,
+    parser: Optional[StreamParser] = None,
+) -> str:
+    """Async-udgaven af _complete til AsyncGroq-klienten."""
+    cost = estimate_tokens(messages, max_tokens)
+    last_error: Optional[Exception] = None
+
+    for attempt in range(RETRY_MAX_ATTEMPTS):
+        api_key = None
+        answered = False
+        if attempt:
+            METRICS.inc("retries_total")
+        try:
+            if scheduler is not None:
+                api_key = await scheduler.acquire_async(cost)
+                client = get_async_client_with_key(api_key)
+
+            started = time.monotonic()
+            response = await client.chat.completions.with_raw_response.create(
+                **_request_kwargs(messages, max_tokens, stream=parser is not None)
+            )
+            answered = True
+            _on_response(scheduler, api_key, response.headers)
+
+            if parser is not None:
+                parser.reset()
+                raw, usage, tool_calls = await _read_stream_async(await response.parse(), parser)
             else:
-                raw = (content or "").strip()
+                raw, usage, tool_calls = _parse_completion(await response.parse())
+            return _finish(label, api_key, scheduler, cost, attempt, started, raw, usage, tool_calls)
+
+        except Exception as e:
+            delay = _retry_delay(e, attempt, label, api_key, scheduler, cost, answered)
+            if delay is None:
+                raise
+            last_error = e
+            if delay:
+                await asyncio.sleep(delay)
 
-            log_model_output(company["name"], raw)
-            last_raw = raw
+        finally:
+            if scheduler is not None and api_key is not None:
+                scheduler.release(api_key)
 
-            if not raw:
-                raise ValueError("Tomt svar fra modellen")
+    raise RuntimeError(
+        f"Opgav efter {RETRY_MAX_ATTEMPTS} forsøg: {last_error}"
+    ) from last_error
 
-            _, rows = parse_compound_response(raw, company["name"], features)
 
-            if rows:
-                return rows
+# ========== ANALYSE-FORLØB (fælles for sync og async) ==========
+#
+# Selve analysen (prompts, shards, parsing, opfølgning, fletning, cache) skrives
+# én gang som generatorer, der ikke selv laver I/O: de yielder et _Call, når de
+# skal bruge et modelsvar, eller et _Parallel med under-forløb, og får svaret
+# tilbage med send() – eller fejlen kastet ind med throw(). _drive kører et
+# forløb med _complete og tråde, _drive_async med _complete_async og asyncio.
 
-            # Hvis ingen rows, så er format forkert → kast fejl så vi kan håndtere det
-            raise ValueError("Ingen gyldige feature-linjer i svaret")
+Flow = Generator[object, object, Any]
+
+
+class _Call:
+    """Ét modelkald, som et forløb beder driveren om; svaret er den rå tekst."""
+
+    def __init__(
+        self,
+        messages: List[Dict[str, str]],
+        label: str,
+        max_tokens: int = MAX_OUTPUT_TOKENS,
+        parser: Optional[StreamParser] = None,
+    ):
+        self.messages = messages
+        self.label = label
+        self.max_tokens = max_tokens
+        self.parser = parser
 
+
+class _Parallel:
+    """
+    Flere under-forløb, der køres samtidigt. Svaret er en liste med hvert
+    forløbs returværdi – eller den exception, det endte med – i samme rækkefølge.
+    `max_workers` begrænser trådene i _drive; async-driveren starter dem alle,
+    og scheduleren styrer, hvor mange kald der reelt er i gang.
+    """
+
+    def __init__(self, flows: List[Flow], max_workers: int = MAX_PARALLEL_SHARDS):
+        self.flows = flows
+        self.max_workers = max_workers
+
+
+def _drive(flow: Flow, client: Optional[Groq], scheduler: Optional[KeyScheduler]) -> Any:
+    """Kør et forløb synkront og returnér dets returværdi."""
+    answer: object = None
+    error: Optional[Exception] = None
+    while True:
+        try:
+            step = flow.send(answer) if error is None else flow.throw(error)
+        except StopIteration as stop:
+            return stop.value
+        answer, error = None, None
+        try:
+            if isinstance(step, _Parallel):
+                answer = _drive_parallel(step, client, scheduler)
+            else:
+                answer = _complete(
+                    client, step.messages, step.label, scheduler, step.max_tokens, step.parser
+                )
+        except Exception as e:
+            error = e
+
+
+def _drive_parallel(
+    step: _Parallel,
+    client: Optional[Groq],
+    scheduler: Optional[KeyScheduler],
+) -> List[object]:
+    def run(flow: Flow) -> object:
+        try:
+            return _drive(flow, client, scheduler)
         except Exception as e:
+            return e
+
+    if len(step.flows) < 2 or step.max_workers < 2:
+        return [run(flow) for flow in step.flows]
+    with ThreadPoolExecutor(max_workers=min(len(step.flows), step.max_workers)) as pool:
+        return list(pool.map(run, step.flows))
+
+
+async def _drive_async(
+    flow: Flow,
+    client: Optional[AsyncGroq],
+    scheduler: Optional[KeyScheduler],
+) -> Any:
+    """Async-udgaven af _drive."""
+    answer: object = None
+    error: Optional[Exception] = None
+    while True:
+        try:
+            step = flow.send(answer) if error is None else flow.throw(error)
+        except StopIteration as stop:
+            return stop.value
+        answer, error = None, None
+        try:
+            if isinstance(step, _Parallel):
+                answer = list(await asyncio.gather(
+                    *(_drive_async(f, client, scheduler) for f in step.flows),
+                    return_exceptions=True,
+                ))
+            else:
+                answer = await _complete_async(
+                    client, step.messages, step.label, scheduler, step.max_tokens, step.parser
+                )
+        except Exception as e:
+            error = e
+
+
+def _streamed_flow(
+    messages: List[Dict[str, str]],
+    label: str,
+    company_name: str,
+    features: List[str],
+    website: Optional[str] = None,
+) -> Flow:
+    """
+    Streamet kald: svaret parses undervejs, og bryder det formatet, afbrydes
+    det og prøves igen (højst STREAM_FORMAT_ATTEMPTS gange). Returnerer (rå tekst, rows).
+    """
+    last_error: Optional[Exception] = None
+
+    for _ in range(STREAM_FORMAT_ATTEMPTS):
+        parser = StreamParser(company_name, features, website)
+        try:
+            raw = yield _Call(messages, label, parser=parser)
+        except StreamFormatError as e:
+            log_model_output(f"{label} [afbrudt]", parser.raw)
             last_error = e
-            s = str(e).lower()
+            continue
+        return raw, parser.rows
+
+    raise last_error
+
+
+def _shard_flow(
+    company_name: str,
+    shard: List[str],
+    label: str,
+    website: Optional[str],
+    stream: bool,
+) -> Flow:
+    """Ét shard-kald; med `stream` streames og formattjekkes det ligesom et enkeltkald."""
+    messages = build_messages(company_name, shard, website)
+    if stream:
+        raw, _ = yield from _streamed_flow(messages, label, company_name, shard, website)
+        return raw
+    return (yield _Call(messages, label))
+
+
+def _sharded_flow(
+    company_name: str,
+    shards: List[List[str]],
+    website: Optional[str] = None,
+    stream: bool = False,
+) -> Flow:
+    """
+    Kører alle shards for én virksomhed og fletter dem. Er hjemmesiden ikke
+    kendt, finder første shard den, og de øvrige shards får den i prompten.
+    Shards med kendt hjemmeside køres parallelt. Med `stream` streames hvert
+    shard-kald (se _streamed_flow). Returnerer (samlet rå tekst, rows).
+    """
+    n = len(shards)
+    answers: List[object] = []
+    start = 0
+
+    if not website:
+        first = yield from _shard_flow(
+            company_name, shards[0], f"{company_name} [1/{n}]", None, stream
+        )
+        website, _ = parse_compound_response(first, company_name, shards[0])
+        answers.append(first)
+        start = 1
+
+    answers.extend((yield _Parallel([
+        _shard_flow(company_name, shards[i], f"{company_name} [{i + 1}/{n}]", website or None, stream)
+        for i in range(start, n)
+    ])))
+
+    return _merge_shard_answers(company_name, shards, answers, website)
+
+
+def _with_website(rows: List[Dict[str, str]], website: Optional[str]) -> List[Dict[str, str]]:
+    """Brug den kendte hjemmeside i alle rækker (modellen kan have skrevet den lidt anderledes)."""
+    if website:
+        for row in rows:
+            row["Website"] = website
+    return rows
+
+
+def _deliver(rows: List[Dict[str, str]], on_row: Optional[RowCallback]) -> None:
+    if on_row is not None:
+        for row in rows:
+            on_row(row)
+
+
+def _assess_flow(
+    company_name: str,
+    features: List[str],
+    website: Optional[str] = None,
+    stream: bool = False,
+) -> Flow:
+    """
+    Feature-vurderingen for én virksomhed (med sharding ved lange feature-lister;
+    med `stream` streames hvert kald, også hver shard).
+    Rækkerne sendes ikke videre herfra – det gør analyze_company, når hele
+    virksomheden er lykkedes, så et fejlet forsøg aldrig efterlader rækker i output.
+    """
+    shards = shard_features(features)
+    if len(shards) > 1:
+        return (yield from _sharded_flow(company_name, shards, website, stream))
+
+    messages = build_messages(company_name, features, website)
+    if stream:
+        raw, rows = yield from _streamed_flow(
+            messages, company_name, company_name, features, website
+        )
+        if not rows:
+            raise ValueError("Ingen gyldige feature-linjer i svaret")
+        return raw, rows
+
+    raw = yield _Call(messages, company_name)
+    return raw, _with_website(_rows_from_raw(raw, company_name, features), website)
+
+
+# ========== WEBSITE-TRIN (to-trins-kørsel) ==========
+
+
+def build_website_messages(company_name: str) -> List[Dict[str, str]]:
+    """Kort prompt der kun beder om virksomhedens officielle hjemmeside."""
+    return [
+        {
+            "role": "system",
+            "content": (
+                "Du er en research-assistent med adgang til web-søgning via groq/compound værktøjer. "
+                "Find den mest sandsynlige officielle hjemmeside for virksomheden.\n"
+                "Svar KUN med én linje i formatet: website;URL\n"
+                "Kan du ikke finde den, så svar: website;unknown"
+            ),
+        },
+        {"role": "user", "content": f'Virksomhed: "{company_name}"'},
+    ]
+
+
+def parse_website_response(raw: str) -> str:
+    """Find URL'en i et 'website;URL'-svar. Returnerer "" hvis den ikke blev fundet."""
+    for line in (raw or "").splitlines():
+        url = _parse_website_line(line.strip())
+        if url is not None:
+            return "" if url.lower() in UNKNOWN_WEBSITES else url
+    return ""
+
+
+def _website_flow(company_name: str, websites: WebsiteTable) -> Flow:
+    """Slå hjemmesiden op i tabellen, eller find den med et kort modelkald og gem den."""
+    known = websites.get(company_name)
+    if known is not None:
+        return known
+
+    raw = yield _Call(
+        build_website_messages(company_name),
+        f"{company_name} [website]",
+        max_tokens=WEBSITE_MAX_TOKENS,
+    )
+    url = parse_website_response(raw)
+    websites.put(company_name, url)
+    return url
+
+
+def _remember_website(
+    websites: Optional[WebsiteTable],
+    company_name: str,
+    rows: List[Dict[str, str]],
+) -> None:
+    """Gem en hjemmeside, som modellen selv fandt under feature-vurderingen."""
+    if websites is None or not rows or not rows[0].get("Website"):
+        return
+    if not websites.get(company_name):
+        websites.put(company_name, rows[0]["Website"], source="assessment")
+
+
+# ========== OPFØLGNING PÅ MANGLENDE FEATURES ==========
+
+
+def _missing_features(features: List[str], rows: List[Dict[str, str]]) -> List[str]:
+    missing = FeatureIndex.for_features(features).missing(rows)
+    if missing:
+        METRICS.inc("missing_features_total", len(missing))
+    return missing
+
+
+def _merge_rows(
+    raw: str,
+    rows: List[Dict[str, str]],
+    extra_raw: str,
+    extra_rows: List[Dict[str, str]],
+    wanted: List[str],
+    metric: str,
+) -> Tuple[str, List[Dict[str, str]]]:
+    """Tilføj et opfølgende svars rækker for `wanted` (aldrig dubletter) og tæl dem i `metric`."""
+    wanted_set = set(wanted)
+    extra = [r for r in extra_rows if r["Feature"] in wanted_set]
+    METRICS.inc(metric, len(extra))
+    return f"{raw}\n{extra_raw}", rows + extra
+
+
+def _followup_flow(
+    company_name: str,
+    wanted: List[str],
+    raw: str,
+    rows: List[Dict[str, str]],
+    stream: bool,
+    what: str,
+    metric: str,
+) -> Flow:
+    """
+    Spørg kun om features i `wanted`, med den allerede fundne hjemmeside i
+    prompten, og flet svaret ind (_merge_rows). Returnerer (rå tekst, rows, ok);
+    fejler kaldet, returneres det vi allerede har med ok=False. Er alle nøgler
+    ubrugelige, kastes fejlen videre, så kørslen kan stoppe.
+    """
+    website = rows[0].get("Website") or None
+    try:
+        extra_raw, extra_rows = yield from _assess_flow(company_name, wanted, website, stream)
+    except NoUsableKeysError:
+        raise
+    except Exception as e:
+        _report_error(f"{company_name} [{len(wanted)} {what}]", e, None)
+        return raw, rows, False
+    return (*_merge_rows(raw, rows, extra_raw, extra_rows, wanted, metric), True)
+
+
+def _fill_missing_flow(
+    company_name: str,
+    features: List[str],
+    raw: str,
+    rows: List[Dict[str, str]],
+    stream: bool,
+) -> Flow:
+    """
+    Dækker svaret ikke hele feature-listen, spørges der (højst COMPLETION_PASSES
+    gange) kun om de manglende features (_followup_flow). Fejler
+    opfølgningen, beholdes det, vi allerede har.
+    """
+    for _ in range(COMPLETION_PASSES):
+        missing = _missing_features(features, rows)
+        if not missing:
+            break
+        raw, rows, ok = yield from _followup_flow(
+            company_name, missing, raw, rows, stream, "manglende features", "followup_features_total"
+        )
+        if not ok:
+            break
+    return raw, rows
+
+
+# ========== INKREMENTEL GENANALYSE (ændret features.xlsx) ==========
+
+
+def _previous_answer(
+    cache: Optional[ResponseCache],
+    company_name: str,
+    features: List[str],
+) -> Optional[Tuple[str, List[Dict[str, str]]]]:
+    """
+    Cachens seneste svar for virksomheden, lavet med en anden feature-liste:
+    rækkerne for features, der stadig findes, genbruges; rækker for fjernede
+    features er forældede og udelades. None hvis intet kan genbruges.
+    """
+    if cache is None or not INCREMENTAL_REANALYSIS:
+        return None
+    previous = cache.latest(company_name)
+    if previous is None:
+        return None
+    raw, rows = previous
+    current = set(features)
+    kept = [r for r in rows if r["Feature"] in current]
+    if not kept:
+        return None
+    METRICS.inc("stale_features_total", len(rows) - len(kept))
+    return raw, kept
+
+
+def _new_features(features: List[str], rows: List[Dict[str, str]]) -> List[str]:
+    """Features som det genbrugte svar ikke dækker – kun dem spørges der om."""
+    METRICS.inc("reused_features_total", len(rows))
+    return FeatureIndex.for_features(features).missing(rows)
+
+
+def _reanalyze_flow(
+    company_name: str,
+    features: List[str],
+    previous: Tuple[str, List[Dict[str, str]]],
+    stream: bool,
+) -> Flow:
+    """
+    Genbrug `previous` (se _previous_answer) og spørg kun om de nye features.
+    Returnerer (rå tekst, rows, komplet). Fejler kaldet for de nye features,
+    returneres de genbrugte rækker alene med komplet=False, så de stadig
+    leveres, men ikke gemmes i cachen under den nye feature-liste.
+    """
+    raw, rows = previous
+    new = _new_features(features, rows)
+    if not new:
+        return raw, rows, True
+    return (yield from _followup_flow(
+        company_name, new, raw, rows, stream, "nye features", "incremental_features_total"
+    ))
+
+
+def _status(previous: Optional[Tuple[str, List[Dict[str, str]]]], complete: bool) -> str:
+    if previous is None:
+        return "analyzed"
+    return "incremental" if complete else "partial"
+
+
+# ========== ANALYSE AF ÉN VIRKSOMHED ==========
 
-            # Ved rate limit → prøv igen
-            if "rate limit" in s or "429" in s:
-                time.sleep(1.5 * (attempt + 1))
-                continue
 
-            # Anden fejl → log og stop forsøg for denne virksomhed
-            print(f"\n[DEBUG] Problem med {company['name']}: {e}")
-            if last_raw:
-                print("[DEBUG] Rått svar fra model:")
-                print(last_raw)
+def _analyze_flow(
+    company: Dict[str, str],
+    features: List[str],
+    cache: Optional[ResponseCache],
+    websites: Optional[WebsiteTable],
+    on_row: Optional[RowCallback],
+    stream: bool,
+) -> Flow:
+    """Forløbet bag analyze_company og analyze_company_async (se analyze_company)."""
+    with METRICS.timer("analyze_seconds", mode="single"):
+        name = company["name"]
+        if cache is not None:
+            hit = cache.get(name, features)
+            if hit is not None:
+                METRICS.inc("companies_total", status="cached")
+                _deliver(hit[1], on_row)
+                return hit[1]
+        previous = _previous_answer(cache, name, features)
+
+        raw = None
+        complete = True
+        try:
+            if previous is not None:
+                raw, rows, complete = yield from _reanalyze_flow(name, features, previous, stream)
+            else:
+                website = (yield from _website_flow(name, websites)) if websites is not None else ""
+                raw, rows = yield from _assess_flow(name, features, website or None, stream)
+            raw, rows = yield from _fill_missing_flow(name, features, raw, rows, stream)
+        except Exception as e:
+            _report_error(name, e, raw)
+            METRICS.inc("companies_total", status="failed")
             return []
 
-    # Hvis vi ender her efter flere forsøg:
-    print(f"\n[DEBUG] Kunne ikke få gyldigt svar for {company['name']} efter flere forsøg.")
-    if last_raw:
-        print("[DEBUG] Sidste rå svar fra model:")
-        print(last_raw)
-    if last_error:
-        print("[DEBUG] Sidste fejl:", last_error)
+        METRICS.inc("companies_total", status=_status(previous, complete))
+        _deliver(rows, on_row)
+        _remember_website(websites, name, rows)
+        if cache is not None and complete:
+            cache.put(name, features, raw, rows)
+        return rows
+
+
+def analyze_company(
+    client: Optional[Groq],
+    company: Dict[str, str],
+    features: List[str],
+    scheduler: Optional[KeyScheduler] = None,
+    cache: Optional[ResponseCache] = None,
+    websites: Optional[WebsiteTable] = None,
+    on_row: Optional[RowCallback] = None,
+    stream: bool = False,
+) -> List[Dict[str, str]]:
+    """
+    Kalder modellen for én virksomhed og returnerer en liste af rækker til CSV.
+    Crasher ikke scriptet – ved fejl returneres en tom liste.
+
+    Er feature-listen for lang til MAX_OUTPUT_TOKENS, deles den i shards
+    (se shard_features), som køres parallelt og flettes sammen.
+
+    Med en `scheduler` vælges nøglen pr. forsøg ud fra ledig kapacitet (og
+    `client` ignoreres); uden scheduler bruges `client` som hidtil.
+    Med en `cache` genbruges tidligere svar uden API-kald, og nye gyldige svar gemmes.
+    Med en `websites`-tabel køres to trin: først findes (eller genbruges) hjemmesiden,
+    derefter vurderes features med den kendte URL i prompten.
+    `on_row` får virksomhedens rækker samlet, når den er lykkedes – aldrig rækker
+    fra et fejlet eller afbrudt forsøg, så output og journal altid stemmer overens.
+    Med `stream=True` streames svaret og parses undervejs, og et svar der bryder
+    formatet afbrydes og prøves igen.
+    Mangler svaret nogle features, spørges der bagefter kun om dem (_fill_missing_flow).
+    Er feature-listen ændret siden cachens seneste svar, genbruges det, og der
+    spørges kun om de nye features (_reanalyze_flow); fejler det kald, leveres de
+    genbrugte rækker alene (status "partial") og gemmes ikke i cachen.
+    """
+    return _drive(
+        _analyze_flow(company, features, cache, websites, on_row, stream), client, scheduler
+    )
+
 
-    return []
+async def analyze_company_async(
+    client: Optional[AsyncGroq],
+    company: Dict[str, str],
+    features: List[str],
+    scheduler: Optional[KeyScheduler] = None,
+    cache: Optional[ResponseCache] = None,
+    websites: Optional[WebsiteTable] = None,
+    on_row: Optional[RowCallback] = None,
+    stream: bool = False,
+) -> List[Dict[str, str]]:
+    """
+    Async-udgaven af analyze_company til AsyncGroq-klienten.
+    Samme forløb (_analyze_flow); kun modelkaldene er async.
+    """
+    return await _drive_async(
+        _analyze_flow(company, features, cache, websites, on_row, stream), client, scheduler
+    )
+
+
+# ========== PAKKEDE KALD (flere virksomheder pr. kald) ==========
+
+
+def _packed_plan(
+    companies: List[Dict[str, str]],
+    features: List[str],
+    cache: Optional[ResponseCache],
+) -> Tuple[List[Optional[List[Dict[str, str]]]], List[int]]:
+    """
+    Slå virksomhederne op i cachen; returnér (resultater, index der skal spørges om).
+    Virksomheder med et svar for en tidligere feature-liste pakkes ikke, men
+    genanalyseres inkrementelt enkeltvis (resultatet forbliver None).
+    """
+    results: List[Optional[List[Dict[str, str]]]] = [None] * len(companies)
+    todo: List[int] = []
+    for i, company in enumerate(companies):
+        hit = cache.get(company["name"], features) if cache is not None else None
+        if hit is not None:
+            METRICS.inc("companies_total", status="cached")
+            results[i] = hit[1]
+        elif cache is None or not INCREMENTAL_REANALYSIS or cache.latest(company["name"]) is None:
+            todo.append(i)
+    return results, todo
+
+
+def _packed_label(label: str, i: int, n: int) -> str:
+    return label if n == 1 else f"{label} [{i + 1}/{n}]"
+
+
+def _packed_websites(
+    raw: str,
+    names: List[str],
+    shard: List[str],
+    known: List[Optional[str]],
+) -> List[Optional[str]]:
+    """Kendte hjemmesider suppleret med dem, første shards pakkede svar fandt."""
+    found: List[Optional[str]] = []
+    for name, url, section in zip(names, known, split_packed_response(raw, names)):
+        if not url:
+            url, _ = parse_compound_response(section, name, shard)
+        found.append(url or None)
+    return found
+
+
+def _split_packed_answer(
+    answers: List[object],
+    shards: List[List[str]],
+    names: List[str],
+    known: List[Optional[str]],
+) -> List[Optional[Tuple[str, List[Dict[str, str]]]]]:
+    """
+    Fordel de pakkede svar (ét pr. feature-shard; rå tekst eller exception) på
+    virksomhederne i `names` og flet hver virksomheds shards til (rå tekst, rows).
+    None for en virksomhed, der ikke fik nogen gyldige rækker.
+    """
+    label = " | ".join(names)
+    sections: List[List[str]] = [[] for _ in names]
+    merged: List[List[Dict[str, str]]] = [[] for _ in names]
+
+    for i, (shard, answer) in enumerate(zip(shards, answers)):
+        if isinstance(answer, Exception):
+            _report_error(_packed_label(label, i, len(shards)), answer, None)
+            continue
+        for pos, (section, rows) in enumerate(parse_packed_response(answer, names, shard)):
+            sections[pos].append(section)
+            merged[pos].extend(rows)
+
+    # Alle shards deler den hjemmeside, som første shard fandt
+    return [
+        ("\n".join(sections[pos]), _with_website(rows, known[pos] or rows[0]["Website"]))
+        if rows else None
+        for pos, rows in enumerate(merged)
+    ]
+
+
+def _pack_websites_flow(names: List[str], websites: WebsiteTable) -> Flow:
+    """Website-trinnet for en pakke; en hjemmeside der ikke kunne slås op, finder det pakkede kald."""
+    found = yield _Parallel([_website_flow(name, websites) for name in names])
+    known: List[Optional[str]] = []
+    for name, url in zip(names, found):
+        if isinstance(url, Exception):
+            _report_error(f"{name} [website]", url, None)
+            url = None
+        known.append(url or None)
+    return known
+
+
+def _pack_flow(
+    companies: List[Dict[str, str]],
+    features: List[str],
+    cache: Optional[ResponseCache],
+    websites: Optional[WebsiteTable],
+    on_row: Optional[RowCallback],
+    stream: bool,
+) -> Flow:
+    """Forløbet bag analyze_pack og analyze_pack_async (se analyze_pack)."""
+    with METRICS.timer("analyze_seconds", mode="pack"):
+        results, todo = _packed_plan(companies, features, cache)
+
+        if len(todo) > 1:
+            names = [companies[i]["name"] for i in todo]
+            known: List[Optional[str]] = [None] * len(names)
+            if websites is not None:
+                known = yield from _pack_websites_flow(names, websites)
+            label = " | ".join(names)
+            shards = shard_features(features)
+            n = len(shards)
+
+            def call(i: int) -> Flow:
+                return (yield _Call(
+                    build_packed_messages(names, shards[i], known),
+                    _packed_label(label, i, n),
+                    max_tokens=MAX_OUTPUT_TOKENS * len(todo),
+                ))
+
+            answers = yield _Parallel([call(0)])
+            if n > 1 and not isinstance(answers[0], Exception):
+                known = _packed_websites(answers[0], names, shards[0], known)
+                answers.extend((yield _Parallel([call(i) for i in range(1, n)])))
+
+            split = _split_packed_answer(answers, shards, names, known)
+            answered = [pos for pos, answer in enumerate(split) if answer is not None]
+            filled = yield _Parallel([
+                _fill_missing_flow(names[pos], features, *split[pos], stream) for pos in answered
+            ])
+            for pos, answer in zip(answered, filled):
+                if isinstance(answer, Exception):
+                    # Spørges om enkeltvis nedenfor
+                    continue
+                raw, rows = answer
+                METRICS.inc("companies_total", status="analyzed")
+                results[todo[pos]] = rows
+                _remember_website(websites, names[pos], rows)
+                if cache is not None:
+                    cache.put(names[pos], features, raw, rows)
+
+        missing = [i for i, rows in enumerate(results) if rows is None]
+        for rows in results:
+            if rows is not None:
+                _deliver(rows, on_row)
+        # Én ad gangen i _drive: on_row (fx CSV-skriveren) kaldes fra én tråd
+        retried = yield _Parallel(
+            [_analyze_flow(companies[i], features, cache, websites, on_row, stream) for i in missing],
+            max_workers=1,
+        )
+        for i, rows in zip(missing, retried):
+            results[i] = rows
+
+        return [rows if isinstance(rows, list) else [] for rows in results]
+
+
+def analyze_pack(
+    client: Optional[Groq],
+    companies: List[Dict[str, str]],
+    features: List[str],
+    scheduler: Optional[KeyScheduler] = None,
+    cache: Optional[ResponseCache] = None,
+    websites: Optional[WebsiteTable] = None,
+    on_row: Optional[RowCallback] = None,
+    stream: bool = False,
+) -> List[List[Dict[str, str]]]:
+    """
+    Analyserer flere virksomheder i ét kald (se build_packed_messages).
+    Virksomheder der mangler eller er ugyldige i det pakkede svar, spørges om
+    enkeltvis bagefter. Returnerer rækkerne pr. virksomhed i input-rækkefølge.
+    Kræver feature-listen sharding, sendes ét pakket kald pr. feature-shard:
+    det første finder hjemmesiderne, og de øvrige får dem i prompten og køres
+    parallelt. Med en `websites`-tabel findes hjemmesiderne først (som i
+    analyze_company) og sendes med i prompten. Mangler en virksomheds svar
+    features, spørges der om dem (_fill_missing_flow), før rækkerne leveres og
+    caches. Rækkerne sendes til `on_row` pr. virksomhed; kun kaldene efter det
+    pakkede kald kan streames.
+    """
+    return _drive(
+        _pack_flow(companies, features, cache, websites, on_row, stream), client, scheduler
+    )
+
+
+async def analyze_pack_async(
+    client: Optional[AsyncGroq],
+    companies: List[Dict[str, str]],
+    features: List[str],
+    scheduler: Optional[KeyScheduler] = None,
+    cache: Optional[ResponseCache] = None,
+    websites: Optional[WebsiteTable] = None,
+    on_row: Optional[RowCallback] = None,
+    stream: bool = False,
+) -> List[List[Dict[str, str]]]:
+    """Async-udgaven af analyze_pack; manglende virksomheder spørges om samtidigt."""
+    return await _drive_async(
+        _pack_flow(companies, features, cache, websites, on_row, stream), client, scheduler
+    )
@@ -0,0 +1,284 @@
+"""
+Offline benchmark af hele pipelinen (main.py) mod den lokale stand-in-server i
+fake_groq.py – uden netværk og uden at bruge kvote, så tallene kan gentages og
+køres i CI.
+
+For hver størrelse skrives syntetiske virksomheds- og feature-projektmapper i
+en midlertidig mappe (samme relative stier som i config.py), og main.py køres
+i en underproces derfra med GROQ_BASE_URL peget mod serveren. Rapporten viser
+virksomheder/s, p50/p99-latens pr. modelkald og pr. virksomhed samt
+hukommelsesforbrug (peak RSS).
+
+Eksempler:
+    python benchmark.py --sizes 50,200,1000
+    python benchmark.py --sizes 200 --rate-limit 0.05 --malformed 0.02 -- --async --stream
+    python benchmark.py --output bench.json --baseline bench_main.json --tolerance 0.2
+
+Argumenter efter "--" sendes uændret videre til main.py.
+"""
+import argparse
+import csv
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, List, Optional
+
+from openpyxl import Workbook
+
+from config import (
+    COMPANIES_FILE,
+    COMPANY_SHEET_CONFIG,
+    FEATURES_COL_NAME,
+    FEATURES_FILE,
+    FEATURES_SHEET,
+    FEATURES_START_ROW,
+)
+from fake_groq import FakeGroqServer, add_scenario_args, scenario_from_args
+
+DEFAULT_SIZES = "50,200,1000"
+
+
+def _ensure_dir(path: str) -> None:
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+
+
+def write_workbooks(root: str, companies: int, features: int) -> None:
+    """Skriv syntetiske input-filer under `root` med de stier og ark, config.py forventer."""
+    companies_path = os.path.join(root, COMPANIES_FILE)
+    _ensure_dir(companies_path)
+
+    sheets = list(COMPANY_SHEET_CONFIG)
+    wb = Workbook(write_only=True)
+    for s, sheet_name in enumerate(sheets):
+        ws = wb.create_sheet(sheet_name)
+        # start_row rækker springes over af companies.py – den første er headeren;
+        # navnet skal stå i kolonne D
+        skipped = COMPANY_SHEET_CONFIG[sheet_name].get("start_row", 0)
+        for r in range(skipped):
+            ws.append(["CVR", "Kunde", "Branche", "Navn"] if r == 0 else [])
+        for i in range(s, companies, len(sheets)):
+            ws.append([str(10_000_000 + i), None, sheet_name, f"Virksomhed {i:05d} ApS"])
+    wb.save(companies_path)
+
+    features_path = os.path.join(root, FEATURES_FILE)
+    _ensure_dir(features_path)
+    names = [f"Syntetisk feature {i:03d}" for i in range(features)]
+
+    if FEATURES_FILE.endswith(".csv"):
+        with open(features_path, "w", newline="", encoding="utf-8") as f:
+            f.write("\n" * FEATURES_START_ROW)
+            writer = csv.writer(f)
+            writer.writerow([FEATURES_COL_NAME])
+            writer.writerows([n] for n in names)
+        return
+
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet(FEATURES_SHEET or "Features")
+    for _ in range(FEATURES_START_ROW):
+        ws.append([])
+    ws.append([FEATURES_COL_NAME])
+    for name in names:
+        ws.append([name])
+    wb.save(features_path)
+
+
+def _peak_memory_mb() -> Optional[float]:
+    try:
+        import resource
+    except ImportError:  # Windows
+        return None
+    # ru_maxrss er i KB på Linux (bytes på macOS)
+    divisor = 1024 * 1024 if sys.platform == "darwin" else 1024
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / divisor
+
+
+def run_child(spec_path: str) -> None:
+    """Underprocessen: kør main.main() i den syntetiske projektmappe og gem målingerne."""
+    with open(spec_path, encoding="utf-8") as f:
+        spec = json.load(f)
+
+    # Skal ske før main importeres, da modulerne binder config-værdier ved import
+    import config
+    config.API_KEYS = spec["keys"]
+    config.RATE_LIMIT_REQUESTS_PER_MINUTE = spec["rpm"]
+    config.RATE_LIMIT_TOKENS_PER_MINUTE = spec["tpm"]
+
+    import main as pipeline
+    from metrics import METRICS
+
+    sys.argv = ["main.py", "--metrics", "runs/metrics.json", *spec["main_args"]]
+    started = time.perf_counter()
+    pipeline.main()
+    seconds = time.perf_counter() - started
+
+    outcomes = {s: METRICS.counter("companies_total", status=s) for s in ("analyzed", "incremental", "cached", "failed")}
+    result = {
+        "seconds": round(seconds, 3),
+        "load_seconds": round(
+            sum(h["sum"] for h in METRICS.to_json()["histograms"]
+                if h["name"].endswith("load_seconds")), 3
+        ),
+        "companies": sum(outcomes.values()),
+        **outcomes,
+        "model_p50": METRICS.quantile("model_latency_seconds", 0.5),
+        "model_p99": METRICS.quantile("model_latency_seconds", 0.99),
+        "company_p50": METRICS.quantile("analyze_seconds", 0.5, mode="single"),
+        "company_p99": METRICS.quantile("analyze_seconds", 0.99, mode="single"),
+        "retries": METRICS.counter("retries_total"),
+        "peak_mb": _peak_memory_mb(),
+    }
+    with open(spec["result"], "w", encoding="utf-8") as f:
+        json.dump(result, f)
+
+
+def run_size(
+    server: FakeGroqServer,
+    size: int,
+    args: argparse.Namespace,
+    root: str,
+) -> Dict[str, object]:
+    """Én benchmark-kørsel med `size` virksomheder; returnerer målingerne."""
+    write_workbooks(root, size, args.features)
+
+    spec_path = os.path.join(root, "bench_spec.json")
+    result_path = os.path.join(root, "bench_result.json")
+    with open(spec_path, "w", encoding="utf-8") as f:
+        json.dump({
+            "keys": [f"bench_key_{i + 1}" for i in range(args.keys)],
+            "rpm": args.rpm,
+            "tpm": args.tpm,
+            "main_args": args.main_args,
+            "result": result_path,
+        }, f)
+
+    log_path = os.path.join(root, "pipeline.log")
+    server.reset_stats()
+    with open(log_path, "w", encoding="utf-8") as log:
+        proc = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), "--child", spec_path],
+            cwd=root,
+            env={**os.environ, "GROQ_BASE_URL": server.url},
+            stdin=subprocess.DEVNULL,  # ingen terminal → main.py kører alle batches
+            stdout=None if args.verbose else log,
+            stderr=subprocess.STDOUT,
+        )
+    if proc.returncode != 0:
+        with open(log_path, encoding="utf-8") as log:
+            tail = log.read()[-2000:]
+        raise RuntimeError(f"main.py fejlede ved {size} virksomheder (exit {proc.returncode}):\n{tail}")
+
+    with open(result_path, encoding="utf-8") as f:
+        result = json.load(f)
+    result["size"] = size
+    result["features"] = args.features
+    result["companies_per_s"] = round(result["companies"] / result["seconds"], 3) if result["seconds"] else 0.0
+    result["server"] = server.reset_stats()
+    return result
+
+
+def format_report(results: List[Dict[str, object]]) -> str:
+    header = (
+        f"{'virks.':>7} {'tid (s)':>8} {'virks./s':>9} {'kald p50/p99 (s)':>17} "
+        f"{'virks. p50/p99 (s)':>19} {'RSS (MB)':>9} {'429':>5} {'fejl':>5}"
+    )
+    lines = [header, "-" * len(header)]
+    for r in results:
+        peak = f"{r['peak_mb']:.0f}" if r["peak_mb"] is not None else "?"
+        lines.append(
+            f"{r['size']:>7} {r['seconds']:>8.1f} {r['companies_per_s']:>9.2f} "
+            f"{r['model_p50']:>8.2f}/{r['model_p99']:<8.2f} "
+            f"{r['company_p50']:>9.2f}/{r['company_p99']:<9.2f} "
+            f"{peak:>9} {r['server'].get('rate_limited', 0):>5} {r['failed']:>5g}"
+        )
+    lines.append("(p50/p99 er estimater fra metrics-histogrammerne; fejl = virksomheder uden rækker)")
+    return "\n".join(lines)
+
+
+def compare_baseline(results: List[Dict[str, object]], baseline_path: str, tolerance: float) -> List[str]:
+    """Størrelser hvor virksomheder/s er faldet mere end `tolerance` i forhold til baseline."""
+    with open(baseline_path, encoding="utf-8") as f:
+        baseline = {r["size"]: r for r in json.load(f)["results"]}
+
+    regressions = []
+    for r in results:
+        base = baseline.get(r["size"])
+        if base is None:
+            continue
+        floor = base["companies_per_s"] * (1 - tolerance)
+        if r["companies_per_s"] < floor:
+            regressions.append(
+                f"{r['size']} virksomheder: {r['companies_per_s']:.2f}/s "
+                f"(baseline {base['companies_per_s']:.2f}/s, grænse {floor:.2f}/s)"
+            )
+    return regressions
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Offline benchmark af pipelinen mod en lokal fake Groq-server.")
+    parser.add_argument("--sizes", default=DEFAULT_SIZES, help=f"antal virksomheder pr. kørsel (standard: {DEFAULT_SIZES})")
+    parser.add_argument("--features", type=int, default=30, help="antal syntetiske features")
+    parser.add_argument("--keys", type=int, default=2, help="antal (falske) API-nøgler")
+    parser.add_argument("--rpm", type=float, default=1e9, help="klientens request-loft pr. nøgle (standard: intet)")
+    parser.add_argument("--tpm", type=float, default=1e12, help="klientens token-loft pr. nøgle (standard: intet)")
+    add_scenario_args(parser)
+    parser.add_argument("--output", help="gem resultaterne som JSON")
+    parser.add_argument("--baseline", help="tidligere --output; exit 1 ved regression i virksomheder/s")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="tilladt fald i forhold til baseline (0.2 = 20 %%)")
+    parser.add_argument("--keep", action="store_true", help="behold kørselsmapperne (resultater, logs, metrics)")
+    parser.add_argument("--verbose", action="store_true", help="vis main.py's output")
+    parser.add_argument("main_args", nargs=argparse.REMAINDER, help="argumenter til main.py efter --")
+    args = parser.parse_args()
+    if args.main_args[:1] == ["--"]:
+        args.main_args = args.main_args[1:]
+    return args
+
+
+def main():
+    if sys.argv[1:2] == ["--child"]:
+        run_child(sys.argv[2])
+        return
+
+    args = parse_args()
+    sizes = [int(s) for s in args.sizes.split(",") if s.strip()]
+    results = []
+
+    with FakeGroqServer(scenario_from_args(args)) as server:
+        print(f"Fake Groq på {server.url} · main.py {' '.join(args.main_args) or '(standard)'}\n")
+        for size in sizes:
+            root = tempfile.mkdtemp(prefix=f"bench_{size}_")
+            try:
+                result = run_size(server, size, args, root)
+            finally:
+                if not args.keep:
+                    shutil.rmtree(root, ignore_errors=True)
+            results.append(result)
+            kept = f" · {root}" if args.keep else ""
+            print(f"{size} virksomheder: {result['companies_per_s']:.2f}/s, {result['server']}{kept}")
+
+    print()
+    print(format_report(results))
+
+    if args.output:
+        _ensure_dir(args.output)
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"main_args": args.main_args, "results": results}, f, ensure_ascii=False, indent=2)
+        print(f"\nResultater gemt i: {args.output}")
+
+    if args.baseline:
+        regressions = compare_baseline(results, args.baseline, args.tolerance)
+        if regressions:
+            print("\n⚠️  Langsommere end baseline:")
+            for line in regressions:
+                print(f"  {line}")
+            raise SystemExit(1)
+        print(f"\nIngen regression i forhold til {args.baseline} (tolerance {args.tolerance:.0%}).")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,197 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from config import (
+    CACHE_FILE,
+    CACHE_MAX_ENTRIES,
+    CACHE_TTL_DAYS,
+    MODEL,
+    PROMPT_VERSION,
+)
+
+
+def features_hash(features: Sequence[str]) -> str:
+    """Stabil hash af feature-listen (uafhængig af rækkefølge)."""
+    joined = "\n".join(sorted(features))
+    return hashlib.sha256(joined.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """
+    Vedvarende SQLite-cache for compound-modellens svar.
+
+    Nøglen er (virksomhedsnavn, hash af feature-listen, MODEL, PROMPT_VERSION),
+    så et ændret prompt-format eller en ny feature-liste automatisk giver nye kald.
+    Der gemmes både det rå svar og de parsede rækker. Poster ældre end
+    `ttl_days` ignoreres og ryddes op, og ved mere end `max_entries` poster
+    smides de mindst nyligt brugte ud.
+    """
+
+    def __init__(
+        self,
+        path: str = CACHE_FILE,
+        ttl_days: Optional[float] = CACHE_TTL_DAYS,
+        max_entries: Optional[int] = CACHE_MAX_ENTRIES,
+    ):
+        cache_dir = os.path.dirname(path)
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+
+        self.path = path
+        self.ttl_seconds = ttl_days * 86400 if ttl_days else None
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS responses (
+                key           TEXT PRIMARY KEY,
+                company       TEXT NOT NULL,
+                model         TEXT NOT NULL,
+                prompt_version TEXT NOT NULL,
+                features_hash TEXT NOT NULL,
+                raw           TEXT NOT NULL,
+                rows          TEXT NOT NULL,
+                created_at    REAL NOT NULL,
+                accessed_at   REAL NOT NULL
+            )
+            """
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed_at)"
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS responses_company ON responses (company, created_at)"
+        )
+        self._conn.commit()
+        self.purge_expired()
+
+    @staticmethod
+    def make_key(company_name: str, feature_hash: str) -> str:
+        parts = [company_name, feature_hash, MODEL, PROMPT_VERSION]
+        return hashlib.sha256("\x1f".join(parts).encode("utf-8")).hexdigest()
+
+    def get(
+        self,
+        company_name: str,
+        features: Sequence[str],
+    ) -> Optional[Tuple[str, List[Dict[str, str]]]]:
+        """Returnér (raw, rows) for virksomheden, eller None hvis der ikke er et gyldigt hit."""
+        key = self.make_key(company_name, features_hash(features))
+        now = time.time()
+
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT raw, rows, created_at FROM responses WHERE key = ?",
+                (key,),
+            ).fetchone()
+
+            if row is None or (self.ttl_seconds and now - row[2] > self.ttl_seconds):
+                self.misses += 1
+                return None
+
+            self._conn.execute(
+                "UPDATE responses SET accessed_at = ? WHERE key = ?", (now, key)
+            )
+            self._conn.commit()
+            self.hits += 1
+
+        return row[0], json.loads(row[1])
+
+    def latest(self, company_name: str) -> Optional[Tuple[str, List[Dict[str, str]]]]:
+        """
+        Det nyeste gyldige svar for virksomheden uanset feature-liste (samme MODEL
+        og PROMPT_VERSION) som (raw, rows) – grundlaget for inkrementel genanalyse,
+        når features.xlsx er ændret. Tæller ikke som hit/miss.
+        """
+        with self._lock:
+            row = self._conn.execute(
+                """
+                SELECT raw, rows, created_at FROM responses
+                WHERE company = ? AND model = ? AND prompt_version = ?
+                ORDER BY created_at DESC LIMIT 1
+                """,
+                (company_name, MODEL, PROMPT_VERSION),
+            ).fetchone()
+        if row is None or (self.ttl_seconds and time.time() - row[2] > self.ttl_seconds):
+            return None
+        return row[0], json.loads(row[1])
+
+    def contains(self, company_name: str, features: Sequence[str]) -> bool:
+        """Om der er et gyldigt svar (uden at tælle som hit/miss eller opdatere LRU)."""
+        key = self.make_key(company_name, features_hash(features))
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT created_at FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+        return row is not None and not (
+            self.ttl_seconds and time.time() - row[0] > self.ttl_seconds
+        )
+
+    def put(
+        self,
+        company_name: str,
+        features: Sequence[str],
+        raw: str,
+        rows: List[Dict[str, str]],
+    ) -> None:
+        feature_hash = features_hash(features)
+        key = self.make_key(company_name, feature_hash)
+        now = time.time()
+
+        with self._lock:
+            self._conn.execute(
+                """
+                INSERT OR REPLACE INTO responses
+                    (key, company, model, prompt_version, features_hash,
+                     raw, rows, created_at, accessed_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                """,
+                (
+                    key, company_name, MODEL, PROMPT_VERSION, feature_hash,
+                    raw, json.dumps(rows, ensure_ascii=False), now, now,
+                ),
+            )
+            self._evict()
+            self._conn.commit()
+
+    def _evict(self) -> None:
+        """Smid de mindst nyligt brugte poster ud, hvis cachen er for stor."""
+        if not self.max_entries:
+            return
+        (count,) = self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()
+        overflow = count - self.max_entries
+        if overflow > 0:
+            self._conn.execute(
+                """
+                DELETE FROM responses WHERE key IN (
+                    SELECT key FROM responses ORDER BY accessed_at ASC LIMIT ?
+                )
+                """,
+                (overflow,),
+            )
+
+    def purge_expired(self) -> int:
+        """Slet poster ældre end TTL. Returnerer antal slettede."""
+        if not self.ttl_seconds:
+            return 0
+        with self._lock:
+            cur = self._conn.execute(
+                "DELETE FROM responses WHERE created_at < ?",
+                (time.time() - self.ttl_seconds,),
+            )
+            self._conn.commit()
+            return cur.rowcount
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
@@ -1,11 +1,47 @@
-from groq import Groq
+from functools import lru_cache
+from typing import Dict
 
+from groq import AsyncGroq, Groq
 
+from config import GROQ_BASE_URL
+
+# AsyncGroq-klienter er bundet til den event loop de bruges i, så de
+# genbruges kun inden for én kørsel og lukkes med close_async_clients().
+_async_clients: Dict[str, AsyncGroq] = {}
+
+
+@lru_cache(maxsize=None)
 def get_client_with_key(api_key: str) -> Groq:
-    """Returnér en Groq-klient for den givne API-nøgle."""
+    """Returnér en Groq-klient for den givne API-nøgle (én klient pr. nøgle)."""
     if not api_key:
         raise RuntimeError("API key mangler!")
     return Groq(
         api_key=api_key,
+        base_url=GROQ_BASE_URL,
+        max_retries=0,  # retry og nøgleskift styres af analyzer._complete (se retry.py)
         default_headers={"Groq-Model-Version": "latest"},
     )
+
+
+def get_async_client_with_key(api_key: str) -> AsyncGroq:
+    """Returnér en AsyncGroq-klient for den givne API-nøgle (én klient pr. nøgle)."""
+    if not api_key:
+        raise RuntimeError("API key mangler!")
+    client = _async_clients.get(api_key)
+    if client is None:
+        client = AsyncGroq(
+            api_key=api_key,
+            base_url=GROQ_BASE_URL,
+            max_retries=0,
+            default_headers={"Groq-Model-Version": "latest"},
+        )
+        _async_clients[api_key] = client
+    return client
+
+
+async def close_async_clients() -> None:
+    """Luk alle AsyncGroq-klienter (kaldes når en async-kørsel er færdig)."""
+    clients = list(_async_clients.values())
+    _async_clients.clear()
+    for client in clients:
+        await client.close()
@@ -1,47 +1,57 @@
-import pandas as pd
 from typing import List, Dict
 
 from config import COMPANIES_FILE, COMPANY_SHEET_CONFIG
-from utils import clean_str
+from metrics import METRICS
+from ingest import cached_columns, clean_column, open_workbook, read_columns
 
+COMPANY_COLUMN = 4  # kolonne D
 
-def load_companies() -> List[Dict[str, str]]:
-    """
-    Læs virksomhedsnavne fra de konfigurerede ark i COMPANIES_FILE.
-    Returnerer en liste af dicts: {"name": ..., "sheet": ...}
-    """
-    xls = pd.ExcelFile(COMPANIES_FILE)
-    companies: List[Dict[str, str]] = []
-    seen = set()
-
-    for sheet_name, cfg in COMPANY_SHEET_CONFIG.items():
-        if sheet_name not in xls.sheet_names:
-            print(f"Advarsel: ark '{sheet_name}' findes ikke i {COMPANIES_FILE}, springer over.")
-            continue
-
-        start_row = cfg.get("start_row", 0)
-
-        df = pd.read_excel(
-            xls,
-            sheet_name=sheet_name,
-            usecols="D",      # kolonne D
-            header=None,      # ingen header
-            skiprows=start_row,
-        )
 
-        for _, row in df.iterrows():
-            name = clean_str(row.iloc[0])
-            if not name:
+def _parse_companies() -> Dict[str, list]:
+    """Læs kolonne D fra alle konfigurerede ark (én åbning af filen) og rens/dedupliker vektoriseret."""
+    with open_workbook(COMPANIES_FILE) as wb:
+        available = set(wb.sheetnames)
+        sheets = []
+        for sheet_name in COMPANY_SHEET_CONFIG:
+            if sheet_name not in available:
+                print(f"Advarsel: ark '{sheet_name}' findes ikke i {COMPANIES_FILE}, springer over.")
                 continue
+            sheets.append(sheet_name)
 
-            key = (name, sheet_name)
-            if key in seen:
-                continue
-            seen.add(key)
+        # start_row er antal rækker der springes over, så første læste Excel-række er start_row + 1
+        first_rows = [COMPANY_SHEET_CONFIG[s].get("start_row", 0) + 1 for s in sheets]
+        values = read_columns(
+            wb, [(s, COMPANY_COLUMN, first_row) for s, first_row in zip(sheets, first_rows)]
+        )
 
-            companies.append({
-                "name": name,
-                "sheet": sheet_name,
-            })
+    columns: Dict[str, list] = {"name": [], "sheet": [], "row": []}
+    for sheet_name, first_row, sheet_values in zip(sheets, first_rows, values):
+        names = clean_column(sheet_values).drop_duplicates()
+        columns["name"].extend(names.tolist())
+        columns["sheet"].extend([sheet_name] * len(names))
+        columns["row"].extend((names.index + first_row).tolist())
 
-    return companies
+    return columns
+
+
+@METRICS.timed("load_seconds", stage="companies")
+def load_companies() -> List[Dict[str, str]]:
+    """
+    Læs virksomhedsnavne fra de konfigurerede ark i COMPANIES_FILE.
+    Returnerer en liste af dicts: {"name": ..., "sheet": ..., "row": ...}
+    (row = rækkenummeret i Excel).
+
+    Resultatet gemmes som snapshot og genbruges, så længe filen og
+    ark-konfigurationen er uændrede.
+    """
+    columns = cached_columns(
+        "companies",
+        COMPANIES_FILE,
+        [(s, cfg.get("start_row", 0)) for s, cfg in COMPANY_SHEET_CONFIG.items()],
+        _parse_companies,
+    )
+
+    return [
+        {"name": name, "sheet": sheet, "row": row}
+        for name, sheet, row in zip(columns["name"], columns["sheet"], columns["row"])
+    ]
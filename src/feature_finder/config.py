@@ -1,8 +1,12 @@
+import os
 from datetime import datetime
 
 # ========== LOGGING ==========
 
-MODEL_OUTPUT_FILE = f"logs/model_outputs_{datetime.now().strftime('%Y-%m-%d_%H-%M-%S')}.txt"
+# Modellens rå svar skrives komprimeret i baggrunden (se model_log.py)
+MODEL_LOG_DIR = "logs"
+MODEL_LOG_NAME = f"model_outputs_{datetime.now().strftime('%Y-%m-%d_%H-%M-%S')}"
+MODEL_LOG_ROTATE_BYTES = 64 * 1024 * 1024   # ny datafil efter ca. 64 MB
 
 # ========== FEATURES-FIL ==========
 
@@ -39,8 +43,24 @@ COMPANY_SHEET_CONFIG = {
 # ========== MODEL ==========
 
 MODEL = "groq/compound-mini"
+# Anden API-adresse, fx den lokale stand-in-server i fake_groq.py (None = Groqs egen)
+GROQ_BASE_URL = os.environ.get("GROQ_BASE_URL") or None
 MAX_OUTPUT_TOKENS = 400
 
+# Estimat af svarlængden; bliver den større end MAX_OUTPUT_TOKENS, deles features i shards
+WEBSITE_LINE_TOKENS = 30         # "website;URL"
+REASON_TOKENS_PER_FEATURE = 30   # relevance + kort begrundelse pr. feature-linje
+MAX_PARALLEL_SHARDS = 4          # shards pr. virksomhed der kører samtidigt
+
+# Tæl op når build_messages/parse_compound_response ændres, så gamle cache-svar ignoreres
+PROMPT_VERSION = "1"
+
+# ========== SVAR-CACHE ==========
+
+CACHE_FILE = "data/cache/responses.sqlite"
+CACHE_TTL_DAYS = 30          # None = gem for evigt
+CACHE_MAX_ENTRIES = 200_000  # ældste (mindst brugte) svar smides ud over denne grænse
+
 # ========== API-KEYS & BATCHES ==========
 
 API_KEYS = [
@@ -51,3 +71,95 @@ API_KEYS = [
 
 BATCH_SIZE = 8  # antal virksomheder pr. batch
 
+# ========== JOURNAL / GENOPTAGELSE ==========
+
+JOURNAL_FILE = "runs/journal.jsonl"  # append-only log over færdige virksomheder
+
+# Samlet, indekseret database over alle kørslers resultater (se results_store.py)
+RESULTS_DB_FILE = "data/processed/results.sqlite"
+
+# Token-forbrug pr. nøgle/ark/virksomhed for kørslen (fra completion.usage)
+USAGE_FILE = f"runs/usage_{datetime.now().strftime('%Y-%m-%d_%H-%M-%S')}.json"
+
+# ========== SHARDING (flere maskiner) ==========
+
+# Nøgler pr. shard ved --shard i/N, fx {1: ["gsk_a"], 2: ["gsk_b", "gsk_c"]};
+# shards der ikke står her bruger API_KEYS
+SHARD_API_KEYS = {}
+
+# ========== FEATURE-MATCHING ==========
+
+FUZZY_MATCH_THRESHOLD = 0.75   # min. Dice-lighed (trigrammer) for et fuzzy feature-match
+FUZZY_MATCH_CANDIDATES = 10    # kandidater der scores efter trigram-blocking
+
+# ========== STREAMING ==========
+
+STREAM_COMPLETIONS = False   # stream svar og parse linjer undervejs
+STREAM_CHECK_LINES = 3       # afbryd hvis de første N linjer ikke giver en gyldig feature-række
+STREAM_FORMAT_ATTEMPTS = 3   # nye forsøg efter et afbrudt (forkert formateret) svar
+
+# ========== MANGLENDE FEATURES ==========
+
+# Opfølgende kald med kun de features, svaret ikke dækkede (0 = slået fra)
+COMPLETION_PASSES = 1
+
+# Ændres features.xlsx, genbruges cachens seneste svar pr. virksomhed: kun nye
+# features spørges om, og rækker for fjernede features udelades som forældede
+INCREMENTAL_REANALYSIS = True
+
+# ========== TO-TRINS-KØRSEL (hjemmeside → features) ==========
+
+WEBSITES_FILE = "data/cache/websites.sqlite"  # tabel virksomhed → hjemmeside
+WEBSITE_MAX_TOKENS = 60                       # svaret er kun "website;URL"
+
+# ========== PAKKEDE KALD ==========
+
+PACK_SIZE = 1  # virksomheder pr. kald; >1 deler system-prompt og feature-liste mellem dem
+
+# ========== OUTPUT ==========
+
+RESULT_FORMAT = "csv"            # "csv" eller "parquet" (kræver pyarrow)
+PARQUET_ROW_GROUP_SIZE = 5_000   # rækker pr. row group / part-fil
+
+# ========== ASYNC-KØRSEL ==========
+
+MAX_CONCURRENCY_PER_KEY = 4  # samtidige kald pr. API-nøgle i async-tilstand
+
+# ========== RATE LIMITS (pr. nøgle) ==========
+
+# Startværdier for token-buckets; justeres løbende fra x-ratelimit-* headers
+RATE_LIMIT_REQUESTS_PER_MINUTE = 30
+RATE_LIMIT_TOKENS_PER_MINUTE = 70_000
+
+
+# ========== RETRY & AFBRYDERE ==========
+
+RETRY_MAX_ATTEMPTS = 5     # forsøg pr. modelkald ved rate limit, timeout, 5xx og nøglefejl
+RETRY_BASE_DELAY = 1.0     # sekunder; backoff = tilfældig mellem 0 og base · 2^forsøg
+RETRY_MAX_DELAY = 30.0     # loft over backoff (retry-after fra udbyderen følges altid)
+BREAKER_THRESHOLD = 5      # fejl i træk før en nøgle tages ud af rotationen
+BREAKER_COOLDOWN = 60.0    # sekunder en nøgle hviler, når dens afbryder er åben
+
+# ========== INDLÆSNING AF EXCEL ==========
+
+INGEST_CACHE_DIR = "data/cache/ingest"  # Parquet-snapshots af indlæste ark (kræver pyarrow; genbruges til filen ændres)
+
+# ========== PRIORITERING & BUDGET ==========
+
+# Lead-scores fra vægtningsarket: den fil industry_relevance_mapping/vaegtning.py
+# skriver (dens OUTPUT_FILE); findes den ikke, bruges makroens ark i lead-kartoteket
+LEAD_SCORES_FILE = "data/processed/vaegtning.xlsx"
+LEAD_SCORES_FALLBACK_FILE = COMPANIES_FILE
+LEAD_SCORES_SHEET = "Vægtning"
+
+# Ekstra point pr. ark (branche), fx {"410000": 20}; ark der ikke står her får 0
+SHEET_PRIORITY = {}
+
+BUDGET_REQUESTS = None   # maks. modelkald pr. kørsel (None = ubegrænset)
+BUDGET_TOKENS = None     # maks. tokens pr. kørsel, jf. completion.usage (None = ubegrænset)
+
+# ========== METRICS ==========
+
+# Tællere og latens-histogrammer pr. trin (se metrics.py); .json giver et JSON-snapshot,
+# ellers skrives Prometheus' textfile-format (til node_exporter)
+METRICS_FILE = "runs/metrics.prom"
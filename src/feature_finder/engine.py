@@ -0,0 +1,148 @@
+import asyncio
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from config import API_KEYS, MAX_CONCURRENCY_PER_KEY, PACK_SIZE, STREAM_COMPLETIONS
+from analyzer import RowCallback, analyze_company_async, analyze_pack_async
+from cache import ResponseCache
+from client import close_async_clients
+from priority import Budget
+from rate_limiter import KeyScheduler
+from utils import chunked
+from websites import WebsiteTable
+
+ResultCallback = Callable[[Dict[str, str], List[Dict[str, str]]], None]
+Pack = List[Tuple[int, Dict[str, str]]]
+
+
+async def _worker(
+    queue: "asyncio.Queue[Pack]",
+    features: List[str],
+    scheduler: KeyScheduler,
+    cache: Optional[ResponseCache],
+    websites: Optional[WebsiteTable],
+    results: List[Optional[List[Dict[str, str]]]],
+    on_result: Optional[ResultCallback],
+    on_row: Optional[RowCallback],
+    stream: bool,
+    budget: Optional[Budget],
+) -> None:
+    """Tager pakker af virksomheder fra køen; scheduleren vælger nøgle pr. kald."""
+    while True:
+        if budget is not None and budget.exhausted:
+            return
+        if not scheduler.has_usable_keys:
+            return
+        try:
+            pack = queue.get_nowait()
+        except asyncio.QueueEmpty:
+            return
+
+        companies = [company for _, company in pack]
+        try:
+            if len(companies) == 1:
+                pack_rows = [await analyze_company_async(
+                    None, companies[0], features, scheduler, cache, websites, on_row, stream
+                )]
+            else:
+                pack_rows = await analyze_pack_async(
+                    None, companies, features, scheduler, cache, websites, on_row, stream
+                )
+        except Exception as e:
+            print(f"Fejl ved {', '.join(c['name'] for c in companies)}: {e}")
+            pack_rows = [[] for _ in companies]
+
+        for (idx, company), rows in zip(pack, pack_rows):
+            results[idx] = rows
+            if on_result is not None:
+                on_result(company, rows)
+        queue.task_done()
+
+
+async def analyze_companies_async(
+    companies: Sequence[Dict[str, str]],
+    features: List[str],
+    api_keys: Sequence[str] = API_KEYS,
+    max_concurrency: int = MAX_CONCURRENCY_PER_KEY,
+    on_result: Optional[ResultCallback] = None,
+    scheduler: Optional[KeyScheduler] = None,
+    cache: Optional[ResponseCache] = None,
+    pack_size: int = PACK_SIZE,
+    websites: Optional[WebsiteTable] = None,
+    on_row: Optional[RowCallback] = None,
+    stream: bool = STREAM_COMPLETIONS,
+    budget: Optional[Budget] = None,
+) -> List[List[Dict[str, str]]]:
+    """
+    Analyserer mange virksomheder samtidigt.
+
+    Der startes `max_concurrency` workers pr. nøgle, som deler én fælles kø.
+    En KeyScheduler sender hvert kald til den nøgle, der har kapacitet lige nu,
+    og sørger for at ingen nøgle har mere end `max_concurrency` kald i gang.
+    Med `pack_size` > 1 spørges der om flere virksomheder pr. kald, og med en
+    `websites`-tabel køres to-trins-analysen (hjemmeside først, så features).
+    Resultatet er en liste med rækkerne for hver virksomhed i samme rækkefølge
+    som `companies`, så de altid kan føres tilbage til den rigtige virksomhed.
+    `on_result` kaldes løbende, når en virksomhed er færdig, og `on_row` lige
+    forinden med hver af dens rækker (kun for virksomheder der lykkedes).
+    Køen tages i den givne rækkefølge; er `budget` brugt, eller er alle nøgler
+    afvist (401/403), startes ingen nye virksomheder, og de resterende får en
+    tom liste (uden `on_result`).
+    """
+    if max_concurrency < 1:
+        raise ValueError("max_concurrency skal være mindst 1")
+    if scheduler is None:
+        scheduler = KeyScheduler(api_keys, max_concurrency=max_concurrency)
+
+    queue: "asyncio.Queue[Pack]" = asyncio.Queue()
+    for pack in chunked(list(enumerate(companies)), max(1, pack_size)):
+        queue.put_nowait(pack)
+
+    results: List[Optional[List[Dict[str, str]]]] = [None] * len(companies)
+
+    workers = [
+        asyncio.create_task(_worker(
+            queue, features, scheduler, cache, websites, results, on_result, on_row, stream,
+            budget,
+        ))
+        for _ in range(len(scheduler.keys) * scheduler.max_concurrency)
+    ]
+
+    try:
+        await asyncio.gather(*workers)
+    finally:
+        await close_async_clients()
+
+    return [rows or [] for rows in results]
+
+
+def run_async(
+    companies: Sequence[Dict[str, str]],
+    features: List[str],
+    api_keys: Sequence[str] = API_KEYS,
+    max_concurrency: int = MAX_CONCURRENCY_PER_KEY,
+    on_result: Optional[ResultCallback] = None,
+    scheduler: Optional[KeyScheduler] = None,
+    cache: Optional[ResponseCache] = None,
+    pack_size: int = PACK_SIZE,
+    websites: Optional[WebsiteTable] = None,
+    on_row: Optional[RowCallback] = None,
+    stream: bool = STREAM_COMPLETIONS,
+    budget: Optional[Budget] = None,
+) -> List[List[Dict[str, str]]]:
+    """Synkron indgang til analyze_companies_async (bruges fra main)."""
+    return asyncio.run(
+        analyze_companies_async(
+            companies,
+            features,
+            api_keys,
+            max_concurrency,
+            on_result,
+            scheduler,
+            cache,
+            pack_size,
+            websites,
+            on_row,
+            stream,
+            budget,
+        )
+    )
@@ -0,0 +1,358 @@
+import argparse
+import json
+import math
+import random
+import re
+import threading
+import time
+import zlib
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Sequence, Tuple
+
+RELEVANCES = ("high", "medium", "low", "unknown")
+
+# 'Virksomhed: "X"' (enkeltkald/website-trin) og '1. "X"' (pakkede kald)
+_COMPANY_LINE = re.compile(r'^(?:Virksomhed:\s*|\d+\.\s*)"(.+?)"', re.M)
+
+MALFORMED_ANSWER = "Beklager, jeg kunne ikke finde nok information om virksomheden."
+
+
+class Scenario:
+    """
+    Hvordan stand-in-serveren opfører sig. Sandsynlighederne gælder pr. kald.
+
+    Latensen er log-normalfordelt omkring `latency_ms` (medianen); `latency_sigma`
+    styrer halen (0 = fast latens). Ved streaming kommer første chunk efter ca.
+    30 % af latensen, og resten fordeles jævnt over svarets linjer.
+    Kald med en nøgle i `rejected_keys` afvises altid med 401.
+    """
+
+    def __init__(
+        self,
+        latency_ms: float = 300.0,
+        latency_sigma: float = 0.5,
+        rate_limit_ratio: float = 0.0,
+        retry_after: float = 0.2,
+        server_error_ratio: float = 0.0,
+        malformed_ratio: float = 0.0,
+        truncated_ratio: float = 0.0,
+        rejected_keys: Sequence[str] = (),
+        seed: Optional[int] = None,
+    ):
+        self.latency_ms = latency_ms
+        self.latency_sigma = latency_sigma
+        self.rate_limit_ratio = rate_limit_ratio
+        self.retry_after = retry_after
+        self.server_error_ratio = server_error_ratio
+        self.malformed_ratio = malformed_ratio
+        self.truncated_ratio = truncated_ratio
+        self.rejected_keys = set(rejected_keys)
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def draw(self) -> Tuple[float, str, float]:
+        """
+        (latens i sekunder, udfald, afkortning) for ét kald. Udfaldet er ok,
+        rate_limited, malformed eller truncated; afkortningen er den andel af
+        svaret, et afkortet svar beholder. Udfaldet kan også være server_error (503).
+        """
+        with self._lock:
+            median = max(self.latency_ms, 0.0) / 1000
+            latency = (
+                self._rng.lognormvariate(math.log(median), self.latency_sigma)
+                if median and self.latency_sigma else median
+            )
+            roll = self._rng.random()
+            cut = self._rng.uniform(0.25, 0.75)
+
+        for outcome, ratio in (
+            ("rate_limited", self.rate_limit_ratio),
+            ("server_error", self.server_error_ratio),
+            ("malformed", self.malformed_ratio),
+            ("truncated", self.truncated_ratio),
+        ):
+            if roll < ratio:
+                return latency, outcome, cut
+            roll -= ratio
+        return latency, "ok", cut
+
+
+def _relevance(company: str, feature: str) -> str:
+    """Stabil (pseudo-tilfældig) relevans, så to kørsler giver samme resultat."""
+    return RELEVANCES[zlib.crc32(f"{company}\x1f{feature}".encode("utf-8")) % len(RELEVANCES)]
+
+
+def _website(company: str) -> str:
+    slug = re.sub(r"[^a-z0-9]+", "-", company.lower()).strip("-")
+    return f"https://{slug or 'ukendt'}.dk"
+
+
+def _section(company: str, features: List[str]) -> List[str]:
+    lines = [f"website;{_website(company)}"]
+    lines.extend(
+        f"{f};{_relevance(company, f)};Syntetisk vurdering af {f} for {company}"
+        for f in features
+    )
+    return lines
+
+
+def build_answer(messages: List[Dict[str, str]]) -> str:
+    """Et gyldigt svar i pipelinens format til de beskeder, analyzer.py bygger."""
+    user = messages[-1].get("content") or ""
+    companies = _COMPANY_LINE.findall(user) or ["Ukendt"]
+
+    if "Features" not in user:
+        # Website-trinnet (to-trins-kørsel) beder kun om én linje
+        return f"website;{_website(companies[0])}"
+
+    features = [line[2:].strip() for line in user.splitlines() if line.startswith("- ")]
+    if len(companies) == 1:
+        return "\n".join(_section(companies[0], features))
+
+    lines: List[str] = []
+    for i, company in enumerate(companies, start=1):
+        lines.append(f"### {i}: {company}")
+        lines.extend(_section(company, features))
+    return "\n".join(lines)
+
+
+def _usage(messages: List[Dict[str, str]], text: str) -> Dict[str, int]:
+    # Groft token-estimat (ca. 4 tegn pr. token) – nok til budget og forbrugsopgørelser
+    prompt = sum(len(m.get("content") or "") for m in messages) // 4
+    completion = len(text) // 4
+    return {"prompt_tokens": prompt, "completion_tokens": completion, "total_tokens": prompt + completion}
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server: "_Server"
+
+    def log_message(self, format, *args) -> None:
+        # Ingen adgangslog pr. kald – det ville drukne benchmark-output
+        pass
+
+    def _send_json(self, status: int, body: Dict, headers: Optional[Dict[str, str]] = None) -> None:
+        data = json.dumps(body, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _write_chunk(self, data: bytes) -> None:
+        self.wfile.write(f"{len(data):X}\r\n".encode("ascii") + data + b"\r\n")
+        self.wfile.flush()
+
+    def do_POST(self) -> None:
+        length = int(self.headers.get("Content-Length") or 0)
+        request = json.loads(self.rfile.read(length) or b"{}")
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            self._send_json(404, {"error": {"message": f"ukendt sti {self.path}"}})
+            return
+
+        fake = self.server.fake
+        latency, outcome, cut = fake.scenario.draw()
+        fake.count("requests")
+
+        api_key = (self.headers.get("Authorization") or "").replace("Bearer ", "", 1)
+        if api_key in fake.scenario.rejected_keys:
+            fake.count("rejected")
+            self._send_json(
+                401,
+                {"error": {"message": "Invalid API Key (fake_groq)", "type": "invalid_request_error"}},
+            )
+            return
+
+        if outcome == "rate_limited":
+            fake.count("rate_limited")
+            time.sleep(min(latency, 0.05))
+            self._send_json(
+                429,
+                {"error": {"message": "Rate limit reached (fake_groq)", "type": "rate_limit_exceeded"}},
+                {"retry-after": f"{fake.scenario.retry_after:g}"},
+            )
+            return
+        if outcome == "server_error":
+            fake.count("server_error")
+            time.sleep(latency)
+            self._send_json(503, {"error": {"message": "Service unavailable (fake_groq)"}})
+            return
+
+        messages = request.get("messages") or []
+        text, finish = build_answer(messages), "stop"
+        if outcome == "malformed":
+            fake.count("malformed")
+            text = MALFORMED_ANSWER
+        elif outcome == "truncated":
+            fake.count("truncated")
+            text, finish = text[: int(len(text) * cut)], "length"
+
+        meta = {
+            "id": f"chatcmpl-fake-{fake.next_id()}",
+            "created": int(time.time()),
+            "model": request.get("model") or "fake",
+        }
+        usage = _usage(messages, text)
+
+        if request.get("stream"):
+            self._stream(meta, text, finish, usage, latency)
+            return
+
+        time.sleep(latency)
+        self._send_json(200, {
+            **meta,
+            "object": "chat.completion",
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": text},
+                "finish_reason": finish,
+            }],
+            "usage": usage,
+        })
+
+    def _stream(self, meta: Dict, text: str, finish: str, usage: Dict[str, int], latency: float) -> None:
+        """Server-sent events som Groq: én chunk pr. linje og forbruget i x_groq på den sidste."""
+        self.server.fake.count("streamed")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+        pieces = [line + "\n" for line in text.split("\n")]
+        gap = latency * 0.7 / max(1, len(pieces))
+
+        def event(delta: Dict, finish_reason: Optional[str] = None, **extra) -> bytes:
+            chunk = {
+                **meta,
+                "object": "chat.completion.chunk",
+                "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+                **extra,
+            }
+            return f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n".encode("utf-8")
+
+        try:
+            time.sleep(latency * 0.3)
+            for piece in pieces:
+                self._write_chunk(event({"role": "assistant", "content": piece}))
+                time.sleep(gap)
+            self._write_chunk(event({}, finish, x_groq={"id": meta["id"], "usage": usage}))
+            self._write_chunk(b"data: [DONE]\n\n")
+            self._write_chunk(b"")
+        except (BrokenPipeError, ConnectionResetError):
+            # Klienten afbrød streamen (fx StreamFormatError) – det er forventet
+            self.server.fake.count("aborted")
+            self.close_connection = True
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 128
+    fake: "FakeGroqServer"
+
+
+class FakeGroqServer:
+    """
+    Lokal stand-in for Groq/OpenAI's chat-completions-API (uden netværk og kvote).
+
+    Svarer i pipelinens format ud fra de beskeder, analyzer.py bygger (enkeltkald,
+    pakkede kald og website-trinnet), med eller uden streaming, og kan indsprøjte
+    latens, 401-, 429- og 503-svar samt forkert formaterede og afkortede svar (se Scenario).
+    Peg klienten hertil med GROQ_BASE_URL=<url>.
+    """
+
+    def __init__(self, scenario: Optional[Scenario] = None, host: str = "127.0.0.1", port: int = 0):
+        self.scenario = scenario or Scenario()
+        self._httpd = _Server((host, port), _Handler)
+        self._httpd.fake = self
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self._ids = 0
+        self.stats: Counter = Counter()
+
+    @property
+    def url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def count(self, name: str) -> None:
+        with self._lock:
+            self.stats[name] += 1
+
+    def next_id(self) -> int:
+        with self._lock:
+            self._ids += 1
+            return self._ids
+
+    def reset_stats(self) -> Dict[str, int]:
+        """Nulstil tællerne og returnér dem, der var."""
+        with self._lock:
+            stats, self.stats = dict(self.stats), Counter()
+        return stats
+
+    def start(self) -> "FakeGroqServer":
+        self._thread = threading.Thread(target=self._httpd.serve_forever, name="fake-groq", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._httpd.shutdown()
+        self._httpd.server_close()
+        if self._thread is not None:
+            self._thread.join()
+
+    def __enter__(self) -> "FakeGroqServer":
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+
+def add_scenario_args(parser: argparse.ArgumentParser) -> None:
+    """Fælles flag for serverens opførsel (bruges også af benchmark.py)."""
+    parser.add_argument("--latency-ms", type=float, default=300.0, help="median-latens pr. kald")
+    parser.add_argument("--latency-sigma", type=float, default=0.5, help="spredning (log-normal, 0 = fast)")
+    parser.add_argument("--rate-limit", type=float, default=0.0, help="andel af kald der får 429")
+    parser.add_argument("--retry-after", type=float, default=0.2, help="retry-after (s) ved 429")
+    parser.add_argument("--server-error", type=float, default=0.0, help="andel af kald der får 503")
+    parser.add_argument("--malformed", type=float, default=0.0, help="andel svar i forkert format")
+    parser.add_argument("--truncated", type=float, default=0.0, help="andel afkortede svar")
+    parser.add_argument("--seed", type=int, default=1, help="seed for latens og fejl (gentagelige kørsler)")
+
+
+def scenario_from_args(args: argparse.Namespace) -> Scenario:
+    return Scenario(
+        latency_ms=args.latency_ms,
+        latency_sigma=args.latency_sigma,
+        rate_limit_ratio=args.rate_limit,
+        retry_after=args.retry_after,
+        server_error_ratio=args.server_error,
+        malformed_ratio=args.malformed,
+        truncated_ratio=args.truncated,
+        seed=args.seed,
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Lokal stand-in for Groq's chat-completions-API.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    add_scenario_args(parser)
+    args = parser.parse_args()
+
+    server = FakeGroqServer(scenario_from_args(args), args.host, args.port).start()
+    print(f"Fake Groq kører på {server.url} – sæt GROQ_BASE_URL={server.url} (Ctrl+C stopper)")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.stop()
+        print(f"Kald: {dict(server.stats)}")
+
+
+if __name__ == "__main__":
+    main()
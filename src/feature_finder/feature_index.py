@@ -0,0 +1,172 @@
+import re
+import threading
+import unicodedata
+from collections import Counter
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from config import FUZZY_MATCH_CANDIDATES, FUZZY_MATCH_THRESHOLD
+
+# Samlet statistik for alle indeks i kørslen: exact / normalized / fuzzy / unmatched
+MATCH_STATS: Counter = Counter()
+_stats_lock = threading.Lock()
+
+_DANISH = str.maketrans({"æ": "ae", "ø": "oe", "å": "aa"})
+_LIST_PREFIX = re.compile(r"^\s*(?:\(?\d+[.):]?|[-*•·]|[a-z][.)])\s+")
+_NON_ALNUM = re.compile(r"[^a-z0-9]+")
+_PLURAL_SUFFIXES = ("erne", "ene", "er", "es", "s", "e")
+MEMO_LIMIT = 50_000  # huskede opslag pr. indeks
+
+
+def _stem(token: str) -> str:
+    """Meget let stemming, så ental/flertal (dansk og engelsk) matcher hinanden."""
+    for suffix in _PLURAL_SUFFIXES:
+        if len(token) > len(suffix) + 3 and token.endswith(suffix):
+            return token[: -len(suffix)]
+    return token
+
+
+def normalize_feature(text: str) -> str:
+    """
+    Normaliserer et feature-navn til en sammenligningsnøgle: små bogstaver,
+    accenter og æ/ø/å foldet, nummerering/punkttegn og tegnsætning fjernet,
+    og flertalsendelser skåret af.
+    """
+    text = (text or "").strip().lower().translate(_DANISH)
+    text = _LIST_PREFIX.sub("", text)
+    text = unicodedata.normalize("NFKD", text)
+    text = "".join(ch for ch in text if not unicodedata.combining(ch))
+    tokens = _NON_ALNUM.sub(" ", text).split()
+    return " ".join(_stem(t) for t in tokens)
+
+
+def _trigrams(key: str) -> Set[str]:
+    padded = f"  {key} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class FeatureIndex:
+    """
+    Opslag fra modellens (evt. let omskrevne) feature-navne til de rigtige features.
+
+    Bygges én gang pr. feature-liste. Et navn matches først eksakt (uden hensyn til
+    store/små bogstaver), så på den normaliserede nøgle og til sidst fuzzy: kandidater
+    findes via trigram-blocking og scores med Dice-koefficienten; kun et klart bedste
+    match over `threshold` accepteres. Opslag huskes, så samme formulering kun
+    matches én gang pr. kørsel.
+    """
+
+    def __init__(
+        self,
+        features: Iterable[str],
+        threshold: float = FUZZY_MATCH_THRESHOLD,
+        max_candidates: int = FUZZY_MATCH_CANDIDATES,
+    ):
+        self.features: List[str] = list(features)
+        self.threshold = threshold
+        self.max_candidates = max_candidates
+        self.stats: Counter = Counter()
+
+        self._exact: Dict[str, str] = {}
+        self._normalized: Dict[str, str] = {}
+        self._grams: List[Set[str]] = []
+        self._blocks: Dict[str, List[int]] = {}
+        self._memo: Dict[str, Tuple[Optional[str], str]] = {}
+
+        for i, feature in enumerate(self.features):
+            self._exact.setdefault(feature.lower(), feature)
+            key = normalize_feature(feature)
+            self._normalized.setdefault(key, feature)
+            grams = _trigrams(key)
+            self._grams.append(grams)
+            for gram in grams:
+                self._blocks.setdefault(gram, []).append(i)
+
+    @classmethod
+    def for_features(cls, features) -> "FeatureIndex":
+        """Returnér et (delt) indeks for feature-listen – bygges kun første gang."""
+        if isinstance(features, FeatureIndex):
+            return features
+        return _cached_index(tuple(features))
+
+    def __len__(self) -> int:
+        return len(self.features)
+
+    def _count(self, kind: str) -> None:
+        self.stats[kind] += 1
+        with _stats_lock:
+            MATCH_STATS[kind] += 1
+
+    def match(self, raw_feature: str) -> Optional[str]:
+        """Find den feature, modellen mente, eller None hvis der ikke er et sikkert match."""
+        raw_feature = (raw_feature or "").strip()
+        exact = self._exact.get(raw_feature.lower())
+        if exact is not None:
+            self._count("exact")
+            return exact
+
+        memo = self._memo.get(raw_feature)
+        if memo is None:
+            key = normalize_feature(raw_feature)
+            found = self._normalized.get(key)
+            if found is not None:
+                memo = (found, "normalized")
+            else:
+                found = self._fuzzy(key)
+                memo = (found, "fuzzy" if found else "unmatched")
+            if len(self._memo) >= MEMO_LIMIT:
+                self._memo.clear()
+            self._memo[raw_feature] = memo
+
+        found, kind = memo
+        self._count(kind)
+        return found
+
+    def _fuzzy(self, key: str) -> Optional[str]:
+        if not key:
+            return None
+        grams = _trigrams(key)
+
+        # Blocking: kun features der deler trigrammer med navnet er kandidater
+        shared: Counter = Counter()
+        for gram in grams:
+            for i in self._blocks.get(gram, ()):
+                shared[i] += 1
+
+        scored: List[Tuple[float, int]] = []
+        for i, common in shared.most_common(self.max_candidates):
+            scored.append((2.0 * common / (len(grams) + len(self._grams[i])), i))
+        if not scored:
+            return None
+
+        scored.sort(reverse=True)
+        best_score, best = scored[0]
+        if best_score < self.threshold:
+            return None
+        # Tvetydigt (to næsten lige gode kandidater) → hellere ingen match end et forkert
+        if len(scored) > 1 and best_score - scored[1][0] < 0.05:
+            return None
+        return self.features[best]
+
+    def missing(self, rows: Iterable[Dict[str, str]]) -> List[str]:
+        """Features (i indeksets rækkefølge) der ikke er dækket af `rows`."""
+        covered = {row["Feature"] for row in rows}
+        return [f for f in self.features if f not in covered]
+
+
+@lru_cache(maxsize=64)
+def _cached_index(features: Tuple[str, ...]) -> FeatureIndex:
+    return FeatureIndex(features)
+
+
+def match_report() -> str:
+    """Kort opsummering af feature-matching i hele kørslen."""
+    with _stats_lock:
+        total = sum(MATCH_STATS.values())
+        if not total:
+            return "Feature-match: ingen linjer"
+        parts = [
+            f"{kind} {MATCH_STATS[kind]}"
+            for kind in ("exact", "normalized", "fuzzy", "unmatched")
+        ]
+    return f"Feature-match ({total} linjer): " + ", ".join(parts)
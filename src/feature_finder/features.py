@@ -1,5 +1,5 @@
 import pandas as pd
-from typing import List
+from typing import Any, Dict, List
 
 from config import (
     FEATURES_FILE,
@@ -7,38 +7,51 @@ from config import (
     FEATURES_START_ROW,
     FEATURES_COL_NAME,
 )
-from utils import clean_str
+from metrics import METRICS
+from ingest import cached_columns, clean_column, open_workbook, read_column, read_row
 
 
-def load_features() -> List[str]:
-    """Læs feature-liste fra filen og returnér en sorteret liste af unikke features."""
+def _missing_column(found: List[Any]) -> ValueError:
+    return ValueError(
+        f"Kunne ikke finde kolonnen '{FEATURES_COL_NAME}' i features-filen. "
+        f"Fandt kolonnerne: {found}"
+    )
+
+
+def _read_feature_values() -> List[Any]:
     if FEATURES_FILE.endswith(".csv"):
         df = pd.read_csv(FEATURES_FILE, skiprows=FEATURES_START_ROW)
-    else:
-        excel_obj = pd.read_excel(
-            FEATURES_FILE,
-            sheet_name=FEATURES_SHEET if FEATURES_SHEET is not None else None,
-            skiprows=FEATURES_START_ROW,
-        )
-
-        if isinstance(excel_obj, dict):
-            sheet_names = list(excel_obj.keys())
-            df = excel_obj[sheet_names[0]]
-        else:
-            df = excel_obj
-
-    if FEATURES_COL_NAME not in df.columns:
-        raise ValueError(
-            f"Kunne ikke finde kolonnen '{FEATURES_COL_NAME}' i features-filen. "
-            f"Fandt kolonnerne: {list(df.columns)}"
-        )
-
-    features = sorted(
-        {
-            clean_str(v)
-            for v in df[FEATURES_COL_NAME].dropna()
-            if clean_str(v)
-        }
-    )
+        if FEATURES_COL_NAME not in df.columns:
+            raise _missing_column(list(df.columns))
+        return df[FEATURES_COL_NAME].tolist()
+
+    with open_workbook(FEATURES_FILE) as wb:
+        sheet = FEATURES_SHEET if FEATURES_SHEET is not None else wb.sheetnames[0]
+
+        # Headeren ligger i første række efter de oversprungne; kun feature-kolonnen læses
+        header_row = FEATURES_START_ROW + 1
+        header = read_row(wb, sheet, header_row)
+        if FEATURES_COL_NAME not in header:
+            raise _missing_column([h for h in header if h is not None])
 
-    return features
+        column = header.index(FEATURES_COL_NAME) + 1
+        return read_column(wb, sheet, column, header_row + 1)
+
+
+def _parse_features() -> Dict[str, list]:
+    return {"feature": sorted(set(clean_column(_read_feature_values())))}
+
+
+@METRICS.timed("load_seconds", stage="features")
+def load_features() -> List[str]:
+    """
+    Læs feature-liste fra filen og returnér en sorteret liste af unikke features.
+    Resultatet gemmes som snapshot og genbruges, så længe filen er uændret.
+    """
+    columns = cached_columns(
+        "features",
+        FEATURES_FILE,
+        (FEATURES_SHEET, FEATURES_START_ROW, FEATURES_COL_NAME),
+        _parse_features,
+    )
+    return list(columns["feature"])
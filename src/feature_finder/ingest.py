@@ -0,0 +1,154 @@
+import hashlib
+import json
+import os
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+import pandas as pd
+from openpyxl import Workbook, load_workbook
+
+from config import INGEST_CACHE_DIR
+
+# Tæl op når formatet af snapshots (eller rensningen) ændres
+SNAPSHOT_VERSION = 2
+SNAPSHOT_METADATA_KEY = b"feature_finder.ingest"
+
+Columns = Dict[str, List[Any]]
+
+
+def file_hash(path: str) -> str:
+    """sha256 af filens indhold."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _snapshot_path(kind: str, source: str) -> str:
+    return os.path.join(INGEST_CACHE_DIR, f"{kind}_{os.path.basename(source)}.parquet")
+
+
+def _read_snapshot(path: str) -> Optional[Tuple[Dict[str, Any], Columns]]:
+    """(metadata, kolonner) fra et Parquet-snapshot, eller None hvis det mangler eller er ugyldigt."""
+    try:
+        import pyarrow.parquet as pq
+    except ImportError:
+        return None
+    try:
+        table = pq.read_table(path)
+        meta = json.loads(table.schema.metadata[SNAPSHOT_METADATA_KEY])
+    except (OSError, ValueError, KeyError, TypeError):
+        return None
+    return meta, table.to_pydict()
+
+
+def _write_snapshot(path: str, meta: Dict[str, Any], columns: Columns) -> None:
+    """Gem kolonnerne som Parquet med `meta` i skemaets metadata (springes over uden pyarrow)."""
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        return
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    table = pa.table(columns).replace_schema_metadata(
+        {SNAPSHOT_METADATA_KEY: json.dumps(meta, ensure_ascii=False)}
+    )
+    tmp_path = path + ".tmp"
+    pq.write_table(table, tmp_path)
+    os.replace(tmp_path, path)
+
+
+def cached_columns(
+    kind: str,
+    source: str,
+    params: Any,
+    build: Callable[[], Columns],
+) -> Columns:
+    """
+    Returnér de parsede kolonner for `source` fra et snapshot, eller byg dem med `build`.
+
+    Snapshottet er en Parquet-fil (kolonnerne som Arrow-kolonner) med metadata,
+    der nøgler det på filens mtime/størrelse og sha256 samt `params` (fx
+    ark-konfigurationen). Er mtime og størrelse uændrede, bruges snapshottet uden
+    at læse Excel-filen; er kun mtime ændret (fx kopieret fil), afgør hashen det.
+    Uden pyarrow læses Excel-filen hver gang.
+    """
+    stat = os.stat(source)
+    path = _snapshot_path(kind, source)
+    snapshot = _read_snapshot(path)
+    # params sammenlignes i JSON-form, som de står i metadata (tupler bliver lister)
+    params = json.loads(json.dumps(params))
+
+    digest = None
+
+    if snapshot is not None:
+        meta, columns = snapshot
+        if meta.get("version") == SNAPSHOT_VERSION and meta.get("params") == params:
+            if meta["mtime_ns"] == stat.st_mtime_ns and meta["size"] == stat.st_size:
+                return columns
+
+            digest = file_hash(source)
+            if meta["sha256"] == digest:
+                meta.update(mtime_ns=stat.st_mtime_ns, size=stat.st_size)
+                _write_snapshot(path, meta, columns)
+                return columns
+
+    columns = build()
+    _write_snapshot(path, {
+        "version": SNAPSHOT_VERSION,
+        "params": params,
+        "mtime_ns": stat.st_mtime_ns,
+        "size": stat.st_size,
+        "sha256": digest or file_hash(source),
+    }, columns)
+    return columns
+
+
+def clean_column(values: Sequence[Any]) -> pd.Series:
+    """
+    Vektoriseret clean_str for en hel kolonne: trimmede strenge, hvor tomme og
+    NaN-værdier er fjernet. Indexet er positionen i `values`.
+    """
+    series = pd.Series(values, dtype=object)
+    series = series[series.notna()].astype(str).str.strip()
+    return series[series != ""]
+
+
+@contextmanager
+def open_workbook(path: str) -> Iterator[Workbook]:
+    """
+    Åbn en projektmappe i read-only-tilstand og luk den bagefter. Åbn den én gang
+    pr. indlæsning og læs alle ark derfra – hver åbning parser bl.a. de delte
+    strenge igen og koster mere end at læse de kolonner, vi skal bruge.
+    """
+    wb = load_workbook(path, read_only=True, data_only=True)
+    try:
+        yield wb
+    finally:
+        wb.close()
+
+
+def read_row(wb: Workbook, sheet_name: str, row: int) -> List[Any]:
+    """Læs én række (1-baseret), fx en header."""
+    for values in wb[sheet_name].iter_rows(min_row=row, max_row=row, values_only=True):
+        return list(values)
+    return []
+
+
+def read_column(wb: Workbook, sheet_name: str, column: int, first_row: int) -> List[Any]:
+    """
+    Læs én kolonne (1-baseret) fra `first_row` og ned, streamet i read-only-tilstand,
+    så resten af arket hverken parses til celler eller holdes i hukommelsen.
+    """
+    return [
+        row[0]
+        for row in wb[sheet_name].iter_rows(
+            min_row=first_row, min_col=column, max_col=column, values_only=True
+        )
+    ]
+
+
+def read_columns(wb: Workbook, jobs: Sequence[Tuple[str, int, int]]) -> List[List[Any]]:
+    """Kør read_column for hvert (ark, kolonne, første række) i én gennemgang af projektmappen."""
+    return [read_column(wb, *job) for job in jobs]
@@ -0,0 +1,97 @@
+import json
+import os
+import threading
+import time
+from typing import Dict, Iterator, List, Set, Tuple
+
+from config import JOURNAL_FILE
+
+CompanyKey = Tuple[str, str]
+
+
+def company_key(company: Dict[str, str]) -> CompanyKey:
+    return company["name"], company["sheet"]
+
+
+class RunJournal:
+    """
+    Append-only journal (JSONL) med én linje pr. færdig virksomhed.
+
+    Hver linje skrives og fsync'es, så snart virksomheden er analyseret, og indeholder
+    også dens rækker. En kørsel kan derfor slås ihjel når som helst og genoptages
+    med `done()`, uden at miste resultater eller betale for de samme kald igen.
+    En halvt skrevet sidste linje (fx ved strømsvigt) ignoreres ved indlæsning.
+    """
+
+    def __init__(self, path: str = JOURNAL_FILE):
+        journal_dir = os.path.dirname(path)
+        if journal_dir:
+            os.makedirs(journal_dir, exist_ok=True)
+        self.path = path
+        self._lock = threading.Lock()
+        self._file = open(path, "a", encoding="utf-8")
+        self._terminate_partial_line()
+
+    def _terminate_partial_line(self) -> None:
+        """Afslut en halvt skrevet sidste linje, så nye poster ikke klistres på den."""
+        if self._file.tell() == 0:
+            return
+        with open(self.path, "rb") as f:
+            f.seek(-1, os.SEEK_END)
+            if f.read(1) != b"\n":
+                self._file.write("\n")
+                self._file.flush()
+
+    def entries(self) -> Iterator[Dict]:
+        """Læs alle gyldige poster i journalen."""
+        return self.read(self.path)
+
+    @staticmethod
+    def read(path: str) -> Iterator[Dict]:
+        """Læs alle gyldige poster i en journal-fil (uden at åbne den for skrivning)."""
+        if not os.path.exists(path):
+            return
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    yield json.loads(line)
+                except json.JSONDecodeError:
+                    # Afbrudt skrivning – resten af linjen er tabt
+                    continue
+
+    def done(self) -> Dict[CompanyKey, List[Dict[str, str]]]:
+        """Virksomheder der er færdige med rækker (nyeste gyldige post pr. virksomhed vinder)."""
+        finished: Dict[CompanyKey, List[Dict[str, str]]] = {}
+        for entry in self.entries():
+            if entry.get("status") == "ok":
+                finished[(entry.get("name", ""), entry.get("sheet", ""))] = entry.get("rows", [])
+        return finished
+
+    def done_keys(self) -> Set[CompanyKey]:
+        return set(self.done())
+
+    def record(self, company: Dict[str, str], rows: List[Dict[str, str]]) -> None:
+        """
+        Skriv resultatet for én virksomhed. Tomme resultater gemmes som "failed",
+        så de bliver forsøgt igen ved næste genoptagelse.
+        """
+        entry = {
+            "name": company["name"],
+            "sheet": company["sheet"],
+            "status": "ok" if rows else "failed",
+            "rows": rows,
+            "ts": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        }
+        line = json.dumps(entry, ensure_ascii=False) + "\n"
+
+        with self._lock:
+            self._file.write(line)
+            self._file.flush()
+            os.fsync(self._file.fileno())
+
+    def close(self) -> None:
+        with self._lock:
+            self._file.close()
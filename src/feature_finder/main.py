@@ -1,27 +1,139 @@
-import csv
-import time
-from itertools import cycle
+import argparse
+import sys
+from collections import Counter
+from typing import Optional, Tuple
 
-from config import API_KEYS, BATCH_SIZE
+from config import (
+    BATCH_SIZE,
+    BUDGET_REQUESTS,
+    BUDGET_TOKENS,
+    JOURNAL_FILE,
+    MAX_CONCURRENCY_PER_KEY,
+    METRICS_FILE,
+    PACK_SIZE,
+    RESULT_FORMAT,
+    STREAM_COMPLETIONS,
+)
 from features import load_features
 from companies import load_companies
-from analyzer import analyze_company
-from client import get_client_with_key
-from utils import chunked, mask_key
+from analyzer import analyze_company, analyze_pack
+from cache import ResponseCache
+from engine import run_async
+from feature_index import FeatureIndex, match_report
+from journal import RunJournal, company_key
+from metrics import METRICS
+from model_log import close_log_writer
+from priority import Budget, PriorityQueue, load_lead_scores
+from rate_limiter import KeyScheduler
+from results_store import ResultsStore
+from shards import keys_for_shard, parse_shard, select_shard, shard_path, shard_suffix
+from usage import USAGE
+from sinks import make_sink
+from utils import chunked
+from websites import WebsiteTable
 
 
-def main() -> None:
-    features = load_features()
-    companies = load_companies()
-
-    csv_rows = []
-
-    key_cycle = cycle(API_KEYS)
-    batches = list(chunked(companies, BATCH_SIZE))
-    total_batches = len(batches)
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Find relevante features for virksomheder.")
+    parser.add_argument(
+        "--async",
+        dest="use_async",
+        action="store_true",
+        help="kør mange kald samtidigt via AsyncGroq i stedet for én virksomhed ad gangen",
+    )
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=MAX_CONCURRENCY_PER_KEY,
+        help=f"samtidige kald pr. API-nøgle i async-tilstand (standard: {MAX_CONCURRENCY_PER_KEY})",
+    )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="spring svar-cachen over (hverken læs eller gem svar)",
+    )
+    parser.add_argument(
+        "--pack",
+        type=int,
+        default=PACK_SIZE,
+        help=f"antal virksomheder pr. modelkald (standard: {PACK_SIZE})",
+    )
+    parser.add_argument(
+        "--two-stage",
+        action="store_true",
+        help="find hjemmesiden i et separat (cachet) trin før feature-vurderingen",
+    )
+    parser.add_argument(
+        "--stream",
+        action="store_true",
+        default=STREAM_COMPLETIONS,
+        help="stream svar, parse dem undervejs og afbryd tidligt ved forkert format "
+        "(rækkerne skrives stadig først, når virksomheden er færdig)",
+    )
+    parser.add_argument(
+        "--journal",
+        default=JOURNAL_FILE,
+        help=f"journal-fil med færdige virksomheder (standard: {JOURNAL_FILE})",
+    )
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="spring virksomheder over, der allerede er færdige i journalen (ingen spørgsmål)",
+    )
+    parser.add_argument(
+        "--format",
+        choices=["csv", "parquet"],
+        default=RESULT_FORMAT,
+        help=f"output-format for resultater (standard: {RESULT_FORMAT})",
+    )
+    parser.add_argument(
+        "--priority",
+        action="store_true",
+        help="kør efter lead-score og ark-prioritet (cachede først) i stedet for arkets rækkefølge",
+    )
+    parser.add_argument(
+        "--budget-requests",
+        type=int,
+        default=BUDGET_REQUESTS,
+        help="stop med at starte nye virksomheder efter så mange modelkald",
+    )
+    parser.add_argument(
+        "--budget-tokens",
+        type=int,
+        default=BUDGET_TOKENS,
+        help="stop med at starte nye virksomheder efter så mange tokens (faktisk forbrug)",
+    )
+    parser.add_argument(
+        "--metrics",
+        default=METRICS_FILE,
+        help="fil til tællere og latens-histogrammer (.json = JSON-snapshot, ellers Prometheus textfile)",
+    )
+    parser.add_argument(
+        "--store",
+        action="store_true",
+        help="indlæs kørslens journal i den samlede resultat-database bagefter (se results_store.py)",
+    )
+    parser.add_argument(
+        "--shard",
+        type=parse_shard,
+        metavar="I/N",
+        help="kør kun shard I af N (fast hash-fordeling; egen journal og evt. egne nøgler, "
+             "saml bagefter med 'python shards.py merge')",
+    )
+    parser.add_argument("--start-batch", type=int, help="første batch (1-baseret)")
+    parser.add_argument("--stop-batch", type=int, help="sidste batch (inklusiv)")
+    args = parser.parse_args()
+    if args.shard is not None:
+        # Hver shard får sine egne filer, så flere maskiner ikke skriver i de samme
+        if args.journal == JOURNAL_FILE:
+            args.journal = shard_path(JOURNAL_FILE, args.shard)
+        if args.metrics == METRICS_FILE:
+            args.metrics = shard_path(METRICS_FILE, args.shard)
+    return args
 
-    print(f"\nDer er i alt {total_batches} batches á {BATCH_SIZE} virksomheder.")
 
+def ask_batch_range(total_batches: int) -> Tuple[int, int]:
+    """Spørg brugeren om start- og stopbatch (den oprindelige interaktive tilstand)."""
     # === Brugeren vælger startbatch ===
     while True:
         try:
@@ -44,53 +156,241 @@ def main() -> None:
         except ValueError:
             print("Skriv et helt tal, fx 5 eller 10.")
 
+    return start_batch, stop_batch
+
+
+def resolve_batch_range(
+    args: argparse.Namespace,
+    total_batches: int,
+) -> Tuple[int, int]:
+    """
+    Vælg batch-interval: fra kommandolinjen, hele listen ved --resume eller uden
+    terminal (fx fra en scheduler), ellers interaktivt som hidtil.
+    """
+    start: Optional[int] = args.start_batch
+    stop: Optional[int] = args.stop_batch
+
+    if start is None and stop is None and not args.resume and sys.stdin.isatty():
+        return ask_batch_range(total_batches)
+
+    start = start or 1
+    stop = stop or total_batches
+    if not 1 <= start <= stop <= total_batches:
+        raise SystemExit(
+            f"Ugyldigt batch-interval {start} → {stop} (skal være mellem 1 og {total_batches})."
+        )
+    return start, stop
+
+
+def main() -> None:
+    args = parse_args()
+
+    features = load_features()
+    companies = load_companies()
+    if args.shard is not None:
+        companies = select_shard(companies, args.shard)
+        print(f"Shard {args.shard[0]}/{args.shard[1]}: {len(companies)} virksomheder.")
+
+    # Bygges én gang; alle svar i kørslen matcher feature-navne mod det samme indeks
+    FeatureIndex.for_features(features)
+
+    USAGE.register(companies)
+
+    batches = list(chunked(companies, BATCH_SIZE))
+    total_batches = len(batches)
+
+    print(f"\nDer er i alt {total_batches} batches á {BATCH_SIZE} virksomheder.")
+
+    start_batch, stop_batch = resolve_batch_range(args, total_batches)
     selected_batches = batches[start_batch - 1 : stop_batch]
 
     print(f"\nKører batches {start_batch} → {stop_batch} af {total_batches}.\n")
 
+    # === Resultater skrives løbende ===
+    base_name = f"results_compound_batch_{start_batch}_to_{stop_batch}"
+    if args.shard is not None:
+        base_name = f"results_compound_{shard_suffix(args.shard)}_batch_{start_batch}_to_{stop_batch}"
+    sink = make_sink(args.format, base_name)
+    print(f"Resultater skrives løbende til: {sink.path}\n")
+
+    companies_done = 0
+    relevance_counts: Counter = Counter()
+
+    def write_row(row) -> None:
+        # Analysen sender en virksomheds rækker hertil, når den er lykkedes
+        # (aldrig fra et fejlet forsøg), så output og journal stemmer overens
+        sink.write([row])
+        relevance_counts[row["Relevance"]] += 1
+
+    def finish(company, rows) -> None:
+        nonlocal companies_done
+        journal.record(company, rows)
+        if rows:
+            companies_done += 1
+
+    # === Genoptag fra journalen ===
+    journal = RunJournal(args.journal)
+    previous = journal.done() if args.resume else {}
+
+    pending_batches = []
+    skipped = 0
+    for batch in selected_batches:
+        pending = []
+        for c in batch:
+            if company_key(c) in previous:
+                for row in previous[company_key(c)]:
+                    write_row(row)
+                companies_done += 1
+                skipped += 1
+            else:
+                pending.append(c)
+        pending_batches.append(pending)
+
+    if args.resume:
+        print(f"Genoptager fra {journal.path}: {skipped} virksomheder er allerede færdige.\n")
+
     # === Kør valgte batches ===
-    for batch_idx, batch in enumerate(selected_batches, start=start_batch):
-        current_key = next(key_cycle)
-        client = get_client_with_key(current_key)
+    # Scheduleren sender hvert kald til den nøgle, der har kapacitet lige nu
+    budget = Budget(args.budget_requests, args.budget_tokens)
+    scheduler = KeyScheduler(keys_for_shard(args.shard), max_concurrency=args.concurrency, budget=budget)
+    cache = None if args.no_cache else ResponseCache()
+    websites = WebsiteTable() if args.two_stage else None
 
-        print(
-            f"\n=== Batch {batch_idx}/{total_batches} · nøgle: {mask_key(current_key)} "
-            f"· virksomheder: {len(batch)} ==="
+    queue = None
+    if args.priority:
+        queue = PriorityQueue(
+            [c for batch in pending_batches for c in batch],
+            load_lead_scores(),
+            is_cached=(lambda c: cache.contains(c["name"], features)) if cache else None,
         )
+        print(f"Prioriteret kø: {len(queue)} virksomheder (cachede først, så efter lead-score).\n")
 
-        for c in batch:
+    def run_pack(pack) -> None:
+        for c in pack:
             print(f"Analyserer: {c['name']} (ark: {c['sheet']})")
-            try:
-                rows = analyze_company(client, c, features)
-                csv_rows.extend(rows)
-            except Exception as e:
-                print(f"Fejl ved {c['name']}: {e}")
-
-        # Valgfri pause mellem batches for at undgå rate limit
-        time.sleep(0.5)
-
-    # === Gem resultater ===
-    csv_file = f"results_compound_batch_{start_batch}_to_{stop_batch}.csv"
-    with open(csv_file, "w", newline="", encoding="utf-8") as f:
-        writer = csv.DictWriter(
-            f,
-            fieldnames=["Company", "Website", "Feature", "Relevance", "Reason"],
+        try:
+            if len(pack) == 1:
+                pack_rows = [analyze_company(
+                    None, pack[0], features, scheduler, cache, websites,
+                    on_row=write_row, stream=args.stream,
+                )]
+            else:
+                pack_rows = analyze_pack(
+                    None, pack, features, scheduler, cache, websites,
+                    on_row=write_row, stream=args.stream,
+                )
+        except Exception as e:
+            print(f"Fejl ved {', '.join(c['name'] for c in pack)}: {e}")
+            pack_rows = [[] for _ in pack]
+
+        for c, rows in zip(pack, pack_rows):
+            finish(c, rows)
+
+    try:
+        if args.use_async:
+            if queue is not None:
+                selected = queue.ordered()
+            else:
+                selected = [c for batch in pending_batches for c in batch]
+            print(
+                f"Async-tilstand: {len(selected)} virksomheder · {len(scheduler.keys)} nøgle(r) "
+                f"· {args.concurrency} samtidige kald pr. nøgle\n"
+            )
+
+            def on_result(company, rows):
+                finish(company, rows)
+                print(f"Færdig: {company['name']} (ark: {company['sheet']}) · {len(rows)} rækker")
+
+            run_async(
+                selected,
+                features,
+                on_result=on_result,
+                scheduler=scheduler,
+                cache=cache,
+                pack_size=args.pack,
+                websites=websites,
+                on_row=write_row,
+                stream=args.stream,
+                budget=budget,
+            )
+        elif queue is not None:
+            for pack in queue.drain(budget, max(1, args.pack)):
+                if not scheduler.has_usable_keys:
+                    break
+                run_pack(pack)
+        else:
+            for batch_idx, batch in enumerate(pending_batches, start=start_batch):
+                if not batch or budget.exhausted or not scheduler.has_usable_keys:
+                    continue
+
+                print(
+                    f"\n=== Batch {batch_idx}/{total_batches} · virksomheder: {len(batch)} ===\n"
+                    f"Nøgler: {scheduler.describe()}"
+                )
+
+                for pack in chunked(batch, max(1, args.pack)):
+                    if budget.exhausted or not scheduler.has_usable_keys:
+                        break
+                    run_pack(pack)
+    finally:
+        journal.close()
+        sink.close()
+        if websites is not None:
+            websites.close()
+        # Tøm log-køen, så alle svar er på disk før vi afslutter
+        close_log_writer()
+        # Også ved afbrudt kørsel, så man kan se hvor tiden gik
+        METRICS.export(args.metrics)
+
+    if not scheduler.has_usable_keys:
+        raise SystemExit(
+            "\n❌ Alle API-nøgler blev afvist (401/403) – kørslen er stoppet. "
+            f"Ret nøglerne i config.py (API_KEYS/SHARD_API_KEYS) og genoptag med --resume ({journal.path})."
         )
-        writer.writeheader()
-        writer.writerows(csv_rows)
 
-    print(f"\nCSV-fil gemt som: {csv_file}")
+    print(f"\nResultater gemt i: {sink.path}")
+    print(f"Journal: {journal.path}")
+    if args.store:
+        store = ResultsStore()
+        store.register_companies(companies)
+        print(f"Resultat-database: {store.load_journal(journal.path)} nye rækker ({store.path})")
+        stale = store.mark_stale(features)
+        if stale:
+            print(f"  {stale} features er fjernet fra features.xlsx – deres rækker er markeret forældede")
+        store.close()
+    if cache is not None:
+        print(f"Cache: {cache.hits} hits, {cache.misses} misses ({cache.path})")
+        incremental = METRICS.counter("companies_total", status="incremental")
+        if incremental:
+            print(
+                f"  {incremental:g} genanalyseret inkrementelt: "
+                f"{METRICS.counter('reused_features_total'):g} rækker genbrugt, "
+                f"{METRICS.counter('incremental_features_total'):g} nye, "
+                f"{METRICS.counter('stale_features_total'):g} forældede udeladt"
+            )
+        partial = METRICS.counter("companies_total", status="partial")
+        if partial:
+            print(
+                f"  {partial:g} kun med genbrugte rækker (kaldet for de nye features fejlede) "
+                "– de spørges om igen næste gang"
+            )
+        cache.close()
+    print(match_report())
+    print(USAGE.report())
+    print(f"Budget: {budget.describe()} · detaljer i {USAGE.save()}")
+    print(
+        f"Modelkald p50/p99: {METRICS.quantile('model_latency_seconds', 0.5):.1f}s/"
+        f"{METRICS.quantile('model_latency_seconds', 0.99):.1f}s · "
+        f"429: {METRICS.counter('rate_limited_total'):g} · metrics i {args.metrics}"
+    )
+    if budget.exhausted:
+        print("⚠️  Budgettet er brugt – resten af virksomhederne blev ikke startet.")
 
     # === Kort overblik ===
     print("\n=== OVERBLIK ===")
-    by_company = {}
-    for row in csv_rows:
-        by_company.setdefault((row["Company"], row["Website"]), []).append(row)
-
-    for (company, website), rows in by_company.items():
-        print(f"\n{company} - {website}")
-        for r in rows:
-            print(f"  - {r['Feature']}: {r['Relevance']} ({r['Reason']})")
+    print(f"Virksomheder med resultater: {companies_done}")
+    for relevance in ("high", "medium", "low", "unknown"):
+        print(f"  - {relevance}: {relevance_counts[relevance]}")
 
     print(f"\n✅ Færdig med batches {start_batch} → {stop_batch}.")
 
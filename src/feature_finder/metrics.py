@@ -0,0 +1,199 @@
+import asyncio
+import functools
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from config import METRICS_FILE
+
+PREFIX = "feature_finder_"
+
+# Sekunder – fra hurtige lokale trin (parsing, skrivning) til lange modelkald
+DEFAULT_BUCKETS = (
+    0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0, 120.0,
+)
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+def _labels(labels: Dict[str, object]) -> Labels:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labels: Labels, extra: Optional[Tuple[str, str]] = None) -> str:
+    items = list(labels) + ([extra] if extra else [])
+    if not items:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in items) + "}"
+
+
+class _Histogram:
+    def __init__(self, buckets: Tuple[float, ...]):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # sidste = +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q: float) -> float:
+        """Estimat (lineær interpolation i bucket'en), som Prometheus' histogram_quantile."""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for i, n in enumerate(self.counts):
+            if seen + n >= rank and n:
+                lower = self.buckets[i - 1] if i > 0 else 0.0
+                upper = self.buckets[i] if i < len(self.buckets) else self.buckets[-1]
+                return lower + (upper - lower) * (rank - seen) / n
+            seen += n
+        return self.buckets[-1]
+
+
+class Metrics:
+    """
+    Let instrumentering af pipelinen: tællere og latens-histogrammer med labels.
+
+    Alt holdes i hukommelsen og eksporteres til sidst som en Prometheus-textfile
+    (til node_exporter's textfile-collector) eller som et JSON-snapshot.
+    Trådsikker, så den kan bruges fra både tråde og asyncio.
+    """
+
+    def __init__(self, buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self._lock = threading.Lock()
+        self._counters: Dict[Tuple[str, Labels], float] = {}
+        self._histograms: Dict[Tuple[str, Labels], _Histogram] = {}
+
+    def inc(self, name: str, value: float = 1, **labels) -> None:
+        key = (PREFIX + name, _labels(labels))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, name: str, seconds: float, **labels) -> None:
+        key = (PREFIX + name, _labels(labels))
+        with self._lock:
+            hist = self._histograms.get(key)
+            if hist is None:
+                hist = self._histograms[key] = _Histogram(self.buckets)
+            hist.observe(seconds)
+
+    @contextmanager
+    def timer(self, name: str, **labels) -> Iterator[None]:
+        """Mål varigheden af en blok i histogrammet `name` (også ved fejl)."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - started, **labels)
+
+    def timed(self, name: str, **labels):
+        """Dekorator der tidtager en funktion (sync eller async) med `timer`."""
+        def decorator(func):
+            if asyncio.iscoroutinefunction(func):
+                @functools.wraps(func)
+                async def async_wrapper(*args, **kwargs):
+                    with self.timer(name, **labels):
+                        return await func(*args, **kwargs)
+                return async_wrapper
+
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                with self.timer(name, **labels):
+                    return func(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def quantile(self, name: str, q: float, **labels) -> float:
+        with self._lock:
+            hist = self._histograms.get((PREFIX + name, _labels(labels)))
+            return hist.quantile(q) if hist else 0.0
+
+    def counter(self, name: str, **labels) -> float:
+        with self._lock:
+            return self._counters.get((PREFIX + name, _labels(labels)), 0)
+
+    def reset(self) -> None:
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+
+    def to_prometheus(self) -> str:
+        lines: List[str] = []
+        with self._lock:
+            typed = set()
+            for (name, labels), value in sorted(self._counters.items()):
+                if name not in typed:
+                    lines.append(f"# TYPE {name} counter")
+                    typed.add(name)
+                lines.append(f"{name}{_format_labels(labels)} {value:g}")
+
+            for (name, labels), hist in sorted(self._histograms.items()):
+                if name not in typed:
+                    lines.append(f"# TYPE {name} histogram")
+                    typed.add(name)
+                cumulative = 0
+                for bound, n in zip(list(hist.buckets) + [float("inf")], hist.counts):
+                    cumulative += n
+                    le = "+Inf" if bound == float("inf") else f"{bound:g}"
+                    lines.append(f"{name}_bucket{_format_labels(labels, ('le', le))} {cumulative}")
+                lines.append(f"{name}_sum{_format_labels(labels)} {hist.sum:.6f}")
+                lines.append(f"{name}_count{_format_labels(labels)} {hist.count}")
+        return "\n".join(lines) + "\n"
+
+    def to_json(self) -> Dict[str, list]:
+        with self._lock:
+            return {
+                "counters": [
+                    {"name": name, "labels": dict(labels), "value": value}
+                    for (name, labels), value in sorted(self._counters.items())
+                ],
+                "histograms": [
+                    {
+                        "name": name,
+                        "labels": dict(labels),
+                        "count": hist.count,
+                        "sum": round(hist.sum, 6),
+                        "p50": round(hist.quantile(0.5), 6),
+                        "p90": round(hist.quantile(0.9), 6),
+                        "p99": round(hist.quantile(0.99), 6),
+                    }
+                    for (name, labels), hist in sorted(self._histograms.items())
+                ],
+            }
+
+    def export(self, path: str = METRICS_FILE) -> str:
+        """
+        Skriv metrics atomisk (tmp + rename, så en textfile-collector aldrig læser
+        en halv fil): JSON hvis filen ender på .json, ellers Prometheus-format.
+        """
+        out_dir = os.path.dirname(path)
+        if out_dir:
+            os.makedirs(out_dir, exist_ok=True)
+
+        if path.endswith(".json"):
+            content = json.dumps(self.to_json(), ensure_ascii=False, indent=2)
+        else:
+            content = self.to_prometheus()
+
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(content)
+        os.replace(tmp_path, path)
+        return path
+
+
+# Fælles registry for hele kørslen
+METRICS = Metrics()
@@ -0,0 +1,182 @@
+import argparse
+import atexit
+import glob
+import gzip
+import json
+import os
+import queue
+import threading
+from typing import Dict, Iterator, List, Optional
+
+from config import MODEL_LOG_DIR, MODEL_LOG_NAME, MODEL_LOG_ROTATE_BYTES
+
+_STOP = object()
+
+
+class ModelLogWriter:
+    """
+    Skriver modellens rå svar i en baggrundstråd, så request-stien aldrig venter på disk.
+
+    Hver post er en JSON-linje (label, companies, key_id, attempt, latency, raw, ...)
+    komprimeret som sit eget gzip-member. Filerne (`<navn>_NNN.jsonl.gz`) er derfor
+    almindelige gzip-filer, men hver post kan også læses alene ud fra sin byte-offset.
+    Offsets skrives i et indeks (`<navn>.idx.jsonl`), og datafilen roteres ved
+    `rotate_bytes`.
+    """
+
+    def __init__(
+        self,
+        directory: str = MODEL_LOG_DIR,
+        name: str = MODEL_LOG_NAME,
+        rotate_bytes: int = MODEL_LOG_ROTATE_BYTES,
+    ):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.name = name
+        self.rotate_bytes = rotate_bytes
+        self.index_path = os.path.join(directory, f"{name}.idx.jsonl")
+
+        self._queue: "queue.Queue" = queue.Queue()
+        self._part = 0
+        self._data = None
+        self._index = open(self.index_path, "a", encoding="utf-8")
+        self._open_next_part()
+
+        self._thread = threading.Thread(target=self._run, name="model-log-writer", daemon=True)
+        self._thread.start()
+
+    def _open_next_part(self) -> None:
+        if self._data is not None:
+            self._data.close()
+        self._part += 1
+        self.data_path = os.path.join(self.directory, f"{self.name}_{self._part:03d}.jsonl.gz")
+        self._data = open(self.data_path, "ab")
+
+    def write(self, record: Dict) -> None:
+        """Læg en post i køen (blokerer ikke)."""
+        self._queue.put(record)
+
+    def _run(self) -> None:
+        while True:
+            item = self._queue.get()
+            batch = [item]
+            # Tag alt hvad der ligger i køen, så vi flusher én gang pr. batch
+            while True:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            stop = any(r is _STOP for r in batch)
+            self._write_batch([r for r in batch if r is not _STOP])
+            if stop:
+                return
+
+    def _write_batch(self, records: List[Dict]) -> None:
+        for record in records:
+            if self._data.tell() >= self.rotate_bytes:
+                self._open_next_part()
+
+            member = gzip.compress(
+                (json.dumps(record, ensure_ascii=False) + "\n").encode("utf-8")
+            )
+            offset = self._data.tell()
+            self._data.write(member)
+
+            # Ét indeks-opslag pr. virksomhed i posten (pakkede kald dækker flere)
+            for company in record.get("companies") or [record.get("label", "")]:
+                self._index.write(json.dumps({
+                    "company": company,
+                    "ts": record.get("ts", ""),
+                    "file": os.path.basename(self.data_path),
+                    "offset": offset,
+                    "length": len(member),
+                }, ensure_ascii=False) + "\n")
+
+        self._data.flush()
+        self._index.flush()
+
+    def close(self) -> None:
+        """Skriv resten af køen og luk filerne."""
+        if not self._thread.is_alive():
+            return
+        self._queue.put(_STOP)
+        self._thread.join()
+        self._data.close()
+        self._index.close()
+
+
+_writer: Optional[ModelLogWriter] = None
+_writer_lock = threading.Lock()
+
+
+def get_log_writer() -> ModelLogWriter:
+    """
+    Den fælles writer for kørslen (startes første gang der logges). Mappen
+    læses først her, så den kan peges om (fx til en tmp-mappe i tests).
+    """
+    global _writer
+    with _writer_lock:
+        if _writer is None:
+            _writer = ModelLogWriter(MODEL_LOG_DIR)
+            atexit.register(_writer.close)
+        return _writer
+
+
+def close_log_writer() -> None:
+    global _writer
+    with _writer_lock:
+        if _writer is not None:
+            _writer.close()
+            _writer = None
+
+
+def iter_index(directory: str = MODEL_LOG_DIR) -> Iterator[Dict]:
+    for path in sorted(glob.glob(os.path.join(directory, "*.idx.jsonl"))):
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    yield json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+
+
+def read_record(entry: Dict, directory: str = MODEL_LOG_DIR) -> Dict:
+    """Læs én post direkte ud fra dens indeks-opslag (uden at scanne filen)."""
+    with open(os.path.join(directory, entry["file"]), "rb") as f:
+        f.seek(entry["offset"])
+        return json.loads(gzip.decompress(f.read(entry["length"])))
+
+
+def lookup(company_name: str, directory: str = MODEL_LOG_DIR) -> List[Dict]:
+    """Alle loggede svar for en virksomhed (på tværs af kørsler), ældste først."""
+    return [
+        read_record(entry, directory)
+        for entry in iter_index(directory)
+        if entry.get("company") == company_name
+    ]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Slå modellens rå svar op for en virksomhed.")
+    parser.add_argument("company", help="virksomhedens navn (præcis som i resultaterne)")
+    parser.add_argument("--dir", default=MODEL_LOG_DIR, help=f"log-mappe (standard: {MODEL_LOG_DIR})")
+    args = parser.parse_args()
+
+    records = lookup(args.company, args.dir)
+    if not records:
+        print(f"Ingen loggede svar for {args.company!r} i {args.dir}.")
+        return
+
+    for r in records:
+        print("=" * 80)
+        print(
+            f"{r.get('ts', '')} · {r.get('label', '')} · nøgle {r.get('key_id', '-')} "
+            f"· forsøg {r.get('attempt', '-')} · {r.get('latency') or 0:.2f}s"
+        )
+        print("-" * 80)
+        print(r.get("raw", ""))
+
+
+if __name__ == "__main__":
+    main()
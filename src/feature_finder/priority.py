@@ -0,0 +1,151 @@
+import heapq
+import os
+import threading
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+import pandas as pd
+
+from config import LEAD_SCORES_FALLBACK_FILE, LEAD_SCORES_FILE, LEAD_SCORES_SHEET, SHEET_PRIORITY
+
+
+class Budget:
+    """
+    Loft over antal modelkald og tokens i en kørsel.
+
+    KeyScheduler trækker et token-estimat fra budgettet, hver gang et kald får en
+    nøgle, og erstatter det med det faktiske forbrug (completion.usage), når
+    svaret er modtaget; fejler kaldet før der kommer et svar, gives estimatet
+    tilbage. Køen tjekker `exhausted` før næste virksomhed startes,
+    så en påbegyndt virksomhed altid gøres færdig.
+    """
+
+    def __init__(self, max_requests: Optional[int] = None, max_tokens: Optional[int] = None):
+        self.max_requests = max_requests
+        self.max_tokens = max_tokens
+        self.requests = 0
+        self.tokens = 0
+        self._lock = threading.Lock()
+
+    def charge(self, requests: int, tokens: int) -> None:
+        with self._lock:
+            self.requests += requests
+            self.tokens += tokens
+
+    @property
+    def exhausted(self) -> bool:
+        with self._lock:
+            return (
+                (self.max_requests is not None and self.requests >= self.max_requests)
+                or (self.max_tokens is not None and self.tokens >= self.max_tokens)
+            )
+
+    def describe(self) -> str:
+        def part(used: int, limit: Optional[int], unit: str) -> str:
+            return f"{used}/{limit} {unit}" if limit is not None else f"{used} {unit}"
+
+        with self._lock:
+            return (
+                f"{part(self.requests, self.max_requests, 'kald')}, "
+                f"{part(self.tokens, self.max_tokens, 'tokens')}"
+            )
+
+
+def load_lead_scores(
+    path: str = LEAD_SCORES_FILE,
+    sheet: str = LEAD_SCORES_SHEET,
+    fallback: Optional[str] = LEAD_SCORES_FALLBACK_FILE,
+) -> Dict[Tuple[str, int], float]:
+    """
+    Lead-score pr. (ark, række) fra vægtningsarket i `path` (skrevet af
+    industry_relevance_mapping/vaegtning.py) eller, hvis den fil eller dens ark
+    mangler, fra makroens ark i `fallback`. Bruger kolonnen "I alt", hvis den
+    findes, ellers summen af Del 1–3. Mangler arket eller kolonnerne Ark/Række,
+    er alle scores 0.
+    """
+    df = None
+    for candidate in (path, fallback):
+        if not candidate or not os.path.exists(candidate):
+            continue
+        try:
+            df = pd.read_excel(candidate, sheet_name=sheet)
+            path = candidate
+            break
+        except ValueError as e:  # arket findes ikke i filen
+            print(f"Advarsel: ingen lead-scores i {candidate}: {e}")
+    if df is None:
+        print(f"Advarsel: ingen lead-scores (ark '{sheet}' i {path} eller {fallback})")
+        return {}
+
+    parts = [c for c in df.columns if str(c).startswith("Del ")]
+    missing = [c for c in ("Ark", "Række") if c not in df.columns]
+    if not parts and "I alt" not in df.columns:
+        missing.append("I alt eller Del 1–3")
+    if missing:
+        print(f"Advarsel: ingen lead-scores – arket '{sheet}' i {path} mangler {', '.join(missing)}")
+        return {}
+    total = df["I alt"] if "I alt" in df.columns else df[parts].sum(axis=1)
+    total = pd.to_numeric(total, errors="coerce").fillna(0)
+
+    rows = pd.to_numeric(df["Række"], errors="coerce")
+    valid = rows.notna()
+    return dict(zip(
+        zip(df.loc[valid, "Ark"].astype(str), rows[valid].astype(int)),
+        total[valid].astype(float),
+    ))
+
+
+def company_priority(
+    company: Dict[str, str],
+    lead_scores: Dict[Tuple[str, int], float],
+    sheet_priority: Dict[str, float] = SHEET_PRIORITY,
+) -> float:
+    """Lead-score for virksomhedens række plus arkets prioritet."""
+    score = lead_scores.get((company["sheet"], company.get("row")), 0.0)
+    return score + sheet_priority.get(company["sheet"], 0.0)
+
+
+class PriorityQueue:
+    """
+    Virksomheder i den rækkefølge, kvoten bør bruges: først dem der allerede
+    ligger i svar-cachen (de koster intet), derefter efter faldende prioritet
+    (lead-score + ark-prioritet). Lige prioritet beholder rækkefølgen fra arket.
+    """
+
+    def __init__(
+        self,
+        companies: Sequence[Dict[str, str]],
+        lead_scores: Dict[Tuple[str, int], float],
+        is_cached: Optional[Callable[[Dict[str, str]], bool]] = None,
+        sheet_priority: Dict[str, float] = SHEET_PRIORITY,
+    ):
+        self._heap: List[Tuple[bool, float, int, Dict[str, str]]] = []
+        for i, company in enumerate(companies):
+            cached = bool(is_cached and is_cached(company))
+            score = company_priority(company, lead_scores, sheet_priority)
+            self._heap.append((not cached, -score, i, company))
+        heapq.heapify(self._heap)
+
+    def __len__(self) -> int:
+        return len(self._heap)
+
+    def pop(self) -> Dict[str, str]:
+        return heapq.heappop(self._heap)[3]
+
+    def ordered(self) -> List[Dict[str, str]]:
+        """Tøm køen og returnér alle virksomheder i prioriteret rækkefølge."""
+        return [self.pop() for _ in range(len(self._heap))]
+
+    def drain(self, budget: Optional[Budget] = None, size: int = 1) -> Iterator[List[Dict[str, str]]]:
+        """
+        Giv pakker af `size` virksomheder i prioriteret rækkefølge, indtil køen er
+        tom eller budgettet er brugt. Virksomheder i cachen gives altid.
+        """
+        while self._heap:
+            free = not self._heap[0][0]
+            if not free and budget is not None and budget.exhausted:
+                return
+            pack = [self.pop()]
+            # Hold gratis (cachede) og betalte virksomheder i hver sin pakke
+            while len(pack) < size and self._heap and (not self._heap[0][0]) == free:
+                pack.append(self.pop())
+            yield pack
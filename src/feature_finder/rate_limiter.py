@@ -0,0 +1,331 @@
+import asyncio
+import re
+import threading
+import time
+from typing import Dict, List, Mapping, Optional, Sequence, Tuple
+
+from config import (
+    API_KEYS,
+    BREAKER_COOLDOWN,
+    BREAKER_THRESHOLD,
+    MAX_CONCURRENCY_PER_KEY,
+    RATE_LIMIT_REQUESTS_PER_MINUTE,
+    RATE_LIMIT_TOKENS_PER_MINUTE,
+)
+from metrics import METRICS
+from utils import mask_key
+
+
+_DURATION_PART = re.compile(r"(\d+(?:\.\d+)?)(ms|h|m|s)")
+_DURATION_FACTORS = {"h": 3600.0, "m": 60.0, "s": 1.0, "ms": 0.001}
+
+
+def parse_duration(value: Optional[str]) -> Optional[float]:
+    """
+    Parser varigheder fra rate-limit-headers til sekunder.
+    Understøtter både rene tal ("7", "0.5") og Groq-formatet ("2m59.56s", "120ms").
+    """
+    if value is None:
+        return None
+    text = str(value).strip().lower()
+    if not text:
+        return None
+    try:
+        return max(0.0, float(text))
+    except ValueError:
+        pass
+
+    parts = _DURATION_PART.findall(text)
+    if not parts:
+        return None
+    return sum(float(n) * _DURATION_FACTORS[unit] for n, unit in parts)
+
+
+def _header_int(headers: Mapping[str, str], name: str) -> Optional[int]:
+    value = headers.get(name)
+    if value is None:
+        return None
+    try:
+        return int(float(value))
+    except ValueError:
+        return None
+
+
+def estimate_tokens(messages: Sequence[Dict[str, str]], max_output_tokens: int) -> int:
+    """Groft estimat af et kalds token-forbrug (ca. 4 tegn pr. token + maks. output)."""
+    chars = sum(len(m.get("content") or "") for m in messages)
+    return chars // 4 + max_output_tokens
+
+
+class TokenBucket:
+    """Klassisk token bucket: `capacity` enheder, der fyldes op med `rate` pr. sekund."""
+
+    def __init__(self, capacity: float, rate: float):
+        self.capacity = float(capacity)
+        self.rate = float(rate)
+        self.level = float(capacity)
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float) -> None:
+        elapsed = max(0.0, now - self.updated)
+        self.level = min(self.capacity, self.level + elapsed * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount: float, now: float) -> float:
+        """Sekunder til der er `amount` enheder i spanden (0 hvis allerede nu)."""
+        self._refill(now)
+        # Et kald der er større end hele spanden må vente til den er fuld
+        amount = min(amount, self.capacity)
+        if self.level >= amount:
+            return 0.0
+        if self.rate <= 0:
+            return float("inf")
+        return (amount - self.level) / self.rate
+
+    def consume(self, amount: float, now: float) -> None:
+        self._refill(now)
+        self.level -= amount
+
+    def refund(self, amount: float, now: float) -> None:
+        self._refill(now)
+        self.level = min(self.capacity, self.level + amount)
+
+    def set_level(self, level: float, now: float) -> None:
+        """Synkronisér spanden med udbyderens tal (vi stoler mest på det laveste)."""
+        self._refill(now)
+        self.level = min(self.level, float(level))
+
+    def set_limit(self, capacity: float, rate: Optional[float], now: float) -> None:
+        """Brug udbyderens loft som kapacitet (og genopfyldningstakt, hvis den kendes)."""
+        self._refill(now)
+        self.capacity = float(capacity)
+        if rate is not None:
+            self.rate = float(rate)
+        self.level = min(self.level, self.capacity)
+
+
+class NoUsableKeysError(RuntimeError):
+    """Alle nøgler er afvist (401/403) – et nyt forsøg kan ikke lykkes."""
+
+
+class _KeyState:
+    def __init__(self, api_key: str, requests_per_minute: float, tokens_per_minute: float):
+        self.api_key = api_key
+        self.requests = TokenBucket(requests_per_minute, requests_per_minute / 60.0)
+        self.tokens = TokenBucket(tokens_per_minute, tokens_per_minute / 60.0)
+        self.blocked_until = 0.0
+        self.in_flight = 0
+        self.failures = 0          # fejl i træk (nulstilles ved et vellykket kald)
+        self.breaker_until = 0.0   # afbryderen er åben (nøglen hviler) indtil dette tidspunkt
+        self.disabled = False      # afvist (401/403) – tages aldrig med igen i kørslen
+
+
+class KeyScheduler:
+    """
+    Fordeler kald mellem API-nøgler ud fra en request- og en token-bucket pr. nøgle.
+
+    `acquire()` returnerer den nøgle, der har mest kapacitet lige nu (og venter
+    ellers præcis så længe, som det tager før en nøgle har plads). Efter hvert svar
+    opdateres spandene fra udbyderens `x-ratelimit-*`-headers (loft og takt fra
+    limit/reset, niveau fra remaining), og ved fejl
+    (report_failure) spærres nøglen i retry-after/backoff-tiden, så næste forsøg
+    går til en anden nøgle. Fejler en nøgle `breaker_threshold` gange i træk,
+    åbnes dens afbryder, og nøglen hviler i `breaker_cooldown` sekunder; derefter
+    får den ét prøvekald, og lykkes det, er den tilbage i rotationen.
+    En nøgle der afvises (401/403), tages permanent ud (disable); er der ingen
+    nøgler tilbage, kaster acquire NoUsableKeysError.
+    Kan bruges både fra tråde (acquire) og fra asyncio (acquire_async).
+    """
+
+    def __init__(
+        self,
+        api_keys: Sequence[str] = API_KEYS,
+        requests_per_minute: float = RATE_LIMIT_REQUESTS_PER_MINUTE,
+        tokens_per_minute: float = RATE_LIMIT_TOKENS_PER_MINUTE,
+        max_concurrency: int = MAX_CONCURRENCY_PER_KEY,
+        budget=None,
+        breaker_threshold: int = BREAKER_THRESHOLD,
+        breaker_cooldown: float = BREAKER_COOLDOWN,
+    ):
+        keys = [k for k in api_keys if k]
+        if not keys:
+            raise RuntimeError("API key mangler!")
+        self.max_concurrency = max(1, max_concurrency)
+        self.budget = budget  # priority.Budget; trækkes for hvert kald der får en nøgle
+        self.breaker_threshold = max(1, breaker_threshold)
+        self.breaker_cooldown = breaker_cooldown
+        self._states: Dict[str, _KeyState] = {
+            k: _KeyState(k, requests_per_minute, tokens_per_minute) for k in keys
+        }
+        self._lock = threading.Lock()
+
+    @property
+    def keys(self) -> List[str]:
+        return list(self._states)
+
+    @property
+    def has_usable_keys(self) -> bool:
+        with self._lock:
+            return any(not state.disabled for state in self._states.values())
+
+    def _try_acquire(self, cost: int) -> Tuple[Optional[str], float]:
+        """Reservér plads på den bedste nøgle, eller returnér hvor længe vi skal vente."""
+        now = time.monotonic()
+        best_key = None
+        best_headroom = -1.0
+        min_wait = float("inf")
+
+        with self._lock:
+            for key, state in self._states.items():
+                if state.disabled:
+                    continue
+                if state.in_flight >= self.max_concurrency:
+                    # Der frigives en plads når et kald afsluttes – tjek igen snart
+                    min_wait = min(min_wait, 0.05)
+                    continue
+
+                wait = max(
+                    state.blocked_until - now,
+                    state.breaker_until - now,
+                    state.requests.wait_time(1, now),
+                    state.tokens.wait_time(cost, now),
+                )
+                if wait > 0:
+                    min_wait = min(min_wait, wait)
+                    continue
+
+                headroom = min(
+                    state.requests.level / state.requests.capacity,
+                    state.tokens.level / state.tokens.capacity,
+                )
+                if headroom > best_headroom:
+                    best_key, best_headroom = key, headroom
+
+            if best_key is None:
+                if all(state.disabled for state in self._states.values()):
+                    raise NoUsableKeysError("Ingen brugbare API-nøgler tilbage – alle er afvist (401/403)")
+                return None, min_wait
+
+            state = self._states[best_key]
+            state.requests.consume(1, now)
+            state.tokens.consume(cost, now)
+            state.in_flight += 1
+            if self.budget is not None:
+                self.budget.charge(1, cost)
+            return best_key, 0.0
+
+    def acquire(self, cost: int) -> str:
+        """Blokér indtil en nøgle har kapacitet til et kald på ca. `cost` tokens."""
+        with METRICS.timer("key_wait_seconds"):
+            while True:
+                key, wait = self._try_acquire(cost)
+                if key is not None:
+                    return key
+                time.sleep(min(wait, 5.0))
+
+    async def acquire_async(self, cost: int) -> str:
+        """Som acquire(), men venter med asyncio.sleep."""
+        with METRICS.timer("key_wait_seconds"):
+            while True:
+                key, wait = self._try_acquire(cost)
+                if key is not None:
+                    return key
+                await asyncio.sleep(min(wait, 5.0))
+
+    def settle(self, estimated: int, actual: int) -> None:
+        """Ret budgettet fra token-estimatet til kaldets faktiske forbrug (completion.usage)."""
+        if self.budget is not None:
+            self.budget.charge(0, actual - estimated)
+
+    def refund(self, api_key: str, estimated: int) -> None:
+        """
+        Giv token-estimatet tilbage for et kald, der fejlede før modellen svarede
+        (429, 401, timeout, forbindelsesfejl …) – det har intet forbrug, så det
+        skal hverken tælle i nøglens spand eller i budgettet.
+        """
+        with self._lock:
+            self._states[api_key].tokens.refund(estimated, time.monotonic())
+        if self.budget is not None:
+            self.budget.charge(0, -estimated)
+
+    def release(self, api_key: str) -> None:
+        with self._lock:
+            state = self._states[api_key]
+            state.in_flight = max(0, state.in_flight - 1)
+
+    def update_from_headers(self, api_key: str, headers: Optional[Mapping[str, str]]) -> None:
+        """Synkronisér nøglens spande med udbyderens rate-limit- og retry-after-headers."""
+        if not headers:
+            return
+        now = time.monotonic()
+
+        with self._lock:
+            state = self._states[api_key]
+
+            for bucket, kind in ((state.requests, "requests"), (state.tokens, "tokens")):
+                limit = _header_int(headers, f"x-ratelimit-limit-{kind}")
+                remaining = _header_int(headers, f"x-ratelimit-remaining-{kind}")
+                reset = parse_duration(headers.get(f"x-ratelimit-reset-{kind}"))
+                if limit is not None and limit > 0:
+                    # Reset-tiden er tiden til spanden er fuld igen, så takten er
+                    # (limit - remaining) / reset – det gælder både for Groqs
+                    # requests pr. dag og tokens pr. minut
+                    rate = None
+                    if remaining is not None and reset and remaining < limit:
+                        rate = (limit - remaining) / reset
+                    bucket.set_limit(limit, rate, now)
+                if remaining is None:
+                    continue
+                bucket.set_level(remaining, now)
+                if remaining <= 0 and reset:
+                    state.blocked_until = max(state.blocked_until, now + reset)
+
+            retry_after = parse_duration(headers.get("retry-after"))
+            if retry_after:
+                state.blocked_until = max(state.blocked_until, now + retry_after)
+
+    def report_failure(self, api_key: str, delay: float) -> bool:
+        """
+        Registrér et fejlet kald: spær nøglen i `delay` sekunder og åbn afbryderen,
+        hvis den har fejlet for mange gange i træk. Returnerer True, hvis
+        afbryderen blev åbnet.
+        """
+        now = time.monotonic()
+        with self._lock:
+            state = self._states[api_key]
+            state.failures += 1
+            state.blocked_until = max(state.blocked_until, now + delay)
+            if state.failures >= self.breaker_threshold:
+                state.breaker_until = now + self.breaker_cooldown
+                return True
+            return False
+
+    def disable(self, api_key: str) -> None:
+        """Tag en afvist nøgle (401/403) ud af rotationen for resten af kørslen."""
+        with self._lock:
+            self._states[api_key].disabled = True
+
+    def report_success(self, api_key: str) -> None:
+        with self._lock:
+            self._states[api_key].failures = 0
+
+    def describe(self) -> str:
+        """Kort status pr. nøgle til konsollen."""
+        now = time.monotonic()
+        parts = []
+        with self._lock:
+            for key, state in self._states.items():
+                if state.disabled:
+                    parts.append(f"{mask_key(key)}: afvist")
+                    continue
+                state.requests.wait_time(0, now)
+                state.tokens.wait_time(0, now)
+                breaker = (
+                    f", afbryder åben {state.breaker_until - now:.0f}s"
+                    if state.breaker_until > now else ""
+                )
+                parts.append(
+                    f"{mask_key(key)}: {state.requests.level:.0f} req, "
+                    f"{state.tokens.level:.0f} tok, {state.in_flight} i gang{breaker}"
+                )
+        return " | ".join(parts)
@@ -0,0 +1,422 @@
+import argparse
+import csv
+import glob
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+from datetime import datetime
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from config import JOURNAL_FILE, RESULTS_DB_FILE
+from sinks import RESULT_FIELDS
+
+# Det der som standard indlæses af 'load' (kørslernes resultatfiler og journaler)
+DEFAULT_SOURCES = (
+    "results_compound_*.csv",
+    "results_compound_*.parquet",
+    f"{os.path.splitext(JOURNAL_FILE)[0]}*.jsonl",  # inkl. shard-journaler
+)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS results (
+    company   TEXT NOT NULL,
+    feature   TEXT NOT NULL,
+    relevance TEXT NOT NULL,
+    reason    TEXT,
+    website   TEXT,
+    run_ts    TEXT NOT NULL,
+    source    TEXT NOT NULL,
+    PRIMARY KEY (company, feature)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS results_feature ON results (feature, relevance, company);
+CREATE INDEX IF NOT EXISTS results_relevance ON results (relevance, company);
+
+CREATE TABLE IF NOT EXISTS company_sheets (
+    company TEXT NOT NULL,
+    sheet   TEXT NOT NULL,
+    row     INTEGER,
+    PRIMARY KEY (company, sheet)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS company_sheets_sheet ON company_sheets (sheet, company);
+
+-- Features der ikke længere står i features.xlsx; deres rækker er forældede
+CREATE TABLE IF NOT EXISTS stale_features (
+    feature   TEXT PRIMARY KEY,
+    marked_at REAL NOT NULL
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS sources (
+    path      TEXT PRIMARY KEY,
+    mtime_ns  INTEGER NOT NULL,
+    size      INTEGER NOT NULL,
+    offset    INTEGER NOT NULL,
+    rows      INTEGER NOT NULL,
+    loaded_at REAL NOT NULL
+);
+"""
+
+# Nyeste kørsel vinder; et ældre resultat overskriver aldrig et nyere
+UPSERT = """
+INSERT INTO results (company, feature, relevance, reason, website, run_ts, source)
+VALUES (?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT (company, feature) DO UPDATE SET
+    relevance = excluded.relevance,
+    reason    = excluded.reason,
+    website   = excluded.website,
+    run_ts    = excluded.run_ts,
+    source    = excluded.source
+WHERE excluded.run_ts >= results.run_ts
+"""
+
+ResultRow = Tuple[str, str, str, str, str, str, str]
+
+
+def _file_ts(path: str) -> str:
+    """Kørselstidspunkt for en resultatfil uden egne tidsstempler: filens mtime."""
+    return datetime.fromtimestamp(os.stat(path).st_mtime).strftime("%Y-%m-%dT%H:%M:%S")
+
+
+def _result_row(row: Dict[str, str], run_ts: str, source: str) -> Optional[ResultRow]:
+    company, feature = (row.get("Company") or "").strip(), (row.get("Feature") or "").strip()
+    if not company or not feature:
+        return None
+    return (
+        company,
+        feature,
+        (row.get("Relevance") or "unknown").strip().lower(),
+        row.get("Reason") or "",
+        row.get("Website") or "",
+        run_ts,
+        source,
+    )
+
+
+def _read_parquet(path: str) -> Iterator[Dict[str, str]]:
+    try:
+        import pyarrow.parquet as pq
+    except ImportError as e:
+        raise RuntimeError(
+            "Indlæsning af Parquet kræver pyarrow – installer med 'pip install pyarrow'."
+        ) from e
+    for batch in pq.ParquetDataset(path).read(columns=RESULT_FIELDS).to_batches():
+        yield from batch.to_pylist()
+
+
+class ResultsStore:
+    """
+    Samlet, indekseret SQLite-database over alle kørslers resultater.
+
+    Én række pr. (virksomhed, feature); indlæses en nyere kørsel, overskriver den
+    den gamle vurdering (upsert på run_ts), mens ældre filer aldrig overskriver
+    nyere. Ark-medlemskab ligger i `company_sheets`, da en virksomhed kan stå i
+    flere ark. Indlæsning er inkrementel: uændrede filer springes over, og
+    journaler (append-only) læses kun fra det sted, hvor sidste indlæsning slap.
+    Rækker for features, der er fjernet fra features.xlsx, slettes ikke, men
+    markeres som forældede (mark_stale) og udelades som standard i query().
+    """
+
+    def __init__(self, path: str = RESULTS_DB_FILE):
+        db_dir = os.path.dirname(path)
+        if db_dir:
+            os.makedirs(db_dir, exist_ok=True)
+
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+        self._conn.commit()
+
+    # ---------- indlæsning ----------
+
+    def _source_state(self, path: str) -> Optional[Tuple[int, int, int]]:
+        row = self._conn.execute(
+            "SELECT mtime_ns, size, offset FROM sources WHERE path = ?", (path,)
+        ).fetchone()
+        return tuple(row) if row else None
+
+    def _finish_source(self, path: str, stat: os.stat_result, offset: int, rows: int) -> None:
+        self._conn.execute(
+            """
+            INSERT INTO sources (path, mtime_ns, size, offset, rows, loaded_at)
+            VALUES (?, ?, ?, ?, ?, ?)
+            ON CONFLICT (path) DO UPDATE SET
+                mtime_ns = excluded.mtime_ns, size = excluded.size, offset = excluded.offset,
+                rows = sources.rows + excluded.rows, loaded_at = excluded.loaded_at
+            """,
+            (path, stat.st_mtime_ns, stat.st_size, offset, rows, time.time()),
+        )
+
+    def _upsert(self, rows: Iterable[Optional[ResultRow]]) -> int:
+        batch = [r for r in rows if r is not None]
+        self._conn.executemany(UPSERT, batch)
+        return len(batch)
+
+    def _add_sheets(self, memberships: Iterable[Tuple[str, str, Optional[int]]]) -> None:
+        self._conn.executemany(
+            """
+            INSERT INTO company_sheets (company, sheet, row) VALUES (?, ?, ?)
+            ON CONFLICT (company, sheet) DO UPDATE SET row = COALESCE(excluded.row, company_sheets.row)
+            """,
+            memberships,
+        )
+
+    def load_journal(self, path: str) -> int:
+        """Indlæs nye poster fra en journal (fra sidste offset). Returnerer antal rækker."""
+        source = os.path.abspath(path)
+        stat = os.stat(path)
+        state = self._source_state(source)
+        offset = state[2] if state and stat.st_size >= state[2] else 0
+        if state and offset == stat.st_size:
+            return 0
+
+        rows: List[Optional[ResultRow]] = []
+        sheets: List[Tuple[str, str, Optional[int]]] = []
+        with open(path, "rb") as f:
+            f.seek(offset)
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break  # halvt skrevet linje – tages med næste gang
+                offset += len(line)
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                if entry.get("sheet"):
+                    sheets.append((entry.get("name", ""), entry["sheet"], entry.get("row")))
+                if entry.get("status") != "ok":
+                    continue
+                ts = entry.get("ts") or _file_ts(path)
+                rows.extend(_result_row(r, ts, source) for r in entry.get("rows", []))
+
+        with self._lock, self._conn:
+            count = self._upsert(rows)
+            self._add_sheets(sheets)
+            self._finish_source(source, stat, offset, count)
+        return count
+
+    def load_results(self, path: str) -> int:
+        """Indlæs en resultatfil (CSV eller Parquet-mappe), hvis den er ny eller ændret."""
+        source = os.path.abspath(path)
+        stat = os.stat(path)
+        state = self._source_state(source)
+        if state and state[:2] == (stat.st_mtime_ns, stat.st_size):
+            return 0
+
+        ts = _file_ts(path)
+        if os.path.isdir(path) or path.endswith(".parquet"):
+            records: Iterable[Dict[str, str]] = _read_parquet(path)
+            f = None
+        else:
+            f = open(path, newline="", encoding="utf-8")
+            records = csv.DictReader(f)
+        try:
+            with self._lock, self._conn:
+                count = self._upsert(_result_row(r, ts, source) for r in records)
+                self._finish_source(source, stat, stat.st_size, count)
+        finally:
+            if f is not None:
+                f.close()
+        return count
+
+    def load(self, path: str) -> int:
+        if path.endswith(".jsonl"):
+            return self.load_journal(path)
+        return self.load_results(path)
+
+    def register_companies(self, companies: Iterable[Dict[str, str]]) -> None:
+        """Ark-medlemskab for virksomheder fra load_companies() (resultatfiler har ikke arket)."""
+        with self._lock, self._conn:
+            self._add_sheets((c["name"], c["sheet"], c.get("row")) for c in companies)
+
+    def mark_stale(self, features: Iterable[str]) -> int:
+        """
+        Markér features i databasen, som ikke står i `features` (den aktuelle
+        feature-liste), som forældede; en feature der kommer tilbage, afmarkeres.
+        Returnerer antal forældede features.
+        """
+        current = list(dict.fromkeys(features))
+        with self._lock, self._conn:
+            self._conn.execute("CREATE TEMP TABLE IF NOT EXISTS current_features (feature TEXT PRIMARY KEY)")
+            self._conn.execute("DELETE FROM current_features")
+            self._conn.executemany("INSERT INTO current_features VALUES (?)", ((f,) for f in current))
+            self._conn.execute(
+                "DELETE FROM stale_features WHERE feature IN (SELECT feature FROM current_features)"
+            )
+            self._conn.execute(
+                """
+                INSERT OR IGNORE INTO stale_features (feature, marked_at)
+                SELECT DISTINCT feature, ? FROM results
+                WHERE feature NOT IN (SELECT feature FROM current_features)
+                """,
+                (time.time(),),
+            )
+            (count,) = self._conn.execute("SELECT COUNT(*) FROM stale_features").fetchone()
+        return count
+
+    # ---------- forespørgsler ----------
+
+    def query(
+        self,
+        feature: Optional[str] = None,
+        relevance: Optional[Sequence[str]] = None,
+        sheet: Optional[str] = None,
+        company: Optional[str] = None,
+        limit: Optional[int] = None,
+        include_stale: bool = False,
+    ) -> List[Dict[str, str]]:
+        """
+        Søg i resultaterne. `feature` og `company` må indeholde * som joker
+        (ellers eksakt match, som bruger indekset direkte). Forældede features
+        (se mark_stale) medtages kun med `include_stale`.
+        """
+        where, params = [], []
+
+        def match(column: str, value: str) -> None:
+            if "*" in value:
+                where.append(f"{column} LIKE ?")
+                params.append(value.replace("*", "%"))
+            else:
+                where.append(f"{column} = ?")
+                params.append(value)
+
+        if feature:
+            match("r.feature", feature)
+        if relevance:
+            where.append(f"r.relevance IN ({','.join('?' * len(relevance))})")
+            params.extend(r.lower() for r in relevance)
+        if company:
+            match("r.company", company)
+        if sheet:
+            where.append("r.company IN (SELECT company FROM company_sheets WHERE sheet = ?)")
+            params.append(sheet)
+        if not include_stale:
+            where.append("r.feature NOT IN (SELECT feature FROM stale_features)")
+
+        sql = (
+            "SELECT r.company, "
+            "(SELECT group_concat(sheet, ',') FROM company_sheets s WHERE s.company = r.company), "
+            "r.website, r.feature, r.relevance, r.reason, r.run_ts FROM results r"
+        )
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += " ORDER BY r.company, r.feature"
+        if limit:
+            sql += f" LIMIT {int(limit)}"
+
+        columns = ["Company", "Sheets", "Website", "Feature", "Relevance", "Reason", "Run"]
+        with self._lock:
+            return [dict(zip(columns, row)) for row in self._conn.execute(sql, params)]
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            (rows,) = self._conn.execute("SELECT COUNT(*) FROM results").fetchone()
+            (companies,) = self._conn.execute("SELECT COUNT(DISTINCT company) FROM results").fetchone()
+            (features,) = self._conn.execute("SELECT COUNT(DISTINCT feature) FROM results").fetchone()
+            (sources,) = self._conn.execute("SELECT COUNT(*) FROM sources").fetchone()
+            (stale,) = self._conn.execute(
+                "SELECT COUNT(*) FROM results WHERE feature IN (SELECT feature FROM stale_features)"
+            ).fetchone()
+        return {
+            "rows": rows, "companies": companies, "features": features,
+            "sources": sources, "stale_rows": stale,
+        }
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+def expand_sources(patterns: Sequence[str]) -> List[str]:
+    return sorted({p for pattern in patterns for p in glob.glob(pattern)})
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Samlet database over alle kørslers resultater.")
+    parser.add_argument("--db", default=RESULTS_DB_FILE, help=f"SQLite-fil (standard: {RESULTS_DB_FILE})")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p_load = sub.add_parser("load", help="indlæs nye/ændrede resultatfiler og journaler")
+    p_load.add_argument("paths", nargs="*", help=f"filer eller globs (standard: {' '.join(DEFAULT_SOURCES)})")
+    p_load.add_argument(
+        "--no-sheets", action="store_true", help="spring ark-opslag i virksomhedsfilen over"
+    )
+    p_load.add_argument(
+        "--no-stale", action="store_true",
+        help="markér ikke features, der er fjernet fra features.xlsx, som forældede",
+    )
+
+    p_query = sub.add_parser("query", help="søg i resultaterne")
+    p_query.add_argument("--feature", help="feature-navn (* som joker)")
+    p_query.add_argument("--relevance", action="append", help="fx high (kan gentages)")
+    p_query.add_argument("--sheet", help="kun virksomheder fra dette ark, fx 410000")
+    p_query.add_argument("--company", help="virksomhedsnavn (* som joker)")
+    p_query.add_argument("--limit", type=int, default=50, help="maks. antal rækker (0 = alle)")
+    p_query.add_argument("--include-stale", action="store_true", help="medtag fjernede features")
+    p_query.add_argument("--csv", action="store_true", help="skriv CSV til stdout i stedet for en tabel")
+
+    sub.add_parser("stats", help="vis antal rækker, virksomheder og indlæste filer")
+    args = parser.parse_args()
+
+    store = ResultsStore(args.db)
+    try:
+        if args.command == "load":
+            paths = expand_sources(args.paths or DEFAULT_SOURCES)
+            if not args.no_sheets:
+                from companies import load_companies
+                try:
+                    store.register_companies(load_companies())
+                except FileNotFoundError as e:
+                    print(f"Advarsel: ingen ark-oplysninger ({e})")
+            started = time.perf_counter()
+            total = 0
+            for path in paths:
+                count = store.load(path)
+                total += count
+                if count:
+                    print(f"  {path}: {count} rækker")
+            if not args.no_stale:
+                from features import load_features
+                try:
+                    print(f"  {store.mark_stale(load_features())} forældede features")
+                except FileNotFoundError as e:
+                    print(f"Advarsel: forældede features ikke markeret ({e})")
+            print(
+                f"✅ {total} rækker indlæst fra {len(paths)} filer på "
+                f"{time.perf_counter() - started:.1f}s → {store.path}"
+            )
+            args.command = "stats"
+
+        elif args.command == "query":
+            started = time.perf_counter()
+            rows = store.query(
+                args.feature, args.relevance, args.sheet, args.company,
+                args.limit or None, args.include_stale,
+            )
+            elapsed = (time.perf_counter() - started) * 1000
+            if args.csv:
+                writer = csv.DictWriter(sys.stdout, fieldnames=list(rows[0]) if rows else ["Company"])
+                writer.writeheader()
+                writer.writerows(rows)
+                return
+            for r in rows:
+                print(f"{r['Company']:<40} {r['Sheets'] or '-':<14} {r['Relevance']:<8} {r['Feature']}")
+            print(f"\n{len(rows)} rækker på {elapsed:.1f} ms")
+
+        if args.command == "stats":
+            stats = store.stats()
+            print(
+                f"Database: {stats['rows']} rækker · {stats['companies']} virksomheder · "
+                f"{stats['features']} features · {stats['sources']} indlæste filer"
+                + (f" · {stats['stale_rows']} forældede rækker" if stats["stale_rows"] else "")
+            )
+    finally:
+        store.close()
+
+
+if __name__ == "__main__":
+    main()
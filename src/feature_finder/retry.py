@@ -0,0 +1,51 @@
+import asyncio
+import random
+from typing import Optional
+
+import groq
+
+from config import RETRY_BASE_DELAY, RETRY_MAX_DELAY
+
+# Fejltyper – bestemmer om et kald prøves igen, og hvad der sker med nøglen
+RATE_LIMIT = "rate_limit"  # 429: nøglen spærres (retry-after), næste forsøg på en anden nøgle
+TRANSIENT = "transient"    # timeout, forbindelsesfejl, 5xx: kort pause på nøglen, prøv igen
+KEY = "key"                # 401/403: nøglen er ugyldig eller spærret – skift nøgle
+FATAL = "fatal"            # 400/404/422, formatfejl osv.: et nyt forsøg hjælper ikke
+
+TRANSIENT_STATUS = {408, 409, 425, 500, 502, 503, 504}
+
+
+def classify_error(error: BaseException) -> str:
+    """Klassificér en fejl ud fra SDK'ets exception-typer og HTTP-statuskoden."""
+    if isinstance(error, groq.RateLimitError):
+        return RATE_LIMIT
+    if isinstance(error, (groq.APITimeoutError, groq.APIConnectionError, asyncio.TimeoutError)):
+        return TRANSIENT
+    if isinstance(error, (groq.AuthenticationError, groq.PermissionDeniedError)):
+        return KEY
+
+    status = getattr(error, "status_code", None)
+    if status == 429:
+        return RATE_LIMIT
+    if status in TRANSIENT_STATUS or (isinstance(status, int) and status >= 500):
+        return TRANSIENT
+    if status in (401, 403):
+        return KEY
+    return FATAL
+
+
+def backoff_delay(
+    attempt: int,
+    retry_after: Optional[float] = None,
+    base: float = RETRY_BASE_DELAY,
+    cap: float = RETRY_MAX_DELAY,
+) -> float:
+    """
+    Ventetid før forsøg nr. `attempt` + 1 (0-baseret): udbyderens retry-after,
+    hvis den er angivet, ellers eksponentiel backoff med "full jitter"
+    (tilfældig mellem 0 og base · 2^attempt, højst `cap`), så mange samtidige
+    kald ikke prøver igen i takt.
+    """
+    if retry_after is not None:
+        return retry_after
+    return random.uniform(0, min(cap, base * 2 ** attempt))
@@ -0,0 +1,169 @@
+import argparse
+import glob
+import hashlib
+import os
+import re
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from config import API_KEYS, JOURNAL_FILE, RESULT_FORMAT, SHARD_API_KEYS
+from journal import CompanyKey, RunJournal, company_key
+from sinks import make_sink
+
+Shard = Tuple[int, int]  # (i, N) – i er 1-baseret ligesom batches
+
+_SHARD_SUFFIX = re.compile(r"shard_(\d+)_of_(\d+)")
+
+
+def parse_shard(value: str) -> Shard:
+    """Parser "i/N" (fx "2/4") til (2, 4). Bruges som argparse-type."""
+    try:
+        index, count = (int(part) for part in value.split("/"))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"shard skal skrives som i/N, fx 2/4 (fik {value!r})")
+    if not 1 <= index <= count:
+        raise argparse.ArgumentTypeError(f"shard {value}: i skal være mellem 1 og N")
+    return index, count
+
+
+def shard_of(company: Dict[str, str], count: int) -> int:
+    """
+    Shard-nummer (1..count) for en virksomhed. Bygger på en hash af (navn, ark),
+    så fordelingen er den samme på alle maskiner og ikke afhænger af rækkefølgen
+    i regnearket (Pythons hash() er tilfældig pr. proces og kan ikke bruges).
+    """
+    name, sheet = company_key(company)
+    digest = hashlib.sha1(f"{name}\x1f{sheet}".encode("utf-8")).digest()
+    return int.from_bytes(digest[:8], "big") % count + 1
+
+
+def select_shard(companies: Iterable[Dict[str, str]], shard: Shard) -> List[Dict[str, str]]:
+    """Virksomhederne i shard i af N (i arkets rækkefølge)."""
+    index, count = shard
+    return [c for c in companies if shard_of(c, count) == index]
+
+
+def shard_suffix(shard: Shard) -> str:
+    return f"shard_{shard[0]}_of_{shard[1]}"
+
+
+def shard_path(path: str, shard: Shard) -> str:
+    """Indsæt shard-suffikset før filendelsen: runs/journal.jsonl → runs/journal.shard_2_of_4.jsonl."""
+    root, ext = os.path.splitext(path)
+    return f"{root}.{shard_suffix(shard)}{ext}"
+
+
+def keys_for_shard(shard: Optional[Shard]) -> List[str]:
+    """API-nøgler for en shard (SHARD_API_KEYS), ellers de fælles API_KEYS."""
+    if shard is not None and SHARD_API_KEYS.get(shard[0]):
+        return list(SHARD_API_KEYS[shard[0]])
+    return list(API_KEYS)
+
+
+def shard_glob(path: str) -> str:
+    """Glob der matcher alle shard-udgaver af `path`."""
+    root, ext = os.path.splitext(path)
+    return f"{root}.shard_*_of_*{ext}"
+
+
+def shard_from_path(path: str) -> Optional[Shard]:
+    m = _SHARD_SUFFIX.search(os.path.basename(path))
+    return (int(m.group(1)), int(m.group(2))) if m else None
+
+
+def merge_journals(paths: Sequence[str]) -> Dict[CompanyKey, Tuple[str, List[Dict[str, str]]]]:
+    """
+    Saml de færdige virksomheder fra flere journaler: (ts, rækker) pr. virksomhed.
+    Findes en virksomhed i flere journaler (fx efter en ændret N), vinder den nyeste.
+    """
+    merged: Dict[CompanyKey, Tuple[str, List[Dict[str, str]]]] = {}
+    for path in paths:
+        for entry in RunJournal.read(path):
+            if entry.get("status") != "ok":
+                continue
+            key = (entry.get("name", ""), entry.get("sheet", ""))
+            ts = entry.get("ts", "")
+            if key not in merged or ts >= merged[key][0]:
+                merged[key] = (ts, entry.get("rows", []))
+    return merged
+
+
+def write_merged(
+    merged: Dict[CompanyKey, Tuple[str, List[Dict[str, str]]]],
+    fmt: str,
+    base_name: str,
+    order: Optional[Sequence[CompanyKey]] = None,
+) -> Tuple[str, int]:
+    """
+    Skriv de samlede rækker som ét resultatsæt i `order`s rækkefølge (typisk
+    arkets); virksomheder der ikke står i `order`, kommer til sidst.
+    Returnerer (sti, antal rækker).
+    """
+    order = [k for k in (order or []) if k in merged]
+    keys = order + sorted(set(merged) - set(order))
+    rows_written = 0
+    with make_sink(fmt, base_name) as sink:
+        for key in keys:
+            rows = merged[key][1]
+            sink.write(rows)
+            rows_written += len(rows)
+    return sink.path, rows_written
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Sharding af en fuld kørsel på flere maskiner.")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p_plan = sub.add_parser("plan", help="vis hvor mange virksomheder hver shard får")
+    p_plan.add_argument("count", type=int, help="antal shards (N)")
+
+    p_merge = sub.add_parser("merge", help="saml shard-journalerne til ét deduplikeret resultat")
+    default_glob = shard_glob(JOURNAL_FILE)
+    p_merge.add_argument(
+        "journals", nargs="*", help=f"journal-filer (standard: {default_glob})"
+    )
+    p_merge.add_argument("--format", choices=["csv", "parquet"], default=RESULT_FORMAT)
+    p_merge.add_argument("--output", default="results_compound_merged", help="filnavn uden endelse")
+    args = parser.parse_args()
+
+    from companies import load_companies
+
+    companies = load_companies()
+
+    if args.command == "plan":
+        sizes = Counter(shard_of(c, args.count) for c in companies)
+        for index in range(1, args.count + 1):
+            keys = "egne nøgler" if SHARD_API_KEYS.get(index) else "API_KEYS"
+            print(f"Shard {index}/{args.count}: {sizes[index]} virksomheder ({keys})")
+        return
+
+    paths = sorted(p for pattern in (args.journals or [default_glob]) for p in glob.glob(pattern))
+    if not paths:
+        raise SystemExit("Ingen shard-journaler fundet.")
+
+    merged = merge_journals(paths)
+    order = [company_key(c) for c in companies]
+    path, rows = write_merged(merged, args.format, args.output, order)
+    print(f"✅ {len(merged)} virksomheder ({rows} rækker) fra {len(paths)} journaler → {path}")
+
+    # Hvilke virksomheder mangler stadig – og i hvilken shard skal de køres igen?
+    shards = {shard_from_path(p) for p in paths}
+    counts = {s[1] for s in shards if s is not None}
+    missing = [c for c in companies if company_key(c) not in merged]
+    if len(counts) == 1:
+        count = counts.pop()
+        per_shard = Counter(shard_of(c, count) for c in missing)
+        for index in range(1, count + 1):
+            if (index, count) not in shards:
+                print(f"⚠️  Shard {index}/{count}: ingen journal")
+            elif per_shard[index]:
+                print(
+                    f"⚠️  Shard {index}/{count}: {per_shard[index]} mangler "
+                    f"(kør igen med --shard {index}/{count} --resume)"
+                )
+    elif missing:
+        print(f"⚠️  {len(missing)} virksomheder mangler i journalerne")
+
+
+if __name__ == "__main__":
+    main()
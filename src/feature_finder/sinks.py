@@ -0,0 +1,142 @@
+import csv
+import os
+import threading
+from typing import Dict, List
+
+from config import PARQUET_ROW_GROUP_SIZE
+from metrics import METRICS
+
+RESULT_FIELDS = ["Company", "Website", "Feature", "Relevance", "Reason"]
+
+# Kolonner med få, gentagne værdier – dictionary-encodes i Parquet
+DICTIONARY_COLUMNS = ["Company", "Website", "Feature", "Relevance"]
+
+
+class ResultSink:
+    """Fælles interface: rækker skrives løbende pr. virksomhed og lukkes til sidst."""
+
+    path: str
+
+    def write(self, rows: List[Dict[str, str]]) -> None:
+        raise NotImplementedError
+
+    def close(self) -> None:
+        raise NotImplementedError
+
+    def __enter__(self) -> "ResultSink":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+class CsvSink(ResultSink):
+    """Skriver rækker til én CSV-fil og flusher efter hver virksomhed."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.rows_written = 0
+        self._lock = threading.Lock()
+        self._file = open(path, "w", newline="", encoding="utf-8")
+        self._writer = csv.DictWriter(self._file, fieldnames=RESULT_FIELDS)
+        self._writer.writeheader()
+        self._file.flush()
+
+    @METRICS.timed("sink_write_seconds", sink="csv")
+    def write(self, rows: List[Dict[str, str]]) -> None:
+        if not rows:
+            return
+        with self._lock:
+            self._writer.writerows(rows)
+            self._file.flush()
+            self.rows_written += len(rows)
+
+    def close(self) -> None:
+        with self._lock:
+            if not self._file.closed:
+                self._file.close()
+
+
+class ParquetSink(ResultSink):
+    """
+    Skriver rækker som et Parquet-datasæt (en mappe med part-filer).
+
+    Rækker samles, til der er `row_group_size` af dem, og skrives så som én
+    row group i en ny part-fil. Filerne skrives atomisk (tmp + rename), så
+    `pd.read_parquet(mappe)` kan læse alt færdigt, mens kørslen stadig er i gang.
+    Company/Website/Feature/Relevance dictionary-encodes, da de gentages meget.
+
+    Ligesom CsvSink overskriver den et tidligere resultat: part-filer fra en
+    tidligere kørsel i samme mappe slettes ved åbning (ved --resume skriver
+    main.py journalens rækker igen, så intet går tabt).
+    """
+
+    def __init__(self, path: str, row_group_size: int = PARQUET_ROW_GROUP_SIZE):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError as e:
+            raise RuntimeError(
+                "Parquet-output kræver pyarrow – installer med 'pip install pyarrow'."
+            ) from e
+
+        self._pa = pa
+        self._pq = pq
+        self._schema = pa.schema([(name, pa.string()) for name in RESULT_FIELDS])
+
+        self.path = path
+        self.row_group_size = max(1, row_group_size)
+        self.rows_written = 0
+        self._buffer: List[Dict[str, str]] = []
+        self._part = 0
+        self._lock = threading.Lock()
+        os.makedirs(path, exist_ok=True)
+        for name in os.listdir(path):
+            if name.startswith("part-") and name.endswith((".parquet", ".parquet.tmp")):
+                os.remove(os.path.join(path, name))
+
+    @METRICS.timed("sink_write_seconds", sink="parquet")
+    def write(self, rows: List[Dict[str, str]]) -> None:
+        if not rows:
+            return
+        with self._lock:
+            self._buffer.extend(rows)
+            if len(self._buffer) >= self.row_group_size:
+                self._flush()
+
+    def _flush(self) -> None:
+        if not self._buffer:
+            return
+
+        table = self._pa.table(
+            {name: [str(r.get(name, "")) for r in self._buffer] for name in RESULT_FIELDS},
+            schema=self._schema,
+        )
+
+        self._part += 1
+        final_path = os.path.join(self.path, f"part-{self._part:05d}.parquet")
+        tmp_path = final_path + ".tmp"
+        self._pq.write_table(
+            table,
+            tmp_path,
+            row_group_size=self.row_group_size,
+            use_dictionary=DICTIONARY_COLUMNS,
+            compression="zstd",
+        )
+        os.replace(tmp_path, final_path)
+
+        self.rows_written += len(self._buffer)
+        self._buffer = []
+
+    def close(self) -> None:
+        with self._lock:
+            self._flush()
+
+
+def make_sink(fmt: str, base_name: str) -> ResultSink:
+    """Opret en sink ud fra formatnavnet ("csv" eller "parquet")."""
+    if fmt == "csv":
+        return CsvSink(f"{base_name}.csv")
+    if fmt == "parquet":
+        return ParquetSink(f"{base_name}.parquet")
+    raise ValueError(f"Ukendt output-format: {fmt!r} (brug 'csv' eller 'parquet')")
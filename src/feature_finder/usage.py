@@ -0,0 +1,143 @@
+import json
+import os
+import threading
+from collections import Counter, defaultdict
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+from config import USAGE_FILE
+from utils import label_companies, mask_key
+
+FIELDS = (
+    "requests",
+    "prompt_tokens",
+    "completion_tokens",
+    "total_tokens",
+    "tool_calls",
+    "latency_ms",
+)
+
+
+def _get(obj: Any, name: str) -> Any:
+    if obj is None:
+        return None
+    if isinstance(obj, dict):
+        return obj.get(name)
+    return getattr(obj, name, None)
+
+
+def usage_from_completion(completion: Any) -> Tuple[Optional[Any], int]:
+    """(usage-objekt, antal værktøjskald) fra et completion-svar."""
+    choices = _get(completion, "choices") or []
+    message = _get(choices[0], "message") if choices else None
+    tools = _get(message, "executed_tools") or _get(message, "tool_calls") or []
+    return _get(completion, "usage"), len(tools)
+
+
+def usage_from_chunk(chunk: Any) -> Tuple[Optional[Any], int]:
+    """
+    (usage, værktøjskald) fra én stream-chunk. Groq sender forbruget i sidste
+    chunk under `x_groq.usage`; OpenAI-kompatible servere i `usage`.
+    """
+    usage = _get(chunk, "usage") or _get(_get(chunk, "x_groq"), "usage")
+    tools = 0
+    for choice in _get(chunk, "choices") or []:
+        tools += len(_get(_get(choice, "delta"), "executed_tools") or [])
+    return usage, tools
+
+
+def token_counts(usage: Any) -> Tuple[int, int]:
+    """(prompt_tokens, completion_tokens) – 0 for felter udbyderen ikke sender."""
+    return int(_get(usage, "prompt_tokens") or 0), int(_get(usage, "completion_tokens") or 0)
+
+
+class UsageTracker:
+    """
+    Forbrug pr. modelkald fra `completion.usage`, samlet pr. API-nøgle, ark,
+    virksomhed og for hele kørslen.
+
+    Pakkede kald (flere virksomheder i ét svar) fordeles ligeligt mellem
+    virksomhederne. Arket slås op fra `register()`; ukendte navne tælles under "?".
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._sheets: Dict[str, str] = {}
+        self.total: Counter = Counter()
+        self.by_key: Dict[str, Counter] = defaultdict(Counter)
+        self.by_sheet: Dict[str, Counter] = defaultdict(Counter)
+        self.by_company: Dict[str, Counter] = defaultdict(Counter)
+
+    def register(self, companies: Iterable[Dict[str, str]]) -> None:
+        with self._lock:
+            for c in companies:
+                self._sheets[c["name"]] = c["sheet"]
+
+    def record(
+        self,
+        label: str,
+        api_key: Optional[str],
+        usage: Any,
+        tool_calls: int = 0,
+        latency: float = 0.0,
+    ) -> Dict[str, int]:
+        """Registrér ét kald. Returnerer kaldets tal (til loggen)."""
+        prompt, completion = token_counts(usage)
+        stats = Counter({
+            "requests": 1,
+            "prompt_tokens": prompt,
+            "completion_tokens": completion,
+            "total_tokens": prompt + completion,
+            "tool_calls": tool_calls,
+            "latency_ms": int(latency * 1000),
+        })
+        companies = label_companies(label)
+        share = {k: v / len(companies) for k, v in stats.items()}
+
+        with self._lock:
+            self.total.update(stats)
+            self.by_key[mask_key(api_key) if api_key else "?"].update(stats)
+            for name in companies:
+                self.by_company[name].update(share)
+                self.by_sheet[self._sheets.get(name, "?")].update(share)
+        return dict(stats)
+
+    def report(self) -> str:
+        """Kort opsummering til konsollen."""
+        with self._lock:
+            t = self.total
+            if not t["requests"]:
+                return "Forbrug: ingen modelkald"
+            lines = [
+                f"Forbrug: {t['requests']} kald · {t['prompt_tokens']} prompt + "
+                f"{t['completion_tokens']} svar-tokens · {t['tool_calls']} værktøjskald · "
+                f"gns. {t['latency_ms'] / t['requests'] / 1000:.1f}s pr. kald"
+            ]
+            for key, c in sorted(self.by_key.items()):
+                lines.append(f"  nøgle {key}: {c['requests']} kald, {c['total_tokens']} tokens")
+            per_company = t["total_tokens"] / max(1, len(self.by_company))
+            lines.append(f"  ≈ {per_company:.0f} tokens pr. virksomhed")
+        return "\n".join(lines)
+
+    def save(self, path: str = USAGE_FILE) -> str:
+        """Skriv alle aggregater som JSON (til at dimensionere BATCH_SIZE og antal nøgler)."""
+        out_dir = os.path.dirname(path)
+        if out_dir:
+            os.makedirs(out_dir, exist_ok=True)
+
+        def rounded(c: Counter) -> Dict[str, float]:
+            return {f: round(c[f], 2) for f in FIELDS}
+
+        with self._lock:
+            data = {
+                "run": rounded(self.total),
+                "by_key": {k: rounded(c) for k, c in self.by_key.items()},
+                "by_sheet": {k: rounded(c) for k, c in self.by_sheet.items()},
+                "by_company": {k: rounded(c) for k, c in self.by_company.items()},
+            }
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False, indent=2)
+        return path
+
+
+# Fælles tæller for hele kørslen (ligesom MATCH_STATS i feature_index)
+USAGE = UsageTracker()
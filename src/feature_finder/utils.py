@@ -0,0 +1,34 @@
+import re
+from typing import Any, Iterator, List, Sequence
+
+_LABEL_SUFFIX = re.compile(r"\s*\[[^\]]*\]$")
+
+
+def clean_str(value: Any) -> str:
+    """Konvertér en celleværdi til en trimmet streng ("" for tomme/NaN-værdier)."""
+    if value is None:
+        return ""
+    # NaN er den eneste værdi der ikke er lig med sig selv
+    if isinstance(value, float) and value != value:
+        return ""
+    return str(value).strip()
+
+
+def chunked(seq: Sequence[Any], size: int) -> Iterator[List[Any]]:
+    """Del en sekvens op i lister af højst `size` elementer."""
+    for i in range(0, len(seq), size):
+        yield list(seq[i:i + size])
+
+
+def mask_key(api_key: str) -> str:
+    """Maskér en API-nøgle til logning, fx 'gsk_…a1b2'."""
+    if not api_key:
+        return "<tom>"
+    if len(api_key) <= 8:
+        return "…" + api_key[-2:]
+    return f"{api_key[:4]}…{api_key[-4:]}"
+
+
+def label_companies(label: str) -> List[str]:
+    """Virksomhederne bag et kald-label: "A | B" (pakket kald) og "A [2/3]" (shard)."""
+    return [_LABEL_SUFFIX.sub("", part).strip() for part in label.split(" | ")]
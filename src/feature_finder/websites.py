@@ -0,0 +1,90 @@
+import argparse
+import csv
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, Optional
+
+from config import WEBSITES_FILE
+
+
+class WebsiteTable:
+    """
+    Vedvarende tabel virksomhed → officiel hjemmeside (SQLite).
+
+    Udfyldes af website-trinnet i to-trins-kørsler (og af svar, hvor modellen
+    selv fandt siden), så siden kun skal søges frem én gang pr. virksomhed.
+    En tom URL betyder "søgt, men ikke fundet".
+    """
+
+    def __init__(self, path: str = WEBSITES_FILE):
+        table_dir = os.path.dirname(path)
+        if table_dir:
+            os.makedirs(table_dir, exist_ok=True)
+
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS websites (
+                company    TEXT PRIMARY KEY,
+                url        TEXT NOT NULL,
+                source     TEXT NOT NULL,
+                updated_at REAL NOT NULL
+            )
+            """
+        )
+        self._conn.commit()
+
+    def get(self, company_name: str) -> Optional[str]:
+        """Returnér den kendte URL ("" hvis ikke fundet), eller None hvis aldrig slået op."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT url FROM websites WHERE company = ?", (company_name,)
+            ).fetchone()
+        return row[0] if row else None
+
+    def put(self, company_name: str, url: str, source: str = "resolve") -> None:
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO websites (company, url, source, updated_at) "
+                "VALUES (?, ?, ?, ?)",
+                (company_name, url or "", source, time.time()),
+            )
+            self._conn.commit()
+
+    def all(self) -> Dict[str, str]:
+        with self._lock:
+            return dict(self._conn.execute("SELECT company, url FROM websites"))
+
+    def export_csv(self, path: str) -> int:
+        """Skriv tabellen som CSV (Company, Website). Returnerer antal rækker."""
+        rows = sorted(self.all().items())
+        with open(path, "w", newline="", encoding="utf-8") as f:
+            writer = csv.writer(f)
+            writer.writerow(["Company", "Website"])
+            writer.writerows(rows)
+        return len(rows)
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Eksportér tabellen over virksomheders hjemmesider.")
+    parser.add_argument("output", help="CSV-fil der skal skrives")
+    parser.add_argument("--table", default=WEBSITES_FILE, help=f"SQLite-fil (standard: {WEBSITES_FILE})")
+    args = parser.parse_args()
+
+    table = WebsiteTable(args.table)
+    count = table.export_csv(args.output)
+    table.close()
+    print(f"✅ {count} hjemmesider gemt i {args.output}")
+
+
+if __name__ == "__main__":
+    main()
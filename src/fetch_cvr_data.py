@@ -1,66 +1,348 @@
+import argparse
+import codecs
 import csv
-import requests
-import urllib.parse
+import itertools
+import os
+import random
+import threading
 import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Deque, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from cvr_cache import CVR_CACHE_FILE, CvrCache, is_cacheable, normalize_cvr
 
 input_file = "virksomheder.csv"   # Din CSV-fil med kundelisten
 output_file = "output.csv"        # Filen hvor vi gemmer resultaterne
 
-def fetch_cvr_info(cvr_number):
-    url = f"https://cvrapi.dk/api?search={cvr_number}&country=dk"
+# Kan peges mod en lokal test-server, fx CVR_API_URL=http://127.0.0.1:8000/api
+BASE_URL = os.environ.get("CVR_API_URL", "https://cvrapi.dk/api")
+USER_AGENT = "data-collection-construction/1.0"
+REQUESTS_PER_SECOND = 1.0   # samlet tempo mod API'et (svarer til den gamle pause på 1 s)
+MAX_WORKERS = 4             # samtidige forespørgsler
+MAX_RETRIES = 4             # ekstra forsøg ved 429/5xx og netværksfejl
+TIMEOUT = 10
+
+FIELDNAMES = ["Navn", "CVR", "Branche", "Ansatte", "Adresse", "Postnummer", "By"]
+RETRY_STATUS = {429, 500, 502, 503, 504}
+
+# Header-navne (små bogstaver) der genkendes i kundelisten
+CUSTOMER_COLUMNS = ("kunde", "navn", "name", "virksomhed", "firma")
+CVR_COLUMNS = ("cvr", "cvr-nummer", "cvr nummer", "cvrnr", "vat")
+
+
+class RateLimiter:
+    """Fordeler forespørgsler jævnt, så alle tråde tilsammen holder sig under `rps`."""
+
+    def __init__(self, rps: float):
+        self.interval = 1.0 / rps if rps > 0 else 0.0
+        self._next = time.monotonic()
+        self._lock = threading.Lock()
+
+    def wait(self) -> None:
+        with self._lock:
+            now = time.monotonic()
+            slot = max(self._next, now)
+            self._next = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+    def pause(self, seconds: float) -> None:
+        """Skub alle kommende forespørgsler (fx efter 429 med Retry-After)."""
+        with self._lock:
+            self._next = max(self._next, time.monotonic() + seconds)
+
+
+def make_session(pool_size: int = MAX_WORKERS) -> requests.Session:
+    """Én keep-alive-session med en connection-pool, der deles af alle tråde."""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    session.headers["User-Agent"] = USER_AGENT
+    return session
+
+
+def _retry_after(response: requests.Response) -> Optional[float]:
     try:
-        response = requests.get(url, timeout=10)
-        response.raise_for_status()
-        data = response.json()
-        print(data)  # <-- se alt API'et returnerer
-        if "error" in data:
-            return None
+        return float(response.headers.get("Retry-After", ""))
+    except ValueError:
+        return None
+
+
+def fetch_cvr_json(
+    cvr_number: str,
+    session: requests.Session,
+    limiter: Optional[RateLimiter] = None,
+    base_url: str = BASE_URL,
+) -> Dict:
+    """
+    Hent det rå JSON-svar for et CVR-nummer. 429 og 5xx (og netværksfejl)
+    prøves igen med eksponentiel backoff; Retry-After respekteres.
+    """
+    params = {"search": cvr_number, "country": "dk"}
+    attempt = 0
+
+    while True:
+        if limiter is not None:
+            limiter.wait()
+
+        delay = min(30.0, 2 ** attempt) + random.uniform(0, 0.5)
+        try:
+            response = session.get(base_url, params=params, timeout=TIMEOUT)
+        except (requests.ConnectionError, requests.Timeout):
+            if attempt >= MAX_RETRIES:
+                raise
+        else:
+            if response.status_code not in RETRY_STATUS or attempt >= MAX_RETRIES:
+                response.raise_for_status()
+                return response.json()
+
+            retry_after = _retry_after(response)
+            if retry_after is not None:
+                delay = retry_after
+            if response.status_code == 429 and limiter is not None:
+                # Hele puljen holder pause, ikke kun denne tråd
+                limiter.pause(delay)
+
+        time.sleep(delay)
+        attempt += 1
+
+
+def to_row(data: Optional[Dict], kunde: str = "", cvr_number: str = "") -> Dict[str, str]:
+    """Omsæt API-svaret til en output-række (tom række med navn/CVR hvis intet blev fundet)."""
+    if not data or "error" in data:
         return {
-            "Navn": data.get("name", ""),
-            "CVR": data.get("vat", ""),
-            "Branche": data.get("industrydesc", ""),
-            "Ansatte": data.get("employees", ""),
-            "Adresse": data.get("address", ""),
-            "Postnummer": data.get("zipcode", ""),
-            "By": data.get("city", "")
+            "Navn": kunde,
+            "CVR": cvr_number,
+            "Branche": "",
+            "Ansatte": "",
+            "Adresse": "",
+            "Postnummer": "",
+            "By": ""
         }
+    return {
+        "Navn": data.get("name", ""),
+        "CVR": data.get("vat", ""),
+        "Branche": data.get("industrydesc", ""),
+        "Ansatte": data.get("employees", ""),
+        "Adresse": data.get("address", ""),
+        "Postnummer": data.get("zipcode", ""),
+        "By": data.get("city", "")
+    }
+
+
+def fetch_cvr_info(cvr_number, session=None, limiter=None, base_url=BASE_URL, cache=None):
+    data = cache.get(cvr_number) if cache is not None else None
+    if data is not None:
+        return None if "error" in data else to_row(data)
+
+    if session is None:
+        with make_session(1) as own_session:
+            return fetch_cvr_info(cvr_number, own_session, limiter, base_url, cache)
+    try:
+        data = fetch_cvr_json(cvr_number, session, limiter, base_url)
+        if cache is not None:
+            cache.put(cvr_number, data)
+        if "error" in data:
+            if not is_cacheable(data):
+                print(f"Fejl for CVR {cvr_number}: {data['error']}")
+            return None
+        return to_row(data)
     except Exception as e:
         print(f"Fejl for CVR {cvr_number}: {e}")
         return None
 
-def main():
-    results = []
 
-    with open(input_file, newline="", encoding="cp1252") as csvfile:
-        reader = csv.reader(csvfile, delimiter=";")
-        next(reader)  # spring header over
+def enrich_stream(
+    customers: Iterable[List[str]],
+    workers: int = MAX_WORKERS,
+    rps: float = REQUESTS_PER_SECOND,
+    base_url: str = BASE_URL,
+    cache: Optional[CvrCache] = None,
+) -> Iterator[Dict[str, str]]:
+    """
+    Berig (kunde, cvr)-par med en fælles session, `workers` tråde og en samlet
+    grænse på `rps` forespørgsler i sekundet. Rækkerne kommer i samme rækkefølge
+    som input, efterhånden som de bliver færdige; kun et lille vindue af
+    forespørgsler er i gang ad gangen, så hukommelsen er konstant uanset listens
+    længde. Med en `cache` hentes kun CVR-numre, der ikke allerede er slået op.
+    """
+    session = make_session(workers)
+    limiter = RateLimiter(rps)
+    window = max(1, workers) * 4
+
+    def enrich(customer: List[str]) -> Dict[str, str]:
+        kunde, cvr_number = customer
+        print(f"Henter data for {kunde} ({cvr_number})...")
+        info = fetch_cvr_info(cvr_number, session, limiter, base_url, cache)
+        return info or to_row(None, kunde, cvr_number)
+
+    try:
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+            pending: Deque[Future] = deque()
+            for customer in customers:
+                pending.append(pool.submit(enrich, customer))
+                if len(pending) >= window:
+                    yield pending.popleft().result()
+            while pending:
+                yield pending.popleft().result()
+    finally:
+        session.close()
+
+
+def fetch_all(
+    customers: Iterable[List[str]],
+    workers: int = MAX_WORKERS,
+    rps: float = REQUESTS_PER_SECOND,
+    base_url: str = BASE_URL,
+    cache: Optional[CvrCache] = None,
+) -> List[Dict[str, str]]:
+    """Som enrich_stream, men samlet i en liste."""
+    return list(enrich_stream(customers, workers, rps, base_url, cache))
+
+
+def sniff_csv(path: str) -> Tuple[str, str]:
+    """Gæt (encoding, delimiter) ud fra starten af filen."""
+    with open(path, "rb") as f:
+        sample = f.read(64 * 1024)
+
+    if sample.startswith(codecs.BOM_UTF8):
+        encoding = "utf-8-sig"
+    else:
+        try:
+            sample.decode("utf-8")
+            encoding = "utf-8"
+        except UnicodeDecodeError as e:
+            # Et multibyte-tegn kan være skåret over i slutningen af prøven
+            encoding = "utf-8" if e.start >= len(sample) - 3 else "cp1252"
+
+    text = sample.decode(encoding, errors="ignore")
+    try:
+        delimiter = csv.Sniffer().sniff(text, delimiters=";,\t|").delimiter
+    except csv.Error:
+        delimiter = ";"
+    return encoding, delimiter
+
+
+def _find_column(header: List[str], names: Tuple[str, ...], default: int) -> int:
+    lowered = [h.strip().lower() for h in header]
+    for name in names:
+        if name in lowered:
+            return lowered.index(name)
+    return default
+
+
+def read_customers(path: str) -> Iterator[List[str]]:
+    """
+    Læs (kunde, cvr) fra kundelisten som en generator. Encoding og skilletegn
+    gættes, og kolonnerne findes ud fra headeren (ellers kolonne 1 og 2).
+    """
+    encoding, delimiter = sniff_csv(path)
+    with open(path, newline="", encoding=encoding) as csvfile:
+        reader = csv.reader(csvfile, delimiter=delimiter)
+        header = next(reader, [])
+        name_col = _find_column(header, CUSTOMER_COLUMNS, 0)
+        cvr_col = _find_column(header, CVR_COLUMNS, 1)
+        for row in reader:
+            if len(row) <= max(name_col, cvr_col):
+                continue
+            yield [row[name_col].strip(), row[cvr_col].strip()]
+
+
+def _resume_point(path: str) -> Tuple[int, str]:
+    """
+    (antal færdige rækker, CVR i sidste række) i en tidligere output-fil.
+    En halvt skrevet sidste linje (afbrudt kørsel) skæres væk.
+    """
+    if not os.path.exists(path) or os.path.getsize(path) == 0:
+        return 0, ""
+
+    with open(path, "rb+") as f:
+        f.seek(0, os.SEEK_END)
+        size = f.tell()
+        f.seek(max(0, size - 4096))
+        tail = f.read()
+        if not tail.endswith(b"\n"):
+            cut = tail.rfind(b"\n")
+            f.truncate(size - len(tail) + cut + 1 if cut >= 0 else 0)
+
+    count, last_cvr = 0, ""
+    with open(path, newline="", encoding="utf-8") as f:
+        reader = csv.DictReader(f)
         for row in reader:
-            kunde = row[0].strip()
-            cvr_number = row[1].strip()
-            print(f"Henter data for {kunde} ({cvr_number})...")
-            info = fetch_cvr_info(cvr_number)
-            if info:
-                results.append(info)
-            else:
-                results.append({
-                    "Navn": kunde,
-                    "CVR": cvr_number,
-                    "Branche": "",
-                    "Ansatte": "",
-                    "Adresse": "",
-                    "Postnummer": "",
-                    "By": ""
-                })
-            time.sleep(1)  # pause for at undgå rate-limit
-
-    # Gem resultater i ny CSV
-    with open(output_file, "w", newline="", encoding="utf-8") as f:
-        fieldnames = ["Navn", "CVR", "Branche", "Ansatte", "Adresse", "Postnummer", "By"]
-        writer = csv.DictWriter(f, fieldnames=fieldnames)
-        writer.writeheader()
-        writer.writerows(results)
-
-    print(f"✅ Færdig! Resultater gemt i {output_file}")
+            count += 1
+            last_cvr = row.get("CVR", "")
+    return count, last_cvr
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Berig en kundeliste med data fra cvrapi.dk.")
+    parser.add_argument("--input", default=input_file, help=f"kundeliste (standard: {input_file})")
+    parser.add_argument("--output", default=output_file, help=f"output-fil (standard: {output_file})")
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=MAX_WORKERS,
+        help=f"samtidige forespørgsler (standard: {MAX_WORKERS})",
+    )
+    parser.add_argument(
+        "--rps",
+        type=float,
+        default=REQUESTS_PER_SECOND,
+        help=f"maks. forespørgsler pr. sekund i alt (standard: {REQUESTS_PER_SECOND})",
+    )
+    parser.add_argument(
+        "--base-url",
+        default=BASE_URL,
+        help=f"API-adresse, fx en lokal test-server (standard: {BASE_URL})",
+    )
+    parser.add_argument("--cache", default=CVR_CACHE_FILE, help=f"CVR-cache (standard: {CVR_CACHE_FILE})")
+    parser.add_argument("--no-cache", action="store_true", help="slå altid op i API'et")
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="fortsæt efter sidste række i en eksisterende output-fil i stedet for at starte forfra",
+    )
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    customers = read_customers(args.input)
+
+    done, last_cvr = _resume_point(args.output) if args.resume else (0, "")
+    if done:
+        skipped = list(itertools.islice(customers, done))
+        # Output er i samme rækkefølge som input, så række `done` skal passe med sidste CVR
+        if len(skipped) < done or normalize_cvr(skipped[-1][1]) != normalize_cvr(last_cvr):
+            raise SystemExit(
+                f"{args.output} passer ikke til {args.input} (række {done}, CVR {last_cvr}) "
+                "– kør uden --resume for at starte forfra."
+            )
+        print(f"Genoptager efter {done} færdige virksomheder (sidste CVR {last_cvr}).")
+
+    cache = None if args.no_cache else CvrCache(args.cache)
+    written = done
+    try:
+        # Rækker skrives (og flushes) efterhånden som de bliver færdige
+        with open(args.output, "a" if done else "w", newline="", encoding="utf-8") as f:
+            writer = csv.DictWriter(f, fieldnames=FIELDNAMES)
+            if not done:
+                writer.writeheader()
+            for row in enrich_stream(customers, args.workers, args.rps, args.base_url, cache):
+                writer.writerow(row)
+                f.flush()
+                written += 1
+    finally:
+        if cache is not None:
+            print(f"CVR-cache: {cache.hits} hits, {cache.misses} misses ({cache.path})")
+            cache.close()
+
+    print(f"✅ Færdig! {written} virksomheder gemt i {args.output}")
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,209 @@
+"""
+Python-udgave af Vægtningsmakkro.bas (BeregnPointAlleRækker).
+
+Giver præcis de samme point som makroen, men beregnet vektoriseret for alle
+ark på én gang i stedet for celle for celle i Excel:
+
+- Del 1: gradueret score for kolonne C (50 → 10 ... 125–135 → 40 ... 200 → 10)
+- Del 2: antal af "entreprise", "service" og "små opgaver" i kolonne N (40/25/10/0)
+- Del 3: kombinationen af dem (E+S → 20, kun M → 5, ellers 10, ingen → 0)
+
+Resultatet skrives som arket "Vægtning" i en ny fil med en write-only writer.
+Pariteten med makroen tjekkes i tests/test_vaegtning.py.
+
+    python vaegtning.py [workbook] [--output fil.xlsx]
+"""
+import argparse
+import os
+from typing import Any, Dict, List
+
+import numpy as np
+import pandas as pd
+from openpyxl import Workbook, load_workbook
+
+WORKBOOK_FILE = "data/raw/Branche_og_lead_kartotek.xlsx"
+OUTPUT_FILE = "data/processed/vaegtning.xlsx"
+SUMMARY_SHEET = "Vægtning"
+
+UPPER_BOUND = 200
+FIRST_ROW = 3  # makroen starter i række 3
+
+# Kolonner (0-baseret fra kolonne C, som de læses)
+COL_C, COL_D, COL_N = 0, 1, 11
+
+HEADERS = [
+    "Ark",
+    "Række",
+    "Tekst fra kolonne D",
+    "Del 1 (C, gradueret)",
+    "Del 2 (funktioner i N)",
+    "Del 3 (kombination i N)",
+]
+
+
+# ========== INDLÆSNING ==========
+
+def read_sheets(path: str = WORKBOOK_FILE) -> pd.DataFrame:
+    """
+    Læs kolonne C, D og N fra alle ark (undtagen "Vægtning") i ét DataFrame med
+    kolonnerne sheet, row, C, D, N – kun række 3 til sidste udfyldte række i C/N,
+    ligesom makroen.
+    """
+    wb = load_workbook(path, read_only=True, data_only=True)
+    frames: List[pd.DataFrame] = []
+    try:
+        for ws in wb.worksheets:
+            if ws.title == SUMMARY_SHEET:
+                continue
+
+            c_vals: List[Any] = []
+            d_vals: List[Any] = []
+            n_vals: List[Any] = []
+            for cells in ws.iter_rows(min_col=3, max_col=14, values_only=True):
+                cells = tuple(cells) + (None,) * (12 - len(cells))
+                c_vals.append(cells[COL_C])
+                d_vals.append(cells[COL_D])
+                n_vals.append(cells[COL_N])
+
+            # Sidste udfyldte række i C eller N (End(xlUp) giver række 1 for en tom kolonne)
+            filled = [
+                i for i, (c, n) in enumerate(zip(c_vals, n_vals), start=1)
+                if c is not None or n is not None
+            ]
+            last_row = filled[-1] if filled else 1
+            if last_row < FIRST_ROW:
+                continue
+
+            frames.append(pd.DataFrame({
+                "sheet": ws.title,
+                "row": np.arange(FIRST_ROW, last_row + 1),
+                "C": pd.Series(c_vals[FIRST_ROW - 1:last_row], dtype=object),
+                "D": pd.Series(d_vals[FIRST_ROW - 1:last_row], dtype=object),
+                "N": pd.Series(n_vals[FIRST_ROW - 1:last_row], dtype=object),
+            }))
+    finally:
+        wb.close()
+
+    if not frames:
+        return pd.DataFrame(columns=["sheet", "row", "C", "D", "N"])
+    return pd.concat(frames, ignore_index=True)
+
+
+# ========== POINT (vektoriseret) ==========
+
+def to_number(values: pd.Series) -> pd.Series:
+    """
+    VBA's IsNumeric/CDbl for en hel kolonne: tal bruges som de er, tekst tolkes
+    som i et dansk Excel ("." tusindtal, "," decimal). Tomme celler er 0 og
+    alt andet (tekst, datoer, sandhedsværdier) giver 0 point og sættes til NaN.
+    """
+    values = values.astype(object)
+    is_bool = values.map(lambda v: isinstance(v, bool))
+    is_number = values.map(lambda v: isinstance(v, (int, float, np.number))) & ~is_bool
+    is_text = values.map(lambda v: isinstance(v, str))
+
+    result = pd.Series(np.nan, index=values.index, dtype=float)
+    result[values.isna()] = 0.0
+    result[is_number] = values[is_number].astype(float)
+
+    text = values[is_text].str.strip().str.replace(".", "", regex=False)
+    text = text.str.replace(",", ".", regex=False)
+    result[is_text] = pd.to_numeric(text, errors="coerce")
+    return result
+
+
+def del1_scores(c: pd.Series) -> np.ndarray:
+    x = to_number(c).to_numpy()
+    with np.errstate(invalid="ignore"):
+        points = np.select(
+            [
+                np.isnan(x) | (x < 50) | (x > UPPER_BOUND),
+                x < 125,
+                x <= 135,
+            ],
+            [
+                0.0,
+                10 + (x - 50) * (30 / 75),
+                40.0,
+            ],
+            default=np.clip(10 + (UPPER_BOUND - x) * (30 / (UPPER_BOUND - 135)), 0, None),
+        )
+    # VBA's Round runder til nærmeste lige tal ved ,5 – det gør np.round også
+    return np.round(points).astype(int)
+
+
+def function_flags(n: pd.Series) -> Dict[str, np.ndarray]:
+    text = n.map(lambda v: "" if v is None or (isinstance(v, float) and v != v) else str(v))
+    text = text.str.lower()
+    return {
+        "E": text.str.contains("entreprise", regex=False).to_numpy(),
+        "S": text.str.contains("service", regex=False).to_numpy(),
+        "M": text.str.contains("små opgaver", regex=False).to_numpy(),
+    }
+
+
+def score_frame(df: pd.DataFrame) -> pd.DataFrame:
+    """Beregn Del 1–3 for alle rækker og returnér oversigten (makroens kolonner)."""
+    flags = function_flags(df["N"])
+    has_e, has_s, has_m = flags["E"], flags["S"], flags["M"]
+    count = has_e.astype(int) + has_s.astype(int) + has_m.astype(int)
+
+    del2 = np.select([count == 3, count == 2, count == 1], [40, 25, 10], default=0)
+    del3 = np.select(
+        [count == 0, has_e & has_s, ~has_e & ~has_s & has_m],
+        [0, 20, 5],
+        default=10,
+    )
+
+    return pd.DataFrame({
+        HEADERS[0]: df["sheet"].to_numpy(),
+        HEADERS[1]: df["row"].to_numpy(),
+        HEADERS[2]: df["D"].to_numpy(),
+        HEADERS[3]: del1_scores(df["C"]),
+        HEADERS[4]: del2,
+        HEADERS[5]: del3,
+    })
+
+
+def score_workbook(path: str = WORKBOOK_FILE) -> pd.DataFrame:
+    return score_frame(read_sheets(path))
+
+
+def write_summary(summary: pd.DataFrame, path: str = OUTPUT_FILE) -> None:
+    """Skriv oversigten som arket "Vægtning" med openpyxl's write-only writer."""
+    out_dir = os.path.dirname(path)
+    if out_dir:
+        os.makedirs(out_dir, exist_ok=True)
+
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet(SUMMARY_SHEET)
+    ws.append(HEADERS)
+    for row in summary.itertuples(index=False, name=None):
+        ws.append([v.item() if isinstance(v, np.generic) else v for v in row])
+    wb.save(path)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Beregn vægtning af leads (Python-udgave af Vægtningsmakkro)."
+    )
+    parser.add_argument(
+        "workbook",
+        nargs="?",
+        default=WORKBOOK_FILE,
+        help=f"lead-kartotek (standard: {WORKBOOK_FILE})",
+    )
+    parser.add_argument(
+        "--output",
+        default=OUTPUT_FILE,
+        help=f"fil med arket {SUMMARY_SHEET} (standard: {OUTPUT_FILE})",
+    )
+    args = parser.parse_args()
+
+    summary = score_workbook(args.workbook)
+    write_summary(summary, args.output)
+    print(f"✅ Færdig! {len(summary)} rækker fra {summary[HEADERS[0]].nunique()} ark gemt i {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+import os
+import sys
+
+import pytest
+
+# Modulerne importerer hinanden fladt (kører fra src/feature_finder), ligesom main.py
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+for path in (
+    os.path.join(ROOT, "src"),
+    os.path.join(ROOT, "src", "feature_finder"),
+    os.path.join(ROOT, "src", "industry_relevance_mapping"),
+):
+    if path not in sys.path:
+        sys.path.insert(0, path)
+
+import analyzer  # noqa: E402
+import client as client_module  # noqa: E402
+import model_log  # noqa: E402
+from fake_cvr import FakeCvrServer  # noqa: E402
+from fake_groq import FakeGroqServer, Scenario  # noqa: E402
+
+
+@pytest.fixture(autouse=True)
+def model_log_dir(tmp_path, monkeypatch):
+    """Modellens svar logges i testens tmp-mappe, ikke i repoets logs/."""
+    monkeypatch.setattr(model_log, "MODEL_LOG_DIR", str(tmp_path / "logs"))
+    yield
+    model_log.close_log_writer()
+
+
+@pytest.fixture
+def server(request, monkeypatch):
+    """
+    Lokal fake Groq-server (fake_groq.py), som sync- og async-klienterne peger på.
+    Scenariet er hurtigt og fejlfrit; andre Scenario-argumenter gives med
+    `@pytest.mark.parametrize("server", [{...}], indirect=True)`.
+    """
+    scenario = Scenario(**{"latency_ms": 2, "latency_sigma": 0.0, **getattr(request, "param", {})})
+    with FakeGroqServer(scenario) as fake:
+        monkeypatch.setattr(client_module, "GROQ_BASE_URL", fake.url)
+        # get_client_with_key er lru-cachet, og de cachede klienter kender den gamle URL
+        client_module.get_client_with_key.cache_clear()
+        yield fake
+    client_module.get_client_with_key.cache_clear()
+
+
+@pytest.fixture
+def no_backoff(monkeypatch):
+    """Nye forsøg uden backoff-pause."""
+    monkeypatch.setattr(analyzer, "backoff_delay", lambda attempt, retry_after=None: 0.0)
+
+
+@pytest.fixture
+def cvr_server():
+    """Lokal stand-in for cvrapi.dk (tests/fake_cvr.py)."""
+    with FakeCvrServer() as fake:
+        yield fake
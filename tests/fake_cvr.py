@@ -0,0 +1,115 @@
+"""
+Lokal stand-in for cvrapi.dk, så fetch_cvr_data.py og cvr_cache.py kan testes
+uden netværk og kvote (samme idé som fake_groq.py for Groq-testene).
+"""
+import json
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlparse
+
+
+def company(cvr: str, name: Optional[str] = None) -> Dict:
+    """Et svar som cvrapi.dk's for en fundet virksomhed."""
+    return {
+        "vat": int(cvr),
+        "name": name or f"Virksomhed {cvr} ApS",
+        "industrydesc": "Byggeri",
+        "employees": "10-19",
+        "address": "Testvej 1",
+        "zipcode": "8000",
+        "city": "Aarhus",
+    }
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server: "_Server"
+
+    def log_message(self, format, *args) -> None:
+        pass
+
+    def _send_json(self, status: int, body: Dict, headers: Optional[Dict[str, str]] = None) -> None:
+        data = json.dumps(body, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self) -> None:
+        fake = self.server.fake
+        cvr = (parse_qs(urlparse(self.path).query).get("search") or [""])[0]
+        status = fake.record(cvr)
+        time.sleep(fake.delays.get(cvr, 0.0))
+
+        if status is not None:
+            headers = {} if fake.retry_after is None else {"Retry-After": f"{fake.retry_after:g}"}
+            self._send_json(status, {"error": "fake_cvr"}, headers)
+        elif cvr in fake.errors:
+            self._send_json(200, {"error": fake.errors[cvr]})
+        elif cvr in fake.companies:
+            self._send_json(200, fake.companies[cvr])
+        else:
+            self._send_json(200, {"error": "NOT_FOUND"})
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+    fake: "FakeCvrServer"
+
+
+class FakeCvrServer:
+    """
+    Svarer på GET /api?search=<cvr> med `companies[cvr]` eller {"error": "NOT_FOUND"}.
+
+    `failures[cvr]` er HTTP-statuskoder (fx 429, 503), der sendes i rækkefølge før
+    det rigtige svar, med Retry-After fra `retry_after` (None = ingen header);
+    `errors[cvr]` giver et cvrapi-fejlsvar (fx "QUOTA_EXCEEDED"), og `delays[cvr]`
+    forsinker svaret. Hvert kald registreres i `requests` som (tidspunkt, cvr).
+    """
+
+    def __init__(self, companies: Optional[Dict[str, Dict]] = None, host: str = "127.0.0.1"):
+        self.companies = dict(companies or {})
+        self.failures: Dict[str, List[int]] = {}
+        self.errors: Dict[str, str] = {}
+        self.delays: Dict[str, float] = {}
+        self.retry_after: Optional[float] = 0.0
+        self.requests: List[Tuple[float, str]] = []
+        self._lock = threading.Lock()
+        self._httpd = _Server((host, 0), _Handler)
+        self._httpd.fake = self
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}/api"
+
+    def record(self, cvr: str) -> Optional[int]:
+        """Registrér et kald og returnér en fejlstatus, hvis der er en i kø for CVR-nummeret."""
+        with self._lock:
+            self.requests.append((time.monotonic(), cvr))
+            queued = self.failures.get(cvr)
+            return queued.pop(0) if queued else None
+
+    def calls(self) -> Counter:
+        with self._lock:
+            return Counter(cvr for _, cvr in self.requests)
+
+    def __enter__(self) -> "FakeCvrServer":
+        self._thread = threading.Thread(
+            target=self._httpd.serve_forever, args=(0.05,), name="fake-cvr", daemon=True
+        )
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self._httpd.shutdown()
+        self._httpd.server_close()
+        if self._thread is not None:
+            self._thread.join()
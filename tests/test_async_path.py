@@ -0,0 +1,95 @@
+"""
+Kører async-stien (--async) mod den lokale fake Groq-server, så et manglende
+`await` på with_raw_response-svaret (eller lignende) fanges uden netværk.
+"""
+import asyncio
+import csv
+import glob
+import os
+import sys
+
+import pytest
+
+import shards
+from benchmark import write_workbooks
+from engine import analyze_companies_async
+from rate_limiter import KeyScheduler
+
+FEATURES = [f"Syntetisk feature {i:03d}" for i in range(5)]
+
+
+
+@pytest.mark.parametrize("stream", [False, True])
+def test_analyze_companies_async(server, stream):
+    companies = [{"name": f"Virksomhed {i} ApS", "sheet": "410000"} for i in range(4)]
+    scheduler = KeyScheduler(["k1", "k2"], requests_per_minute=1e9, tokens_per_minute=1e12)
+
+    results = asyncio.run(analyze_companies_async(
+        companies, FEATURES, scheduler=scheduler, pack_size=1, stream=stream,
+    ))
+
+    for company, rows in zip(companies, results):
+        assert [r["Company"] for r in rows] == [company["name"]] * len(FEATURES)
+        assert {r["Feature"] for r in rows} == set(FEATURES)
+    assert server.stats["requests"] == len(companies)
+    assert server.stats.get("streamed", 0) == (len(companies) if stream else 0)
+
+
+def test_main_async(server, tmp_path, monkeypatch):
+    write_workbooks(str(tmp_path), 6, len(FEATURES))
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(shards, "API_KEYS", ["k1"])
+    monkeypatch.setattr(sys, "argv", ["main.py", "--async", "--no-cache", "--start-batch", "1"])
+
+    import main
+    main.main()
+
+    (path,) = glob.glob(os.path.join(tmp_path, "results_compound_*.csv"))
+    with open(path, newline="", encoding="utf-8") as f:
+        rows = list(csv.DictReader(f))
+    assert len(rows) == 6 * len(FEATURES)
+    assert len({r["Company"] for r in rows}) == 6
+
+
+def test_sharded_features_are_streamed(server):
+    import analyzer
+
+    features = [f"Syntetisk feature med et langt navn {i:03d}" for i in range(30)]
+    shards = analyzer.shard_features(features)
+    assert len(shards) > 1
+    scheduler = KeyScheduler(["k1"], requests_per_minute=1e9, tokens_per_minute=1e12)
+    company = {"name": "Sharded ApS", "sheet": "410000"}
+
+    rows = analyzer.analyze_company(None, company, features, scheduler, stream=True)
+    async_rows = asyncio.run(analyze_companies_async(
+        [company], features, scheduler=scheduler, pack_size=1, stream=True,
+    ))[0]
+
+    for result in (rows, async_rows):
+        assert sorted(r["Feature"] for r in result) == features
+    assert server.stats["streamed"] == server.stats["requests"] == 2 * len(shards)
+
+
+def test_drivers_run_the_same_flow():
+    import analyzer
+
+    def ok(value):
+        return (yield analyzer._Parallel([])) or value
+
+    def fail():
+        raise ValueError("fejl")
+        yield
+
+    def flow():
+        try:
+            yield from fail()
+        except ValueError:
+            pass
+        return (yield analyzer._Parallel([ok(1), fail(), ok(2)]))
+
+    for answers in (
+        analyzer._drive(flow(), None, None),
+        asyncio.run(analyzer._drive_async(flow(), None, None)),
+    ):
+        assert answers[0] == 1 and answers[2] == 2
+        assert isinstance(answers[1], ValueError)
@@ -0,0 +1,36 @@
+"""Budgettet tæller det faktiske token-forbrug – ikke estimater for kald der fejlede."""
+import pytest
+
+import analyzer
+from priority import Budget
+from rate_limiter import KeyScheduler
+
+FEATURES = [f"Syntetisk feature {i:03d}" for i in range(5)]
+COMPANY = {"name": "Budget ApS", "sheet": "410000"}
+
+
+def _run():
+    budget = Budget()
+    scheduler = KeyScheduler(["k1"], requests_per_minute=1e9, tokens_per_minute=1e12, budget=budget)
+    return analyzer.analyze_company(None, COMPANY, FEATURES, scheduler), budget, scheduler
+
+
+@pytest.mark.parametrize("server", [{"server_error_ratio": 1.0}], indirect=True)
+def test_failed_calls_are_refunded(server, no_backoff):
+    rows, budget, scheduler = _run()
+
+    assert rows == []
+    assert budget.requests == server.stats["requests"] > 1
+    assert budget.tokens == 0
+    state = scheduler._states["k1"]
+    assert state.tokens.level == pytest.approx(state.tokens.capacity)
+
+
+def test_success_charges_actual_usage(server):
+    rows, budget, _ = _run()
+
+    assert len(rows) == len(FEATURES)
+    assert budget.requests == server.stats["requests"] == 1
+    assert 0 < budget.tokens < analyzer.estimate_tokens(
+        analyzer.build_messages(COMPANY["name"], FEATURES), analyzer.MAX_OUTPUT_TOKENS
+    )
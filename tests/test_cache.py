@@ -0,0 +1,77 @@
+import os
+import time
+
+import pytest
+
+import cache as cache_module
+from cache import ResponseCache
+
+FEATURES = ["Feature A", "Feature B"]
+
+
+def _rows(company):
+    return [{"Company": company, "Feature": f, "Relevance": "Høj"} for f in FEATURES]
+
+
+class _Clock:
+    def __init__(self):
+        self.now = time.time()
+
+    def time(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = _Clock()
+    monkeypatch.setattr(cache_module, "time", clock)
+    return clock
+
+
+def _cache(tmp_path, **kwargs):
+    return ResponseCache(os.path.join(tmp_path, "cache.sqlite"), **kwargs)
+
+
+def test_expired_answers_are_ignored_and_purged(tmp_path, clock):
+    cache = _cache(tmp_path, ttl_days=1, max_entries=None)
+    cache.put("A ApS", FEATURES, "raw", _rows("A ApS"))
+
+    clock.now += 3600
+    assert cache.get("A ApS", list(reversed(FEATURES))) == ("raw", _rows("A ApS"))
+    assert cache.contains("A ApS", FEATURES)
+
+    clock.now += 86400
+    assert cache.get("A ApS", FEATURES) is None
+    assert cache.latest("A ApS") is None
+    assert not cache.contains("A ApS", FEATURES)
+    assert (cache.hits, cache.misses) == (1, 1)
+    assert cache.purge_expired() == 1
+    cache.close()
+
+
+def test_least_recently_used_answer_is_evicted(tmp_path, clock):
+    cache = _cache(tmp_path, ttl_days=None, max_entries=2)
+    for name in ("A ApS", "B ApS"):
+        clock.now += 1
+        cache.put(name, FEATURES, name, _rows(name))
+
+    clock.now += 1
+    assert cache.get("A ApS", FEATURES) is not None
+    clock.now += 1
+    cache.put("C ApS", FEATURES, "C ApS", _rows("C ApS"))
+
+    assert cache.contains("A ApS", FEATURES)
+    assert not cache.contains("B ApS", FEATURES)
+    assert cache.contains("C ApS", FEATURES)
+    cache.close()
+
+
+def test_latest_answer_ignores_the_feature_list(tmp_path, clock):
+    cache = _cache(tmp_path)
+    cache.put("A ApS", FEATURES[:1], "gammel", _rows("A ApS")[:1])
+    clock.now += 1
+    cache.put("A ApS", FEATURES, "ny", _rows("A ApS"))
+
+    assert cache.latest("A ApS")[0] == "ny"
+    assert cache.get("A ApS", ["Feature C"]) is None
+    cache.close()
@@ -0,0 +1,85 @@
+import csv
+import os
+import time
+
+import pytest
+
+import cvr_cache
+from cvr_cache import CvrCache, warm
+from fake_cvr import company
+
+
+class _Clock:
+    def __init__(self):
+        self.now = time.time()
+
+    def time(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = _Clock()
+    monkeypatch.setattr(cvr_cache, "time", clock)
+    return clock
+
+
+@pytest.fixture
+def cache(tmp_path):
+    cache = CvrCache(os.path.join(tmp_path, "cvr.sqlite"), ttl_days=30, negative_ttl_days=1)
+    yield cache
+    cache.close()
+
+
+def test_found_and_negative_ttl(cache, clock):
+    cache.put("DK 11 11 11 11", company("11111111"))
+    cache.put("22222222", {"error": "NOT_FOUND"})
+
+    assert cache.get("11111111")["vat"] == 11111111
+    assert cache.get("22222222") == {"error": "NOT_FOUND"}
+
+    clock.now += 2 * 86400
+    assert cache.get("11111111") is not None
+    assert cache.get("22222222") is None
+    assert cache.missing(["11111111", "22222222", "22-22-22-22"]) == ["22222222"]
+
+    clock.now += 30 * 86400
+    assert cache.get("11111111") is None
+    assert cache.purge_expired() == 2
+    assert cache.stats() == {"total": 0, "found": 0, "negative": 0}
+
+
+@pytest.mark.parametrize("error", ["QUOTA_EXCEEDED", "INTERNAL_ERROR", "BANNED"])
+def test_transient_errors_are_not_cached(cache, error):
+    assert cache.put_many([("33333333", {"error": error}), ("44444444", {"error": "INVALID_VAT"})]) == 1
+
+    assert cache.get("33333333") is None
+    assert cache.missing(["33333333", "44444444"]) == ["33333333"]
+
+
+def test_warm_fetches_each_missing_cvr_once(cache, cvr_server, tmp_path):
+    cvr_server.companies = {cvr: company(cvr) for cvr in ("10000001", "10000002", "10000003")}
+    cvr_server.errors = {"10000003": "QUOTA_EXCEEDED"}
+    cache.put("10000001", company("10000001"))
+    path = os.path.join(tmp_path, "kunder.csv")
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f, delimiter=";")
+        writer.writerow(["Kunde", "CVR"])
+        writer.writerows([
+            ["A", "10000001"],
+            ["B", "10000002"],
+            ["B igen", "DK 10 00 00 02"],
+            ["C", "10000003"],
+            ["C igen", "10000003"],
+            ["Ukendt", "10000004"],
+        ])
+
+    assert warm(cache, path, workers=2, rps=0, base_url=cvr_server.url) == 3
+    assert cvr_server.calls() == {"10000002": 1, "10000003": 1, "10000004": 1}
+
+    # Kvotefejlen blev ikke gemt, så kun den hentes igen
+    cvr_server.errors.clear()
+    cvr_server.requests.clear()
+    assert warm(cache, path, workers=2, rps=0, base_url=cvr_server.url) == 1
+    assert cvr_server.calls() == {"10000003": 1}
+    assert cache.stats() == {"total": 4, "found": 3, "negative": 1}
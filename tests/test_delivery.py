@@ -0,0 +1,57 @@
+"""Rækker må kun nå output (on_row), når hele virksomheden er lykkedes."""
+import groq
+
+import analyzer
+from rate_limiter import KeyScheduler
+
+FEATURES = [f"Syntetisk feature {i:03d}" for i in range(5)]
+COMPANY = {"name": "Afbrudt ApS", "sheet": "410000"}
+
+
+
+def _break_first_stream(monkeypatch, error):
+    """Lad første streamede svar levere to rækker og så fejle midt i strømmen."""
+    read_stream = analyzer._read_stream
+    calls = []
+
+    def flaky(stream, parser):
+        calls.append(parser)
+        if len(calls) > 1:
+            return read_stream(stream, parser)
+        for chunk in stream:
+            if chunk.choices:
+                parser.feed(chunk.choices[0].delta.content or "")
+            if len(parser.rows) >= 2:
+                stream.close()
+                raise error
+        raise AssertionError("svaret blev aldrig afbrudt")
+
+    monkeypatch.setattr(analyzer, "_read_stream", flaky)
+
+
+def _scheduler():
+    return KeyScheduler(["k1"], requests_per_minute=1e9, tokens_per_minute=1e12)
+
+
+def test_failed_stream_delivers_nothing(server, no_backoff, monkeypatch):
+    _break_first_stream(monkeypatch, ValueError("forbindelsen blev afbrudt"))
+    delivered = []
+
+    rows = analyzer.analyze_company(
+        None, COMPANY, FEATURES, _scheduler(), on_row=delivered.append, stream=True
+    )
+
+    assert rows == []
+    assert delivered == []
+
+
+def test_retried_stream_delivers_rows_once(server, no_backoff, monkeypatch):
+    _break_first_stream(monkeypatch, groq.APITimeoutError(request=None))
+    delivered = []
+
+    rows = analyzer.analyze_company(
+        None, COMPANY, FEATURES, _scheduler(), on_row=delivered.append, stream=True
+    )
+
+    assert sorted(r["Feature"] for r in delivered) == FEATURES
+    assert delivered == rows
@@ -0,0 +1,44 @@
+import pytest
+
+from feature_index import FeatureIndex, normalize_feature
+
+FEATURES = [
+    "Lagerstyring",
+    "Elektronisk fakturering",
+    "Digital markedsføring",
+    "Salg af biler i Nord",
+    "Salg af biler i Syd",
+]
+
+
+@pytest.mark.parametrize("raw, expected, kind", [
+    ("lagerstyring", "Lagerstyring", "exact"),
+    ("1. Elektroniske faktureringer", "Elektronisk fakturering", "normalized"),
+    ("Elektronisk fakturerng", "Elektronisk fakturering", "fuzzy"),
+    ("Digital markedsforing", "Digital markedsføring", "fuzzy"),
+    ("Salg af biler i Nrd", "Salg af biler i Nord", "fuzzy"),
+    # To lige gode kandidater → hellere ingen match end et forkert
+    ("Salg af biler i", None, "unmatched"),
+    ("Helt andet", None, "unmatched"),
+])
+def test_match(raw, expected, kind):
+    index = FeatureIndex(FEATURES)
+    assert index.match(raw) == expected
+    assert index.stats == {kind: 1}
+
+
+def test_normalize_folds_case_accents_numbering_and_plurals():
+    assert normalize_feature("  2) Digitale Markedsføringer ") == normalize_feature("digital markedsføring")
+    assert normalize_feature("Café-drift") == "cafe drift"
+
+
+def test_lookups_are_memoized_and_missing_keeps_order():
+    index = FeatureIndex(FEATURES)
+    assert index.match("Elektronisk fakturerng") == index.match("Elektronisk fakturerng")
+    assert index.stats == {"fuzzy": 2}
+    assert list(index._memo) == ["Elektronisk fakturerng"]
+
+    rows = [{"Feature": "Salg af biler i Syd"}, {"Feature": "Lagerstyring"}]
+    assert index.missing(rows) == [
+        "Elektronisk fakturering", "Digital markedsføring", "Salg af biler i Nord",
+    ]
@@ -0,0 +1,185 @@
+import csv
+import os
+import sys
+import time
+
+import pytest
+import requests
+
+import fetch_cvr_data
+from fake_cvr import company
+from fetch_cvr_data import (
+    FIELDNAMES,
+    MAX_RETRIES,
+    RateLimiter,
+    enrich_stream,
+    fetch_cvr_json,
+    make_session,
+    read_customers,
+    sniff_csv,
+)
+
+CVRS = [f"{10000000 + i}" for i in range(8)]
+
+
+def _customers(cvrs):
+    return [[f"Kunde {cvr}", cvr] for cvr in cvrs]
+
+
+def test_enrich_stream_keeps_input_order(cvr_server):
+    cvr_server.companies = {cvr: company(cvr) for cvr in CVRS}
+    # De første svar er de langsomste, så de bliver færdige sidst
+    cvr_server.delays = {cvr: 0.05 * (len(CVRS) - i) for i, cvr in enumerate(CVRS)}
+
+    rows = list(enrich_stream(_customers(CVRS), workers=4, rps=0, base_url=cvr_server.url))
+
+    assert [row["CVR"] for row in rows] == [int(cvr) for cvr in CVRS]
+    assert rows[0]["Navn"] == f"Virksomhed {CVRS[0]} ApS"
+
+
+def test_not_found_gives_empty_row(cvr_server):
+    rows = list(enrich_stream(_customers(["99999999"]), workers=1, rps=0, base_url=cvr_server.url))
+
+    assert rows == [{**dict.fromkeys(FIELDNAMES, ""), "Navn": "Kunde 99999999", "CVR": "99999999"}]
+
+
+def test_retries_429_and_5xx(cvr_server):
+    cvr = CVRS[0]
+    cvr_server.companies = {cvr: company(cvr)}
+    cvr_server.failures = {cvr: [429, 503, 500]}
+
+    with make_session(1) as session:
+        data = fetch_cvr_json(cvr, session, base_url=cvr_server.url)
+
+    assert data["vat"] == int(cvr)
+    assert cvr_server.calls()[cvr] == 4
+
+
+class _Clock:
+    """Erstatter time i fetch_cvr_data, så backoff-pauserne registreres i stedet for at blive ventet."""
+
+    monotonic = staticmethod(time.monotonic)
+
+    def __init__(self):
+        self.sleeps = []
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+
+
+def test_backoff_is_exponential_and_gives_up(cvr_server, monkeypatch):
+    cvr = CVRS[0]
+    cvr_server.retry_after = None
+    cvr_server.failures = {cvr: [503] * (MAX_RETRIES + 1)}
+    clock = _Clock()
+    monkeypatch.setattr(fetch_cvr_data, "time", clock)
+    monkeypatch.setattr(fetch_cvr_data.random, "uniform", lambda a, b: 0.0)
+
+    with make_session(1) as session, pytest.raises(requests.HTTPError):
+        fetch_cvr_json(cvr, session, base_url=cvr_server.url)
+
+    assert clock.sleeps == [2.0 ** i for i in range(MAX_RETRIES)]
+    assert cvr_server.calls()[cvr] == MAX_RETRIES + 1
+
+
+def test_retry_after_pauses_the_whole_pool(cvr_server, monkeypatch):
+    cvr = CVRS[0]
+    cvr_server.companies = {cvr: company(cvr)}
+    cvr_server.retry_after = 7
+    cvr_server.failures = {cvr: [429]}
+    clock = _Clock()
+    monkeypatch.setattr(fetch_cvr_data, "time", clock)
+    limiter = RateLimiter(0)
+
+    with make_session(1) as session:
+        fetch_cvr_json(cvr, session, limiter, base_url=cvr_server.url)
+
+    assert 7.0 in clock.sleeps
+    assert limiter._next >= time.monotonic() + 6
+
+
+def test_rps_limit_holds_across_workers(cvr_server):
+    cvr_server.companies = {cvr: company(cvr) for cvr in CVRS}
+    rps = 20.0
+
+    list(enrich_stream(_customers(CVRS), workers=4, rps=rps, base_url=cvr_server.url))
+
+    times = sorted(t for t, _ in cvr_server.requests)
+    assert len(times) == len(CVRS)
+    # n forespørgsler fordelt jævnt fylder mindst (n - 1) intervaller
+    assert times[-1] - times[0] >= (len(CVRS) - 1) / rps * 0.9
+
+
+@pytest.mark.parametrize(
+    "encoding, delimiter, expected_encoding",
+    [
+        ("cp1252", ";", "cp1252"),
+        ("utf-8-sig", ",", "utf-8-sig"),
+        ("utf-8", "\t", "utf-8"),
+    ],
+)
+def test_sniff_csv(tmp_path, encoding, delimiter, expected_encoding):
+    path = os.path.join(tmp_path, "kunder.csv")
+    with open(path, "w", newline="", encoding=encoding) as f:
+        writer = csv.writer(f, delimiter=delimiter)
+        writer.writerow(["Noter", "CVR-nummer", "Kunde"])
+        writer.writerow(["Første kunde", "DK 12 34 56 78", "Ærø Tømrer ApS"])
+        writer.writerow(["", "87654321", "Østergaard & Søn"])
+
+    assert sniff_csv(path) == (expected_encoding, delimiter)
+    # Kolonnerne findes ud fra headeren, ikke positionen
+    assert list(read_customers(path)) == [
+        ["Ærø Tømrer ApS", "DK 12 34 56 78"],
+        ["Østergaard & Søn", "87654321"],
+    ]
+
+
+def _write_input(path, cvrs):
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f, delimiter=";")
+        writer.writerow(["Kunde", "CVR"])
+        writer.writerows(_customers(cvrs))
+
+
+def _run_main(monkeypatch, input_path, output_path, url, *extra):
+    monkeypatch.setattr(sys, "argv", [
+        "fetch_cvr_data.py", "--input", input_path, "--output", output_path,
+        "--base-url", url, "--rps", "0", "--workers", "2", "--no-cache", *extra,
+    ])
+    fetch_cvr_data.main()
+
+
+def test_resume_after_last_cvr(cvr_server, tmp_path, monkeypatch):
+    cvr_server.companies = {cvr: company(cvr) for cvr in CVRS}
+    input_path = os.path.join(tmp_path, "kunder.csv")
+    output_path = os.path.join(tmp_path, "output.csv")
+    _write_input(input_path, CVRS)
+
+    _run_main(monkeypatch, input_path, output_path, cvr_server.url)
+    with open(output_path, "rb") as f:
+        full = f.read()
+    lines = full.splitlines(keepends=True)
+    # Afbrudt kørsel: header, tre færdige rækker og en halvt skrevet fjerde
+    with open(output_path, "wb") as f:
+        f.write(b"".join(lines[:4]) + lines[4][:10])
+    cvr_server.requests.clear()
+
+    _run_main(monkeypatch, input_path, output_path, cvr_server.url, "--resume")
+
+    with open(output_path, "rb") as f:
+        assert f.read() == full
+    assert sorted(cvr_server.calls()) == CVRS[3:]
+
+
+def test_resume_refuses_mismatched_output(cvr_server, tmp_path, monkeypatch):
+    input_path = os.path.join(tmp_path, "kunder.csv")
+    output_path = os.path.join(tmp_path, "output.csv")
+    _write_input(input_path, CVRS)
+    with open(output_path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=FIELDNAMES)
+        writer.writeheader()
+        writer.writerow({**dict.fromkeys(FIELDNAMES, ""), "CVR": "55555555"})
+
+    with pytest.raises(SystemExit, match="passer ikke"):
+        _run_main(monkeypatch, input_path, output_path, cvr_server.url, "--resume")
+    assert not cvr_server.requests
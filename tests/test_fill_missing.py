@@ -0,0 +1,79 @@
+"""Opfølgning: mangler svaret features, spørges der bagefter kun om dem."""
+import os
+
+import pytest
+
+import analyzer
+import fake_groq
+from cache import ResponseCache
+from rate_limiter import KeyScheduler
+
+FEATURES = [f"Syntetisk feature {i:03d}" for i in range(5)]
+COMPANY = {"name": "Opfølgning ApS", "sheet": "410000"}
+
+
+@pytest.fixture
+def prompts(monkeypatch):
+    """Brugerprompterne til modellen; første svar mangler den sidste feature."""
+    build_answer = fake_groq.build_answer
+    seen = []
+
+    def first_answer_without_last_feature(messages):
+        seen.append(messages[-1]["content"])
+        text = build_answer(messages)
+        if len(seen) > 1:
+            return text
+        return "\n".join(l for l in text.splitlines() if not l.startswith(f"{FEATURES[-1]};"))
+
+    monkeypatch.setattr(fake_groq, "build_answer", first_answer_without_last_feature)
+    return seen
+
+
+def _scheduler():
+    return KeyScheduler(["k1"], requests_per_minute=1e9, tokens_per_minute=1e12, breaker_cooldown=0)
+
+
+def test_missing_feature_is_asked_for_alone(server, prompts, tmp_path):
+    cache = ResponseCache(os.path.join(tmp_path, "cache.sqlite"))
+    delivered = []
+
+    rows = analyzer.analyze_company(
+        None, COMPANY, FEATURES, _scheduler(), cache, on_row=delivered.append
+    )
+
+    assert sorted(r["Feature"] for r in rows) == FEATURES
+    assert delivered == rows
+    assert len(prompts) == server.stats["requests"] == 2
+    followup = prompts[1]
+    assert f"- {FEATURES[-1]}" in followup
+    assert f"- {FEATURES[0]}" not in followup
+    assert rows[0]["Website"] in followup
+    assert cache.get(COMPANY["name"], FEATURES)[1] == rows
+    cache.close()
+
+
+def test_failed_followup_keeps_the_first_answer(server, prompts, no_backoff, monkeypatch):
+    build_answer = fake_groq.build_answer
+
+    def fail_after_first_answer(messages):
+        server.scenario.server_error_ratio = 1.0
+        return build_answer(messages)
+
+    monkeypatch.setattr(fake_groq, "build_answer", fail_after_first_answer)
+
+    rows = analyzer.analyze_company(None, COMPANY, FEATURES, _scheduler())
+
+    assert sorted(r["Feature"] for r in rows) == FEATURES[:-1]
+    assert len(prompts) == 1
+
+
+def test_followups_stop_after_completion_passes(server, monkeypatch):
+    build_answer = fake_groq.build_answer
+    monkeypatch.setattr(fake_groq, "build_answer", lambda messages: "\n".join(
+        l for l in build_answer(messages).splitlines() if not l.startswith(f"{FEATURES[-1]};")
+    ))
+
+    rows = analyzer.analyze_company(None, COMPANY, FEATURES, _scheduler())
+
+    assert sorted(r["Feature"] for r in rows) == FEATURES[:-1]
+    assert server.stats["requests"] == 1 + analyzer.COMPLETION_PASSES
@@ -0,0 +1,70 @@
+import os
+
+import pytest
+
+import ingest
+from benchmark import write_workbooks
+from companies import load_companies
+from features import load_features
+
+
+@pytest.fixture
+def source(tmp_path, monkeypatch):
+    monkeypatch.setattr(ingest, "INGEST_CACHE_DIR", os.path.join(tmp_path, "ingest"))
+    path = os.path.join(tmp_path, "ark.xlsx")
+    with open(path, "wb") as f:
+        f.write(b"version 1")
+    return path
+
+
+class _Builder:
+    def __init__(self):
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        return {"name": ["A/S", f"Bygning {self.calls}"], "row": [3, 4]}
+
+
+def test_snapshot_is_reused_until_the_file_changes(source):
+    build = _Builder()
+    first = ingest.cached_columns("test", source, [("410000", 2)], build)
+    assert first == {"name": ["A/S", "Bygning 1"], "row": [3, 4]}
+
+    assert ingest.cached_columns("test", source, [("410000", 2)], build) == first
+    assert build.calls == 1
+    assert os.path.exists(ingest._snapshot_path("test", source))
+
+    # Ny mtime, samme indhold: hashen afgør, at snapshottet stadig gælder
+    os.utime(source, ns=(1, 1))
+    assert ingest.cached_columns("test", source, [("410000", 2)], build) == first
+    assert build.calls == 1
+
+    with open(source, "wb") as f:
+        f.write(b"version 2")
+    assert ingest.cached_columns("test", source, [("410000", 2)], build)["name"][1] == "Bygning 2"
+    assert build.calls == 2
+
+
+def test_changed_params_or_broken_snapshot_rebuilds(source):
+    build = _Builder()
+    ingest.cached_columns("test", source, [("410000", 2)], build)
+
+    ingest.cached_columns("test", source, [("410000", 3)], build)
+    assert build.calls == 2
+
+    with open(ingest._snapshot_path("test", source), "wb") as f:
+        f.write(b"ikke parquet")
+    ingest.cached_columns("test", source, [("410000", 3)], build)
+    assert build.calls == 3
+
+
+def test_loaders_roundtrip_through_snapshot(tmp_path, monkeypatch):
+    write_workbooks(str(tmp_path), 12, 4)
+    monkeypatch.chdir(tmp_path)
+
+    companies, features = load_companies(), load_features()
+    assert load_companies() == companies and load_features() == features
+    assert len(companies) == 12 and len(features) == 4
+    assert all(isinstance(c["row"], int) for c in companies)
+    assert os.listdir(os.path.join(tmp_path, ingest.INGEST_CACHE_DIR))
@@ -0,0 +1,45 @@
+import json
+import os
+
+from journal import RunJournal, company_key
+
+A = {"name": "A ApS", "sheet": "410000"}
+B = {"name": "B ApS", "sheet": "410000"}
+C = {"name": "C ApS", "sheet": "420000"}
+
+
+def _rows(company):
+    return [{"Company": company["name"], "Feature": "Feature A", "Relevance": "Høj"}]
+
+
+def test_failed_companies_are_retried_on_resume(tmp_path):
+    path = os.path.join(tmp_path, "run.jsonl")
+    journal = RunJournal(path)
+    journal.record(A, _rows(A))
+    journal.record(B, [])
+    journal.close()
+
+    statuses = {e["name"]: e["status"] for e in RunJournal.read(path)}
+    assert statuses == {"A ApS": "ok", "B ApS": "failed"}
+
+    journal = RunJournal(path)
+    assert journal.done() == {company_key(A): _rows(A)}
+    journal.record(B, _rows(B))
+    assert journal.done_keys() == {company_key(A), company_key(B)}
+    journal.close()
+
+
+def test_partial_last_line_is_ignored_and_terminated(tmp_path):
+    path = os.path.join(tmp_path, "run.jsonl")
+    journal = RunJournal(path)
+    journal.record(A, _rows(A))
+    journal.close()
+    with open(path, "a", encoding="utf-8") as f:
+        f.write(json.dumps({"name": "B ApS", "sheet": "410000", "status": "ok"})[:20])
+
+    journal = RunJournal(path)
+    assert journal.done_keys() == {company_key(A)}
+    journal.record(C, _rows(C))
+    journal.close()
+
+    assert [e["name"] for e in RunJournal.read(path)] == ["A ApS", "C ApS"]
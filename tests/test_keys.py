@@ -0,0 +1,58 @@
+"""
+En nøgle der afvises (401/403), tages ud af rotationen i stedet for at hvile
+og blive prøvet igen; er der ingen nøgler tilbage, stopper kørslen.
+"""
+import asyncio
+import sys
+import time
+
+import pytest
+
+import shards
+from analyzer import analyze_company
+from benchmark import write_workbooks
+from engine import analyze_companies_async
+from rate_limiter import KeyScheduler, NoUsableKeysError
+
+FEATURES = [f"Syntetisk feature {i:03d}" for i in range(5)]
+
+pytestmark = pytest.mark.parametrize("server", [{"rejected_keys": ["dead"]}], indirect=True)
+
+
+
+def test_rejected_key_is_dropped(server):
+    scheduler = KeyScheduler(["dead", "live"], requests_per_minute=1e9, tokens_per_minute=1e12)
+    companies = [{"name": f"Virksomhed {i} ApS", "sheet": "410000"} for i in range(6)]
+
+    results = asyncio.run(analyze_companies_async(
+        companies, FEATURES, scheduler=scheduler, pack_size=1,
+    ))
+
+    assert all(len(rows) == len(FEATURES) for rows in results)
+    assert server.stats["rejected"] <= scheduler.max_concurrency
+    assert scheduler.keys == ["dead", "live"] and scheduler.has_usable_keys
+
+
+def test_no_usable_keys_fails_fast(server):
+    scheduler = KeyScheduler(["dead"], requests_per_minute=1e9, tokens_per_minute=1e12)
+    company = {"name": "Afvist ApS", "sheet": "410000"}
+
+    started = time.monotonic()
+    assert analyze_company(None, company, FEATURES, scheduler) == []
+    assert time.monotonic() - started < 5
+    assert server.stats["rejected"] == 1
+    assert not scheduler.has_usable_keys
+    with pytest.raises(NoUsableKeysError):
+        scheduler.acquire(1)
+
+
+def test_main_aborts_without_usable_keys(server, tmp_path, monkeypatch):
+    write_workbooks(str(tmp_path), 6, len(FEATURES))
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(shards, "API_KEYS", ["dead"])
+    monkeypatch.setattr(sys, "argv", ["main.py", "--no-cache", "--start-batch", "1"])
+
+    import main
+    with pytest.raises(SystemExit, match="afvist"):
+        main.main()
+    assert server.stats["rejected"] == 1
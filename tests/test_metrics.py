@@ -0,0 +1,59 @@
+import json
+import os
+
+import pytest
+
+from metrics import Metrics
+
+
+@pytest.fixture
+def metrics():
+    metrics = Metrics(buckets=(0.1, 1.0))
+    metrics.inc("companies_total", status="analyzed")
+    metrics.inc("companies_total", 2, status="analyzed")
+    metrics.inc("companies_total", status='fejl "x"')
+    for seconds in (0.05, 0.1, 0.5, 3.0):
+        metrics.observe("analyze_seconds", seconds, mode="single")
+    return metrics
+
+
+def test_prometheus_text_format(metrics):
+    assert metrics.to_prometheus() == (
+        "# TYPE feature_finder_companies_total counter\n"
+        'feature_finder_companies_total{status="analyzed"} 3\n'
+        'feature_finder_companies_total{status="fejl \\"x\\""} 1\n'
+        "# TYPE feature_finder_analyze_seconds histogram\n"
+        'feature_finder_analyze_seconds_bucket{mode="single",le="0.1"} 2\n'
+        'feature_finder_analyze_seconds_bucket{mode="single",le="1"} 3\n'
+        'feature_finder_analyze_seconds_bucket{mode="single",le="+Inf"} 4\n'
+        'feature_finder_analyze_seconds_sum{mode="single"} 3.650000\n'
+        'feature_finder_analyze_seconds_count{mode="single"} 4\n'
+    )
+
+
+def test_quantile_interpolates_within_the_bucket(metrics):
+    assert metrics.quantile("analyze_seconds", 0.5, mode="single") == pytest.approx(0.1)
+    assert metrics.quantile("analyze_seconds", 0.625, mode="single") == pytest.approx(0.55)
+    assert metrics.quantile("analyze_seconds", 0.5, mode="pack") == 0.0
+
+
+def test_timer_records_failures_too():
+    metrics = Metrics()
+    with pytest.raises(ValueError):
+        with metrics.timer("step_seconds", step="parse"):
+            raise ValueError("fejl")
+    assert metrics.to_json()["histograms"][0]["count"] == 1
+
+
+def test_export_writes_prometheus_or_json(metrics, tmp_path):
+    prom = metrics.export(os.path.join(tmp_path, "out", "metrics.prom"))
+    with open(prom, encoding="utf-8") as f:
+        assert f.read() == metrics.to_prometheus()
+
+    path = metrics.export(os.path.join(tmp_path, "metrics.json"))
+    with open(path, encoding="utf-8") as f:
+        snapshot = json.load(f)
+    assert snapshot["counters"][0] == {
+        "name": "feature_finder_companies_total", "labels": {"status": "analyzed"}, "value": 3,
+    }
+    assert sorted(os.listdir(tmp_path)) == ["metrics.json", "out"]
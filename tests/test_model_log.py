@@ -0,0 +1,43 @@
+import glob
+import gzip
+import json
+import os
+
+from model_log import ModelLogWriter, iter_index, lookup, read_record
+
+
+def _record(i, companies):
+    return {"label": " | ".join(companies), "companies": companies, "ts": f"t{i}", "raw": f"svar {i} " * 20}
+
+
+def test_every_index_entry_points_at_its_own_gzip_member(tmp_path):
+    directory = str(tmp_path)
+    writer = ModelLogWriter(directory, "log", rotate_bytes=200)
+    for i in range(6):
+        writer.write(_record(i, [f"V{i % 3} ApS"]))
+    writer.write(_record(6, ["V0 ApS", "V1 ApS"]))
+    writer.close()
+
+    parts = sorted(glob.glob(os.path.join(directory, "log_*.jsonl.gz")))
+    assert len(parts) > 1
+    # Hver datafil er også en almindelig gzip-fil med én JSON-linje pr. post
+    with gzip.open(parts[0], "rt", encoding="utf-8") as f:
+        assert json.loads(f.readline())["ts"] == "t0"
+
+    entries = list(iter_index(directory))
+    assert len(entries) == 8
+    for entry in entries:
+        assert entry["company"] in read_record(entry, directory)["companies"]
+
+    assert [r["ts"] for r in lookup("V0 ApS", directory)] == ["t0", "t3", "t6"]
+    assert [r["ts"] for r in lookup("V1 ApS", directory)] == ["t1", "t4", "t6"]
+
+
+def test_a_new_run_appends_to_the_same_log(tmp_path):
+    directory = str(tmp_path)
+    for run in range(2):
+        writer = ModelLogWriter(directory, "log")
+        writer.write(_record(run, ["V ApS"]))
+        writer.close()
+
+    assert [r["ts"] for r in lookup("V ApS", directory)] == ["t0", "t1"]
@@ -0,0 +1,71 @@
+import asyncio
+
+import pytest
+
+import analyzer
+import client as client_module
+import fake_groq
+from rate_limiter import KeyScheduler
+from websites import WebsiteTable
+
+FEATURES = [f"Syntetisk feature med et langt navn {i:03d}" for i in range(30)]
+COMPANIES = [{"name": f"Pakke {i} ApS", "sheet": "410000"} for i in range(3)]
+
+
+
+def _check(results):
+    for company, rows in zip(COMPANIES, results):
+        assert sorted(r["Feature"] for r in rows) == FEATURES
+        assert {r["Company"] for r in rows} == {company["name"]}
+        assert len({r["Website"] for r in rows}) == 1
+
+
+@pytest.mark.parametrize("use_async", [False, True])
+def test_pack_with_sharded_features(server, use_async):
+    shards = analyzer.shard_features(FEATURES)
+    assert len(shards) > 1
+    scheduler = KeyScheduler(["k1"], requests_per_minute=1e9, tokens_per_minute=1e12)
+
+    async def run_async():
+        try:
+            return await analyzer.analyze_pack_async(None, COMPANIES, FEATURES, scheduler)
+        finally:
+            await client_module.close_async_clients()
+
+    if use_async:
+        results = asyncio.run(run_async())
+    else:
+        results = analyzer.analyze_pack(None, COMPANIES, FEATURES, scheduler)
+
+    _check(results)
+    # Ét pakket kald pr. feature-shard – ingen enkeltkald bagefter
+    assert server.stats["requests"] == len(shards)
+
+
+def test_packed_companies_get_websites_and_missing_features(server, tmp_path, monkeypatch):
+    features = FEATURES[:5]
+    build_answer = fake_groq.build_answer
+
+    def packed_answer_without_last_feature(messages):
+        text = build_answer(messages)
+        if text.count("### ") < 2:
+            return text
+        return "\n".join(
+            line for line in text.splitlines() if not line.startswith(f"{features[-1]};")
+        )
+
+    monkeypatch.setattr(fake_groq, "build_answer", packed_answer_without_last_feature)
+    websites = WebsiteTable(str(tmp_path / "websites.sqlite"))
+    scheduler = KeyScheduler(["k1"], requests_per_minute=1e9, tokens_per_minute=1e12)
+    delivered = []
+
+    results = analyzer.analyze_pack(
+        None, COMPANIES, features, scheduler, websites=websites, on_row=delivered.append
+    )
+
+    for company, rows in zip(COMPANIES, results):
+        assert sorted(r["Feature"] for r in rows) == features
+        assert {r["Website"] for r in rows} == {websites.get(company["name"])}
+    assert len(delivered) == len(COMPANIES) * len(features)
+    # Ét website-kald og én opfølgning pr. virksomhed omkring det pakkede kald
+    assert server.stats["requests"] == 2 * len(COMPANIES) + 1
@@ -0,0 +1,42 @@
+import os
+
+import pandas as pd
+
+from priority import company_priority, load_lead_scores
+
+
+def _write(path, columns):
+    with pd.ExcelWriter(path) as writer:
+        pd.DataFrame(columns).to_excel(writer, sheet_name="Vægtning", index=False)
+
+
+def test_lead_scores_from_vaegtning_output(tmp_path):
+    path = os.path.join(tmp_path, "vaegtning.xlsx")
+    _write(path, {
+        "Ark": ["410000", "410000"],
+        "Række": [3, 4],
+        "Del 1 (C, gradueret)": [10, 40],
+        "Del 2 (funktioner i N)": [25, 0],
+        "Del 3 (kombination i N)": [20, 0],
+    })
+
+    scores = load_lead_scores(path, fallback=None)
+
+    assert scores == {("410000", 3): 55.0, ("410000", 4): 40.0}
+    assert company_priority({"sheet": "410000", "row": 3}, scores, {"410000": 5}) == 60.0
+
+
+def test_falls_back_to_macro_sheet(tmp_path):
+    macro = os.path.join(tmp_path, "kartotek.xlsx")
+    _write(macro, {"Ark": [410000], "Række": [7], "I alt": [85]})
+
+    assert load_lead_scores(os.path.join(tmp_path, "mangler.xlsx"), fallback=macro) == {
+        ("410000", 7): 85.0
+    }
+
+
+def test_sheet_without_row_columns(tmp_path):
+    path = os.path.join(tmp_path, "vaegtning.xlsx")
+    _write(path, {"Navn": ["A/S"], "I alt": [50]})
+
+    assert load_lead_scores(path, fallback=None) == {}
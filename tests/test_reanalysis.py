@@ -0,0 +1,49 @@
+"""Inkrementel genanalyse: genbrugte og nye rækker leveres samlet, når virksomheden er færdig."""
+import os
+
+import pytest
+
+import analyzer
+from cache import ResponseCache
+from rate_limiter import KeyScheduler
+
+OLD = [f"Syntetisk feature {i:03d}" for i in range(5)]
+NEW = OLD + ["Helt ny feature"]
+COMPANY = {"name": "Genbrug ApS", "sheet": "410000"}
+
+
+
+@pytest.fixture
+def cache(tmp_path, server):
+    cache = ResponseCache(os.path.join(tmp_path, "cache.sqlite"))
+    scheduler = KeyScheduler(["k1"], requests_per_minute=1e9, tokens_per_minute=1e12)
+    assert len(analyzer.analyze_company(None, COMPANY, OLD, scheduler, cache)) == len(OLD)
+    server.reset_stats()
+    yield cache
+    cache.close()
+
+
+def test_reused_and_new_rows_are_delivered_together(server, cache):
+    scheduler = KeyScheduler(["k1"], requests_per_minute=1e9, tokens_per_minute=1e12)
+    delivered = []
+
+    rows = analyzer.analyze_company(None, COMPANY, NEW, scheduler, cache, on_row=delivered.append)
+
+    assert sorted(r["Feature"] for r in rows) == sorted(NEW)
+    assert delivered == rows
+    assert server.stats["requests"] == 1
+    assert cache.get(COMPANY["name"], NEW) is not None
+
+
+def test_failed_followup_keeps_reused_rows_uncached(server, cache, no_backoff):
+    server.scenario.server_error_ratio = 1.0
+    scheduler = KeyScheduler(
+        ["k1"], requests_per_minute=1e9, tokens_per_minute=1e12, breaker_cooldown=0
+    )
+    delivered = []
+
+    rows = analyzer.analyze_company(None, COMPANY, NEW, scheduler, cache, on_row=delivered.append)
+
+    assert sorted(r["Feature"] for r in rows) == sorted(OLD)
+    assert delivered == rows
+    assert cache.get(COMPANY["name"], NEW) is None
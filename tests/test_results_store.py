@@ -0,0 +1,96 @@
+import csv
+import json
+import os
+import time
+
+import pytest
+
+from results_store import ResultsStore
+from sinks import RESULT_FIELDS
+
+
+def _row(company, feature, relevance):
+    return {"Company": company, "Website": "", "Feature": feature, "Relevance": relevance, "Reason": ""}
+
+
+def _line(company, ts, *rows):
+    entry = {"name": company, "sheet": "410000", "status": "ok", "rows": list(rows), "ts": ts}
+    return json.dumps(entry, ensure_ascii=False) + "\n"
+
+
+def _write_csv(path, rows, mtime):
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=RESULT_FIELDS)
+        writer.writeheader()
+        writer.writerows(rows)
+    os.utime(path, (mtime, mtime))
+    return path
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = ResultsStore(os.path.join(tmp_path, "results.sqlite"))
+    yield store
+    store.close()
+
+
+def _relevance(store, company, feature):
+    (row,) = store.query(feature=feature, company=company)
+    return row["Relevance"]
+
+
+def test_newest_run_wins_regardless_of_load_order(store, tmp_path):
+    journal = os.path.join(tmp_path, "journal.jsonl")
+    with open(journal, "w", encoding="utf-8") as f:
+        f.write(_line("A ApS", "2026-03-01T12:00:00", _row("A ApS", "Feature A", "Medium")))
+    older = time.mktime((2026, 1, 1, 12, 0, 0, 0, 0, -1))
+    newer = time.mktime((2026, 6, 1, 12, 0, 0, 0, 0, -1))
+
+    assert store.load(journal) == 1
+    store.load(_write_csv(os.path.join(tmp_path, "old.csv"), [_row("A ApS", "Feature A", "High")], older))
+    assert _relevance(store, "A ApS", "Feature A") == "medium"
+
+    store.load(_write_csv(os.path.join(tmp_path, "new.csv"), [_row("A ApS", "Feature A", "Low")], newer))
+    assert _relevance(store, "A ApS", "Feature A") == "low"
+    assert store.stats()["rows"] == 1
+
+
+def test_journal_is_read_from_the_last_offset(store, tmp_path):
+    journal = os.path.join(tmp_path, "journal.jsonl")
+    second = _line("B ApS", "2026-03-01T12:00:01", _row("B ApS", "Feature A", "High"))
+    with open(journal, "w", encoding="utf-8") as f:
+        f.write(_line("A ApS", "2026-03-01T12:00:00", _row("A ApS", "Feature A", "High")))
+        f.write(second[:15])
+
+    # Den halvt skrevne linje tages med næste gang
+    assert store.load(journal) == 1
+    assert store.load(journal) == 0
+
+    with open(journal, "a", encoding="utf-8") as f:
+        f.write(second[15:])
+        f.write(_line("C ApS", "2026-03-01T12:00:02", _row("C ApS", "Feature A", "Low")))
+    assert store.load(journal) == 2
+    assert store.stats()["companies"] == 3
+
+    # En journal der er startet forfra (mindre end sidst), læses fra begyndelsen
+    with open(journal, "w", encoding="utf-8") as f:
+        f.write(_line("D ApS", "2026-03-02T12:00:00", _row("D ApS", "Feature A", "High")))
+    assert store.load(journal) == 1
+
+
+def test_unchanged_result_file_is_skipped(store, tmp_path):
+    path = _write_csv(os.path.join(tmp_path, "r.csv"), [_row("A ApS", "Feature A", "High")], time.time())
+    assert store.load(path) == 1
+    assert store.load(path) == 0
+
+
+def test_stale_features_are_hidden_by_default(store, tmp_path):
+    path = _write_csv(os.path.join(tmp_path, "r.csv"), [
+        _row("A ApS", "Feature A", "High"), _row("A ApS", "Feature B", "Low"),
+    ], time.time())
+    store.load(path)
+
+    assert store.mark_stale(["Feature A"]) == 1
+    assert [r["Feature"] for r in store.query(company="A*")] == ["Feature A"]
+    assert len(store.query(company="A*", include_stale=True)) == 2
+    assert store.mark_stale(["Feature A", "Feature B"]) == 0
@@ -0,0 +1,55 @@
+import asyncio
+
+import groq
+import httpx
+import pytest
+
+import retry
+from retry import FATAL, KEY, RATE_LIMIT, TRANSIENT, backoff_delay, classify_error
+
+REQUEST = httpx.Request("POST", "http://fake/openai/v1/chat/completions")
+
+
+def _status_error(cls, status):
+    return cls(f"HTTP {status}", response=httpx.Response(status, request=REQUEST), body=None)
+
+
+class _StatusOnly(Exception):
+    def __init__(self, status_code):
+        super().__init__(status_code)
+        self.status_code = status_code
+
+
+@pytest.mark.parametrize("error, kind", [
+    (_status_error(groq.RateLimitError, 429), RATE_LIMIT),
+    (_status_error(groq.InternalServerError, 503), TRANSIENT),
+    (_status_error(groq.APIStatusError, 409), TRANSIENT),
+    (groq.APITimeoutError(request=REQUEST), TRANSIENT),
+    (groq.APIConnectionError(request=REQUEST), TRANSIENT),
+    (asyncio.TimeoutError(), TRANSIENT),
+    (_status_error(groq.AuthenticationError, 401), KEY),
+    (_status_error(groq.PermissionDeniedError, 403), KEY),
+    (_status_error(groq.BadRequestError, 400), FATAL),
+    (_status_error(groq.UnprocessableEntityError, 422), FATAL),
+    (_StatusOnly(429), RATE_LIMIT),
+    (_StatusOnly(599), TRANSIENT),
+    (_StatusOnly(401), KEY),
+    (ValueError("Ingen gyldige feature-linjer i svaret"), FATAL),
+])
+def test_classify_error(error, kind):
+    assert classify_error(error) == kind
+
+
+def test_backoff_prefers_retry_after():
+    assert backoff_delay(5, retry_after=1.5) == 1.5
+    assert backoff_delay(5, retry_after=0.0) == 0.0
+
+
+def test_backoff_is_full_jitter_up_to_the_cap(monkeypatch):
+    bounds = []
+    monkeypatch.setattr(retry.random, "uniform", lambda low, high: bounds.append((low, high)) or high)
+
+    delays = [backoff_delay(attempt, base=0.5, cap=5.0) for attempt in range(6)]
+
+    assert delays == [0.5, 1.0, 2.0, 4.0, 5.0, 5.0]
+    assert {low for low, _ in bounds} == {0}
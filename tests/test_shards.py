@@ -0,0 +1,77 @@
+import csv
+import json
+import os
+
+from shards import (
+    merge_journals,
+    select_shard,
+    shard_from_path,
+    shard_path,
+    write_merged,
+)
+
+
+def _row(name, reason):
+    return {"Company": name, "Website": "", "Feature": "Feature A", "Relevance": "Høj", "Reason": reason}
+
+
+def _entry(name, ts, status="ok", reason=""):
+    rows = [_row(name, reason)] if status == "ok" else []
+    return {"name": name, "sheet": "410000", "status": status, "rows": rows, "ts": ts}
+
+
+def _journal(path, entries, tail=""):
+    with open(path, "w", encoding="utf-8") as f:
+        for entry in entries:
+            f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        f.write(tail)
+    return path
+
+
+def test_merge_keeps_the_newest_ok_entry_per_company(tmp_path):
+    first = _journal(os.path.join(tmp_path, "journal.shard_1_of_2.jsonl"), [
+        _entry("A ApS", "2026-01-01T10:00:00", reason="gammel"),
+        _entry("B ApS", "2026-01-01T10:00:00", reason="ok"),
+        _entry("C ApS", "2026-01-01T10:00:00", status="failed"),
+    ])
+    second = _journal(os.path.join(tmp_path, "journal.shard_2_of_2.jsonl"), [
+        _entry("A ApS", "2026-01-02T10:00:00", reason="ny"),
+        _entry("B ApS", "2026-01-03T10:00:00", status="failed"),
+    ], tail='{"name": "D ApS", "sheet"')
+
+    merged = merge_journals([second, first])
+
+    assert sorted(merged) == [("A ApS", "410000"), ("B ApS", "410000")]
+    assert merged[("A ApS", "410000")][1][0]["Reason"] == "ny"
+    assert merged[("B ApS", "410000")][1][0]["Reason"] == "ok"
+
+
+def test_write_merged_follows_the_sheet_order(tmp_path):
+    merged = {
+        ("A ApS", "410000"): ("t", [_row("A ApS", "")]),
+        ("B ApS", "410000"): ("t", [_row("B ApS", "")]),
+        ("C ApS", "410000"): ("t", [_row("C ApS", "")]),
+    }
+    order = [("C ApS", "410000"), ("X ApS", "410000"), ("A ApS", "410000")]
+
+    path, rows = write_merged(merged, "csv", os.path.join(tmp_path, "merged"), order)
+
+    with open(path, newline="", encoding="utf-8") as f:
+        assert [r["Company"] for r in csv.DictReader(f)] == ["C ApS", "A ApS", "B ApS"]
+    assert rows == 3
+
+
+def test_shards_split_the_companies_exactly_once():
+    companies = [{"name": f"V{i} ApS", "sheet": "410000"} for i in range(50)]
+    parts = [select_shard(companies, (i, 3)) for i in (1, 2, 3)]
+
+    assert sorted(c["name"] for part in parts for c in part) == sorted(c["name"] for c in companies)
+    assert all(parts)
+    assert select_shard(list(reversed(companies)), (2, 3)) == list(reversed(parts[1]))
+
+
+def test_shard_path_round_trip():
+    path = shard_path(os.path.join("runs", "journal.jsonl"), (2, 4))
+    assert path == os.path.join("runs", "journal.shard_2_of_4.jsonl")
+    assert shard_from_path(path) == (2, 4)
+    assert shard_from_path("journal.jsonl") is None
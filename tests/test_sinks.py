@@ -0,0 +1,25 @@
+import os
+
+import pandas as pd
+
+from sinks import ParquetSink
+
+
+def _rows(company, n):
+    return [
+        {"Company": company, "Website": "", "Feature": f"F{i}", "Relevance": "high", "Reason": ""}
+        for i in range(n)
+    ]
+
+
+def test_parquet_sink_replaces_previous_run(tmp_path):
+    path = os.path.join(tmp_path, "results.parquet")
+    with ParquetSink(path, row_group_size=2) as sink:
+        for i in range(3):
+            sink.write(_rows(f"Gammel {i} ApS", 2))  # tre part-filer
+    with ParquetSink(path, row_group_size=2) as sink:
+        sink.write(_rows("Ny ApS", 3))
+
+    df = pd.read_parquet(path)
+    assert list(df["Company"].unique()) == ["Ny ApS"]
+    assert len(df) == 3
@@ -0,0 +1,86 @@
+"""
+Paritet mellem vaegtning.py og Vægtningsmakkro.bas: faste input med de point,
+makroens regler giver, og det "Vægtning"-ark, makroen selv har skrevet i
+lead-kartoteket.
+"""
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import vaegtning
+from vaegtning import HEADERS, SUMMARY_SHEET
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+WORKBOOK = os.path.join(ROOT, vaegtning.WORKBOOK_FILE)
+POINTS = HEADERS[3:6]
+
+# (C, N, Del 1, Del 2, Del 3) – udregnet efter makroens regler
+MACRO_CASES = [
+    (None, None, 0, 0, 0),                                  # tom celle → 0
+    ("", "", 0, 0, 0),
+    ("abc", "Entreprise", 0, 10, 10),                       # ikke numerisk → 0
+    (True, "service", 0, 10, 10),
+    (49.9, "små opgaver", 0, 10, 5),                        # under 50; kun M → 5
+    (50, "Entreprise og service", 10, 25, 20),              # E+S → 20
+    (51.25, "Service, små opgaver", 10, 25, 10),            # 10,5 → 10 (Round til lige)
+    (53.75, "entreprise / SMÅ OPGAVER", 12, 25, 10),        # 11,5 → 12 (Round til lige)
+    ("87,5", "ENTREPRISE, service, små opgaver", 25, 40, 20),  # dansk decimalkomma
+    (124.99, None, 40, 0, 0),
+    (125, "diverse", 40, 0, 0),                             # 125–135 → 40
+    (135, 1234, 40, 0, 0),
+    (135.5, "Service", 40, 10, 10),
+    (167.5, "", 25, 0, 0),                                  # faldende mod 200
+    (200, "", 10, 0, 0),
+    (200.01, "", 0, 0, 0),                                  # over 200 → 0
+    ("1.500", "", 0, 0, 0),                                 # dansk tusindtal → 1500
+]
+
+
+def _frame(cases):
+    return pd.DataFrame({
+        "sheet": "test",
+        "row": np.arange(vaegtning.FIRST_ROW, vaegtning.FIRST_ROW + len(cases)),
+        "C": pd.Series([c[0] for c in cases], dtype=object),
+        "D": "",
+        "N": pd.Series([c[1] for c in cases], dtype=object),
+    })
+
+
+@pytest.mark.parametrize("case", MACRO_CASES, ids=lambda c: f"C={c[0]!r},N={c[1]!r}")
+def test_macro_rules(case):
+    scored = vaegtning.score_frame(_frame([case]))
+    assert tuple(scored.iloc[0][POINTS]) == case[2:]
+
+
+def test_rules_vectorized_over_many_rows():
+    scored = vaegtning.score_frame(_frame(MACRO_CASES))
+    assert [tuple(r) for r in scored[POINTS].itertuples(index=False)] == [c[2:] for c in MACRO_CASES]
+
+
+@pytest.mark.skipif(not os.path.exists(WORKBOOK), reason="lead-kartoteket mangler")
+def test_matches_macro_sheet():
+    macro = pd.read_excel(WORKBOOK, sheet_name=SUMMARY_SHEET)
+    macro = macro.dropna(subset=["Ark", "Række"])
+    macro["Ark"] = macro["Ark"].astype(str)
+    macro["Række"] = macro["Række"].astype(int)
+
+    ours = vaegtning.score_workbook(WORKBOOK)
+    merged = macro.merge(ours, on=["Ark", "Række"], suffixes=("_makro", ""))
+    assert len(merged) >= 500
+
+    mismatches = merged[
+        np.any([merged[f"{p}_makro"] != merged[p] for p in POINTS], axis=0)
+    ]
+    assert mismatches.empty, mismatches[["Ark", "Række"] + POINTS].head(10).to_string()
+
+
+def test_write_summary(tmp_path):
+    summary = vaegtning.score_frame(_frame(MACRO_CASES))
+    path = os.path.join(tmp_path, "vaegtning.xlsx")
+    vaegtning.write_summary(summary, path)
+
+    written = pd.read_excel(path, sheet_name=SUMMARY_SHEET)
+    assert list(written.columns) == HEADERS
+    assert written[POINTS].values.tolist() == summary[POINTS].values.tolist()